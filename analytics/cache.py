@@ -0,0 +1,101 @@
+"""
+Stampede-protected cache for expensive analytics aggregates.
+
+Each entry stores the computed value together with the time it was computed.
+While an entry is younger than the soft TTL it is served as is. Once it is
+older, a single caller (the one that wins a `cache.add` lock) recomputes it
+while every other caller keeps getting the stale value. When there is no
+value at all, callers that lose the lock wait briefly for the winner instead
+of running the same aggregate in parallel.
+"""
+import asyncio
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 30
+WAIT_TIMEOUT = 5
+WAIT_INTERVAL = 0.05
+
+
+def get_or_compute(key, compute, ttl=None, stale_ttl=None):
+    """
+    Return (value, age_in_seconds) for `key`, calling `compute()` at most once
+    per key at a time across all processes sharing the cache.
+    """
+    ttl = settings.DASHBOARD_CACHE_TTL if ttl is None else ttl
+    stale_ttl = settings.DASHBOARD_CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+    lock_key = f'{key}:lock'
+
+    entry = cache.get(key)
+    if entry is not None and _age(entry) < ttl:
+        return entry['value'], _age(entry)
+
+    if cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            return _recompute(key, compute, ttl + stale_ttl), 0.0
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None:
+        # Stale-while-revalidate: someone else is already recomputing
+        return entry['value'], _age(entry)
+
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        time.sleep(WAIT_INTERVAL)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry['value'], _age(entry)
+
+    # The lock holder died or is too slow; compute without caching contention
+    return _recompute(key, compute, ttl + stale_ttl), 0.0
+
+
+async def aget_or_compute(key, compute, ttl=None, stale_ttl=None):
+    """
+    Async version of get_or_compute for coroutine `compute` functions; waiting
+    for another caller's result does not block the event loop.
+    """
+    ttl = settings.DASHBOARD_CACHE_TTL if ttl is None else ttl
+    stale_ttl = settings.DASHBOARD_CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+    lock_key = f'{key}:lock'
+
+    entry = await cache.aget(key)
+    if entry is not None and _age(entry) < ttl:
+        return entry['value'], _age(entry)
+
+    if await cache.aadd(lock_key, 1, timeout=LOCK_TIMEOUT):
+        try:
+            return await _arecompute(key, compute, ttl + stale_ttl), 0.0
+        finally:
+            await cache.adelete(lock_key)
+
+    if entry is not None:
+        return entry['value'], _age(entry)
+
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(WAIT_INTERVAL)
+        entry = await cache.aget(key)
+        if entry is not None:
+            return entry['value'], _age(entry)
+
+    return await _arecompute(key, compute, ttl + stale_ttl), 0.0
+
+
+def _recompute(key, compute, timeout):
+    value = compute()
+    cache.set(key, {'value': value, 'computed_at': time.time()}, timeout=timeout)
+    return value
+
+
+async def _arecompute(key, compute, timeout):
+    value = await compute()
+    await cache.aset(key, {'value': value, 'computed_at': time.time()}, timeout=timeout)
+    return value
+
+
+def _age(entry):
+    return max(time.time() - entry['computed_at'], 0.0)
@@ -0,0 +1,334 @@
+"""
+In-process columnar sales cube.
+
+Sales are held as parallel NumPy arrays (int32 product ids, int32 days since
+the epoch, float64 revenue, int32 units, int8 sale count), and products as
+dense lookup arrays from product id to category/brand codes. Group-bys build
+one integer key per row and aggregate with np.bincount, falling back to a
+pandas groupby when the key space is too large to allocate densely.
+
+The cube is loaded once per process with a COPY of the sales table, then
+kept current by appending the sales each process writes (see receivers.py).
+It is reloaded after SALES_CUBE_MAX_AGE seconds so writes made by other
+processes, and deletions, are eventually picked up. Sales this process
+commits while a reload's COPY runs are buffered and replayed on the new cube
+unless the COPY already saw them.
+"""
+import io
+import threading
+import time
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from products.models import Product
+
+GRANULARITIES = ('day', 'week', 'month')
+DIMENSIONS = ('category', 'brand')
+DENSE_KEY_LIMIT = 1 << 22
+EPOCH = date(1970, 1, 1)
+
+
+def epoch_day(value):
+    return (value - EPOCH).days
+
+
+class SalesCube:
+    def __init__(self):
+        self.size = 0
+        self.product = np.empty(0, dtype=np.int32)
+        self.day = np.empty(0, dtype=np.int32)
+        self.revenue = np.empty(0, dtype=np.float64)
+        self.units = np.empty(0, dtype=np.int32)
+        self.count = np.empty(0, dtype=np.int8)
+        self.category_of = np.empty(0, dtype=np.int32)
+        self.brand_of = np.empty(0, dtype=np.int32)
+        self.categories = []
+        self.brands = []
+        self.loaded_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls):
+        cube = cls()
+        with connection.cursor() as cursor:
+            sql = cursor.mogrify(
+                """
+                COPY (
+                    SELECT id, product_id, (created_at AT TIME ZONE %s)::date - DATE '1970-01-01',
+                           total_price::float8, quantity
+                    FROM sales
+                ) TO STDOUT WITH (FORMAT csv)
+                """,
+                [settings.TIME_ZONE]
+            ).decode()
+            buffer = io.BytesIO()
+            cursor.copy_expert(sql, buffer)
+        buffer.seek(0)
+        frame = pd.read_csv(
+            buffer, header=None, names=['id', 'product', 'day', 'revenue', 'units'],
+            dtype={'id': np.int64, 'product': np.int32, 'day': np.int32, 'revenue': np.float64, 'units': np.int32}
+        )
+        cube.size = len(frame)
+        cube.product = frame['product'].to_numpy()
+        cube.day = frame['day'].to_numpy()
+        cube.revenue = frame['revenue'].to_numpy()
+        cube.units = frame['units'].to_numpy()
+        cube.count = np.ones(cube.size, dtype=np.int8)
+        # Products are read after the sales so every sold product is known
+        cube._load_products(Product.objects.values_list('id', 'category', 'brand'))
+        if cube.size:
+            cube._ensure_capacity(int(cube.product.max()) + 1)
+        cube.loaded_at = time.monotonic()
+        # Ids of the loaded sales, only to tell which buffered sales the COPY already saw
+        cube.loaded_ids = frame['id'].to_numpy()
+        return cube
+
+    def replay(self, buffered):
+        """Apply [(sales, sign)] committed during load() that its COPY did not see."""
+        replayed = set()
+        for sales, sign in buffered:
+            ids = np.fromiter((sale.id for sale in sales), dtype=np.int64, count=len(sales))
+            seen = np.isin(ids, self.loaded_ids)
+            if sign > 0:
+                missing = [sale for sale, known in zip(sales, seen) if not known]
+                replayed.update(sale.id for sale in missing)
+            else:
+                # A deletion counts only if the cube holds the sale it reverses
+                missing = [sale for sale, known in zip(sales, seen) if known or sale.id in replayed]
+            self.apply_sales(missing, sign=sign)
+        self.loaded_ids = None
+
+    @property
+    def nbytes(self):
+        arrays = (self.product, self.day, self.revenue, self.units, self.count, self.category_of, self.brand_of)
+        return sum(array.nbytes for array in arrays)
+
+    def _load_products(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        self._ensure_capacity(int(ids.max()) + 1)
+        self.category_of[ids] = self._codes(self.categories, (row[1] for row in rows))
+        self.brand_of[ids] = self._codes(self.brands, (row[2] for row in rows))
+
+    def _ensure_capacity(self, size):
+        # Products without a known category/brand (e.g. deleted meanwhile) keep code -1
+        if size > len(self.category_of):
+            grow = size - len(self.category_of)
+            self.category_of = np.concatenate([self.category_of, np.full(grow, -1, dtype=np.int32)])
+            self.brand_of = np.concatenate([self.brand_of, np.full(grow, -1, dtype=np.int32)])
+
+    @staticmethod
+    def _codes(labels, values):
+        index = {label: code for code, label in enumerate(labels)}
+        codes = []
+        for value in values:
+            if value not in index:
+                index[value] = len(labels)
+                labels.append(value)
+            codes.append(index[value])
+        return codes
+
+    def update_product(self, product_id, category, brand):
+        with self._lock:
+            self._load_products([(product_id, category, brand)])
+
+    def apply_sales(self, sales, sign=1):
+        """Append sales (or, with sign=-1, their reversal) to the cube."""
+        sales = list(sales)
+        if not sales:
+            return
+        with self._lock:
+            # Products with no row (deleted before this callback ran) keep code -1
+            self._ensure_capacity(max(sale.product_id for sale in sales) + 1)
+            unknown = {
+                sale.product_id for sale in sales
+                if sale.product_id >= len(self.category_of) or self.category_of[sale.product_id] < 0
+            }
+            if unknown:
+                self._load_products(Product.objects.filter(id__in=unknown).values_list('id', 'category', 'brand'))
+            self._reserve(self.size + len(sales))
+            end = self.size + len(sales)
+            self.product[self.size:end] = [sale.product_id for sale in sales]
+            self.day[self.size:end] = [epoch_day(timezone.localdate(sale.created_at)) for sale in sales]
+            self.revenue[self.size:end] = [sign * float(sale.total_price) for sale in sales]
+            self.units[self.size:end] = [sign * sale.quantity for sale in sales]
+            self.count[self.size:end] = sign
+            self.size = end
+
+    def _reserve(self, capacity):
+        if capacity <= len(self.product):
+            return
+        capacity = max(capacity, 2 * len(self.product), 1024)
+        for name in ('product', 'day', 'revenue', 'units', 'count'):
+            old = getattr(self, name)
+            new = np.empty(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def query(self, granularity='month', dimensions=('category',), date_from=None, date_to=None,
+              categories=None, brands=None):
+        """
+        Aggregate revenue, units and sales by period and the given dimensions.
+        Returns a DataFrame with one row per non-empty group, ordered by key.
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f'Unknown granularity: {granularity}')
+        for dimension in dimensions:
+            if dimension not in DIMENSIONS:
+                raise ValueError(f'Unknown dimension: {dimension}')
+
+        with self._lock:
+            n = self.size
+            product, day = self.product[:n], self.day[:n]
+            revenue, units, count = self.revenue[:n], self.units[:n], self.count[:n]
+            category_of, brand_of = self.category_of, self.brand_of
+            category_labels, brand_labels = list(self.categories), list(self.brands)
+
+        category = category_of[product]
+        brand = brand_of[product]
+        mask = np.ones(n, dtype=bool)
+        if date_from is not None:
+            mask &= day >= epoch_day(date_from)
+        if date_to is not None:
+            mask &= day <= epoch_day(date_to)
+        if categories:
+            mask &= np.isin(category, [category_labels.index(c) for c in categories if c in category_labels])
+        if brands:
+            mask &= np.isin(brand, [brand_labels.index(b) for b in brands if b in brand_labels])
+        if not mask.all():
+            day, category, brand = day[mask], category[mask], brand[mask]
+            revenue, units, count = revenue[mask], units[mask], count[mask]
+
+        period = self._period(day, granularity)
+        columns = [('period', period)]
+        if 'category' in dimensions:
+            columns.append(('category', category))
+        if 'brand' in dimensions:
+            columns.append(('brand', brand))
+        frame = self._group(columns, revenue, units, count)
+
+        frame['period'] = self._period_labels(frame['period'].to_numpy(), granularity)
+        # Code -1 (unknown product) indexes the trailing None
+        if 'category' in frame:
+            frame['category'] = np.asarray(category_labels + [None], dtype=object)[frame['category'].to_numpy()]
+        if 'brand' in frame:
+            frame['brand'] = np.asarray(brand_labels + [None], dtype=object)[frame['brand'].to_numpy()]
+        return frame
+
+    @staticmethod
+    def _period(day, granularity):
+        if granularity == 'day' or not len(day):
+            return day
+        # The day range is small: map each distinct day once and gather
+        first = int(day.min())
+        days = np.arange(first, int(day.max()) + 1)
+        if granularity == 'week':
+            # 1970-01-01 was a Thursday; weeks start on Monday
+            table = ((days + 3) // 7) * 7 - 3
+        else:
+            table = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        return table[day - first]
+
+    @staticmethod
+    def _period_labels(period, granularity):
+        if granularity == 'month':
+            return period.astype('datetime64[M]').astype(str)
+        return period.astype('datetime64[D]').astype(str)
+
+    @staticmethod
+    def _group(columns, revenue, units, count):
+        names = [name for name, _ in columns]
+        empty = pd.DataFrame({name: np.empty(0, dtype=np.int64) for name in names})
+        if not len(revenue):
+            return empty.assign(revenue=0.0, units=0, sales=0)
+
+        offsets = [values.min() for _, values in columns]
+        spans = [int(values.max() - offset) + 1 for (_, values), offset in zip(columns, offsets)]
+        if np.prod(spans, dtype=np.float64) <= DENSE_KEY_LIMIT:
+            key = np.zeros(len(revenue), dtype=np.int64)
+            for (_, values), offset, span in zip(columns, offsets, spans):
+                key *= span
+                key += values
+                key -= offset
+            size = int(np.prod(spans))
+            totals = {
+                'revenue': np.bincount(key, weights=revenue, minlength=size),
+                'units': np.bincount(key, weights=units, minlength=size),
+                'sales': np.bincount(key, weights=count, minlength=size),
+            }
+            present = np.flatnonzero(totals['sales'])
+            data = {}
+            remainder = present
+            for (name, _), offset, span in reversed(list(zip(columns, offsets, spans))):
+                data[name] = remainder % span + offset
+                remainder = remainder // span
+            frame = pd.DataFrame({name: data[name] for name in names})
+            frame['revenue'] = totals['revenue'][present]
+            frame['units'] = totals['units'][present].astype(np.int64)
+            frame['sales'] = totals['sales'][present].astype(np.int64)
+            return frame
+
+        frame = pd.DataFrame({name: values for name, values in columns})
+        frame['revenue'] = revenue
+        frame['units'] = units.astype(np.int64)
+        frame['sales'] = count.astype(np.int64)
+        frame = frame.groupby(names, sort=True).sum().reset_index()
+        return frame[frame['sales'] != 0].reset_index(drop=True)
+
+
+_cube = None
+_cube_lock = threading.Lock()
+# [(sales, sign)] committed while a load runs; None when no load is running
+_buffered = None
+_buffered_lock = threading.Lock()
+
+
+def get_cube():
+    """Return the process-wide cube, loading or reloading it when older than SALES_CUBE_MAX_AGE."""
+    global _cube, _buffered
+    cube = _cube
+    if cube is None or time.monotonic() - cube.loaded_at > settings.SALES_CUBE_MAX_AGE:
+        with _cube_lock:
+            if _cube is cube:
+                with _buffered_lock:
+                    _buffered = []
+                try:
+                    loaded = SalesCube.load()
+                except Exception:
+                    with _buffered_lock:
+                        _buffered = None
+                    raise
+                with _buffered_lock:
+                    loaded.replay(_buffered)
+                    _buffered = None
+                    _cube = loaded
+            cube = _cube
+    return cube
+
+
+def apply_committed_sales(sales, sign=1):
+    """Apply committed sales to the loaded cube, and keep them for a reload in progress."""
+    with _buffered_lock:
+        cube = _cube
+        if _buffered is not None:
+            _buffered.append((sales, sign))
+    # Only a cube already loaded in this process; a fresh load reads these sales from the table
+    if cube is not None:
+        cube.apply_sales(sales, sign=sign)
+
+
+def loaded_cube():
+    """The process-wide cube if it has been loaded, without triggering a load."""
+    return _cube
+
+
+def reset_cube():
+    global _cube
+    _cube = None
@@ -0,0 +1,96 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from analytics.cube import SalesCube
+from products.management.commands._benchmark import measure, rollback_atomic
+from products.models import Sale
+
+TRUNC = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+QUERIES = [
+    ('month', ('category',), None),
+    ('month', ('category', 'brand'), None),
+    ('week', ('brand',), 90),
+    ('day', (), 30),
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the in-memory sales cube against equivalent ORM aggregates'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=5_000)
+        parser.add_argument('--sales', type=int, default=10_000_000)
+        parser.add_argument('--days', type=int, default=730)
+        parser.add_argument('--iterations', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rollback_atomic():
+            self.stdout.write(f"Generating {options['products']} products and {options['sales']} sales...")
+            self.create_data(options['products'], options['sales'], options['days'])
+
+            start = time.perf_counter()
+            cube = SalesCube.load()
+            self.stdout.write(
+                f"Cube load: {time.perf_counter() - start:.1f} s, "
+                f"{cube.size} sales, {cube.nbytes / 2**20:.0f} MiB"
+            )
+
+            self.stdout.write(f"{'query':>30} {'path':>5} {'groups':>7} {'p50 ms':>9} {'p95 ms':>9}")
+            for granularity, dimensions, last_days in QUERIES:
+                date_from = timezone.localdate() - timedelta(days=last_days) if last_days else None
+                label = f"{granularity} x {'+'.join(dimensions) or 'total'}" + (f" {last_days}d" if last_days else '')
+                paths = {
+                    'orm': lambda: self.orm_query(granularity, dimensions, date_from),
+                    'cube': lambda: cube.query(granularity, dimensions, date_from=date_from),
+                }
+                for path, func in paths.items():
+                    groups = len(func())
+                    result = measure(func, options['iterations'])
+                    self.stdout.write(
+                        f"{label:>30} {path:>5} {groups:>7} {result['p50']:>9.2f} {result['p95']:>9.2f}"
+                    )
+
+    def orm_query(self, granularity, dimensions, date_from):
+        sales = Sale.objects.all()
+        if date_from is not None:
+            sales = sales.filter(created_at__date__gte=date_from)
+        fields = ['period', *(f'product__{dimension}' for dimension in dimensions)]
+        return list(
+            sales.annotate(period=TRUNC[granularity]('created_at'))
+            .values(*fields)
+            .annotate(revenue=Sum('total_price'), units=Sum('quantity'), sales=Count('id'))
+            .order_by(*fields)
+        )
+
+    def create_data(self, num_products, num_sales, days):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO products (name, brand, description, base_price, discount_percentage,
+                                      category, created_at)
+                SELECT 'Producto ' || i, 'Marca ' || i %% 40, 'Descripción ' || i,
+                       (random() * 1000)::numeric(10, 2), 0, 'Categoría ' || i %% 12, now()
+                FROM generate_series(1, %s) AS i
+                RETURNING id
+                """,
+                [num_products]
+            )
+            product_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                """
+                INSERT INTO sales (product_id, quantity, unit_price, total_price, created_at)
+                SELECT ids[1 + floor(random() * cardinality(ids))::int], q, 10, 10 * q,
+                       now() - random() * make_interval(days => %s)
+                FROM generate_series(1, %s), (SELECT %s::bigint[] AS ids) AS p,
+                     LATERAL (SELECT 1 + floor(random() * 5)::int AS q) AS quantity
+                """,
+                [days, num_sales, product_ids]
+            )
+            cursor.execute('ANALYZE sales')
@@ -0,0 +1,86 @@
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from analytics.models import SalesDailyRollup
+from analytics.views import (
+    DASHBOARD_METRICS_KEY, DASHBOARD_SUMMARY_KEY, get_category_distribution,
+    get_dashboard_metrics, get_dashboard_summary, get_sales_history,
+)
+from products.management.commands._benchmark import benchmark_user, call_view, measure, rollback_atomic
+from products.models import ProductStats
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the combined dashboard summary against the three separate dashboard calls'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=2_000)
+        parser.add_argument('--sales', type=int, default=1_000_000)
+        parser.add_argument('--days', type=int, default=730)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rollback_atomic():
+            user = benchmark_user()
+            self.stdout.write(f"Generating {options['products']} products and {options['sales']} sales...")
+            self.create_data(options['products'], options['sales'], options['days'])
+
+            def separate():
+                cache.delete(DASHBOARD_METRICS_KEY)
+                for view in (get_dashboard_metrics, get_sales_history, get_category_distribution):
+                    call_view(view, user)
+
+            def summary():
+                cache.delete(DASHBOARD_SUMMARY_KEY)
+                call_view(get_dashboard_summary, user)
+
+            paths = {
+                'separate': separate,
+                'summary': summary,
+                'summary (cached)': lambda: call_view(get_dashboard_summary, user),
+            }
+            self.stdout.write(f"{'path':>17} {'queries':>8} {'p50 ms':>9} {'p95 ms':>9}")
+            for path, func in paths.items():
+                result = measure(func, options['iterations'])
+                self.stdout.write(
+                    f"{path:>17} {result['queries']:>8.0f} {result['p50']:>9.2f} {result['p95']:>9.2f}"
+                )
+            cache.delete_many([DASHBOARD_METRICS_KEY, DASHBOARD_SUMMARY_KEY])
+
+    def create_data(self, num_products, num_sales, days):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO products (name, brand, description, base_price, discount_percentage,
+                                      category, created_at)
+                SELECT 'Producto ' || i, 'Marca ' || i %% 50, 'Descripción ' || i,
+                       (random() * 1000)::numeric(10, 2), 0, 'Categoría ' || i %% 12, now()
+                FROM generate_series(1, %s) AS i
+                RETURNING id
+                """,
+                [num_products]
+            )
+            product_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute(
+                """
+                INSERT INTO inventory (product_id, quantity, last_updated)
+                SELECT id, floor(random() * 5)::int, now() FROM unnest(%s::bigint[]) AS id
+                """,
+                [product_ids]
+            )
+            cursor.execute(
+                """
+                INSERT INTO sales (product_id, quantity, unit_price, total_price, created_at)
+                SELECT ids[1 + floor(random() * cardinality(ids))::int], 1, 10, 10,
+                       now() - random() * make_interval(days => %s)
+                FROM generate_series(1, %s), (SELECT %s::bigint[] AS ids) AS p
+                """,
+                [days, num_sales, product_ids]
+            )
+            cursor.execute('ANALYZE sales')
+        SalesDailyRollup.objects.rebuild()
+        ProductStats.objects.rebuild()
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE sales_daily_rollup')
+            cursor.execute('ANALYZE product_stats')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils.dateparse import parse_date
+
+from analytics.models import SalesDailyRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild (backfill or repair) the sales_daily_rollup table from the sales table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='date_from', help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--to', dest='date_to', help='Last day to rebuild, inclusive (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        days = {}
+        for option in ('date_from', 'date_to'):
+            value = options[option]
+            days[option] = parse_date(value) if value else None
+            if value and days[option] is None:
+                raise CommandError(f'Invalid date: {value}')
+
+        with transaction.atomic():
+            count = SalesDailyRollup.objects.rebuild(**days)
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt {count} rollup rows'))
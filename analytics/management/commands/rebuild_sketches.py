@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from analytics.models import SketchSnapshot
+from analytics.sketches import SalesSketches
+from products.models import Sale
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the persisted sales sketches (top products, unique buyers) by streaming the sales table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        sketches = SalesSketches()
+        batch, total = [], 0
+        sales = Sale.objects.select_related('product').only(
+            'product_id', 'user_id', 'quantity', 'created_at', 'product__category'
+        )
+        with transaction.atomic():
+            SketchSnapshot.objects.all().delete()
+            for sale in sales.iterator(chunk_size=options['chunk_size']):
+                batch.append(sale)
+                if len(batch) == options['chunk_size']:
+                    sketches.record(batch)
+                    total += len(batch)
+                    batch = []
+            sketches.record(batch)
+            total += len(batch)
+            sketches.sync()
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully streamed {total} sales into sketches ({sketches.nbytes / 1024:.0f} KiB)'
+        ))
@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+BACKFILL_SQL = """
+INSERT INTO sales_daily_rollup (day, product_id, category, revenue, units_sold, sales_count)
+SELECT s.day, s.product_id, p.category, s.revenue, s.units_sold, s.sales_count
+FROM (
+    SELECT (created_at AT TIME ZONE %s)::date AS day, product_id,
+           SUM(total_price) AS revenue, SUM(quantity) AS units_sold, COUNT(*) AS sales_count
+    FROM sales
+    GROUP BY 1, 2
+) s
+JOIN products p ON p.id = s.product_id
+"""
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('products', '0010_sales_product_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalesDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('category', models.CharField(max_length=100)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('units_sold', models.IntegerField(default=0)),
+                ('sales_count', models.IntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to='products.product')),
+            ],
+            options={
+                'db_table': 'sales_daily_rollup',
+                'indexes': [models.Index(fields=['category', 'day'], name='sales_rollup_category_day_idx'), models.Index(fields=['product', 'day'], name='sales_rollup_product_day_idx')],
+                'constraints': [models.UniqueConstraint(fields=('day', 'product'), name='sales_rollup_day_product_uniq')],
+            },
+        ),
+        migrations.RunSQL([(BACKFILL_SQL, [settings.TIME_ZONE])], migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0002_sketch_snapshot'),
+        ('products', '0010_sales_product_created_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salesdailyrollup',
+            name='brand',
+            field=models.CharField(default='', max_length=100),
+        ),
+        migrations.RunSQL(
+            "UPDATE sales_daily_rollup r SET brand = p.brand FROM products p WHERE p.id = r.product_id",
+            migrations.RunSQL.noop
+        ),
+        migrations.AddIndex(
+            model_name='salesdailyrollup',
+            index=models.Index(fields=['brand', 'day'], name='sales_rollup_brand_day_idx'),
+        ),
+    ]
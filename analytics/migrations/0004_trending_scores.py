@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:56
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('analytics', '0003_sales_rollup_brand'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TrendingScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('category', 'Category')], max_length=10)),
+                ('key', models.CharField(max_length=100)),
+                ('category', models.CharField(max_length=100)),
+                ('score', models.FloatField()),
+                ('updated_at', models.DateTimeField(db_index=True)),
+            ],
+            options={
+                'db_table': 'trending_scores',
+                'constraints': [models.UniqueConstraint(fields=('kind', 'key'), name='trending_scores_kind_key_uniq')],
+            },
+        ),
+    ]
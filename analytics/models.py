@@ -0,0 +1,205 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import connection, models
+from django.utils import timezone
+
+from products.models import Product
+
+ROLLUP_COUNTER_FIELDS = ['revenue', 'units_sold', 'sales_count']
+
+
+class SalesDailyRollupManager(models.Manager):
+    def apply_deltas(self, deltas, create=True):
+        """
+        Apply {(day, product_id): {field: delta}} to the rollup in a single
+        statement. Category and brand are read from products at write time. With
+        create=False only existing rows are updated (used for deletions).
+        """
+        if not deltas:
+            return
+        table = self.model._meta.db_table
+        if not create:
+            for (day, product_id), delta in deltas.items():
+                self.filter(day=day, product_id=product_id).update(
+                    **{field: models.F(field) + delta.get(field, 0) for field in ROLLUP_COUNTER_FIELDS}
+                )
+            return
+        row = '(%s::date, %s::bigint, %s::numeric, %s::integer, %s::integer)'
+        params = []
+        for (day, product_id), delta in deltas.items():
+            params.extend([day, product_id])
+            params.extend(delta.get(field, 0) for field in ROLLUP_COUNTER_FIELDS)
+        updates = ', '.join(f'{field} = {table}.{field} + EXCLUDED.{field}' for field in ROLLUP_COUNTER_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (day, product_id, category, brand, {', '.join(ROLLUP_COUNTER_FIELDS)})
+                SELECT d.day, d.product_id, p.category, p.brand, d.revenue, d.units_sold, d.sales_count
+                FROM (VALUES {', '.join([row] * len(deltas))})
+                     AS d (day, product_id, revenue, units_sold, sales_count)
+                JOIN products p ON p.id = d.product_id
+                ON CONFLICT (day, product_id) DO UPDATE SET {updates}
+                """,
+                params
+            )
+
+    def record_sales(self, sales, sign=1):
+        deltas = {}
+        for sale in sales:
+            key = (timezone.localdate(sale.created_at), sale.product_id)
+            delta = deltas.setdefault(key, {'revenue': 0, 'units_sold': 0, 'sales_count': 0})
+            delta['revenue'] += sign * sale.total_price
+            delta['units_sold'] += sign * sale.quantity
+            delta['sales_count'] += sign
+        self.apply_deltas(deltas, create=sign > 0)
+
+    def rebuild(self, date_from=None, date_to=None):
+        """Recompute the rollup from the sales table, for all days or an inclusive day range."""
+        table = self.model._meta.db_table
+        days, moments = [], []
+        if date_from is not None:
+            days.append(('day >= %s', date_from))
+            moments.append(('created_at >= %s', _start_of_day(date_from)))
+        if date_to is not None:
+            days.append(('day <= %s', date_to))
+            moments.append(('created_at < %s', _start_of_day(date_to + timedelta(days=1))))
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table} {_where(days)}', [value for _, value in days])
+            cursor.execute(
+                REBUILD_ROLLUP_SQL.format(table=table, where=_where(moments)),
+                [settings.TIME_ZONE, *(value for _, value in moments)]
+            )
+            return cursor.rowcount
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _where(conditions):
+    return f"WHERE {' AND '.join(sql for sql, _ in conditions)}" if conditions else ''
+
+
+REBUILD_ROLLUP_SQL = """
+INSERT INTO {table} (day, product_id, category, brand, revenue, units_sold, sales_count)
+SELECT s.day, s.product_id, p.category, p.brand, s.revenue, s.units_sold, s.sales_count
+FROM (
+    SELECT (created_at AT TIME ZONE %s)::date AS day, product_id,
+           SUM(total_price) AS revenue, SUM(quantity) AS units_sold, COUNT(*) AS sales_count
+    FROM sales
+    {where}
+    GROUP BY 1, 2
+) s
+JOIN products p ON p.id = s.product_id
+"""
+
+
+class SalesDailyRollup(models.Model):
+    """
+    Sales aggregated per day and product (with the product's category and
+    brand for filtering), kept current incrementally as sales
+    are written (see analytics/receivers.py). Repair or backfill it with
+    `manage.py rebuild_sales_rollup`.
+    """
+    day = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='daily_rollups')
+    category = models.CharField(max_length=100)
+    brand = models.CharField(max_length=100, default='')
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    units_sold = models.IntegerField(default=0)
+    sales_count = models.IntegerField(default=0)
+
+    objects = SalesDailyRollupManager()
+
+    class Meta:
+        db_table = 'sales_daily_rollup'
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'product'], name='sales_rollup_day_product_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['category', 'day'], name='sales_rollup_category_day_idx'),
+            models.Index(fields=['brand', 'day'], name='sales_rollup_brand_day_idx'),
+            models.Index(fields=['product', 'day'], name='sales_rollup_product_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} - {self.product_id}: {self.revenue}"
+
+
+class SketchSnapshot(models.Model):
+    """
+    Persisted state of a streaming sketch (see analytics/sketches.py), one row
+    per structure: the product count-min sketch, its top-K candidates, and one
+    HyperLogLog per (day, category).
+    """
+    name = models.CharField(max_length=255, unique=True)
+    data = models.BinaryField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'sketch_snapshots'
+
+    def __str__(self):
+        return self.name
+
+
+class TrendingKind(models.TextChoices):
+    PRODUCT = 'product', 'Product'
+    CATEGORY = 'category', 'Category'
+
+
+class TrendingScoreManager(models.Manager):
+    def add(self, deltas, now):
+        """
+        Add {(kind, key): (category, score at `now`)} in a single statement.
+        Both sides are decayed to the later of `now` and the stored updated_at
+        (a sync can commit after another process stored a newer value).
+        """
+        if not deltas:
+            return
+        table = self.model._meta.db_table
+        row = '(%s, %s, %s, %s::float8, %s::timestamptz)'
+        params = []
+        for (kind, key), (category, score) in deltas.items():
+            params.extend([kind, key, category, score, now])
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} (kind, key, category, score, updated_at)
+                VALUES {', '.join([row] * len(deltas))}
+                ON CONFLICT (kind, key) DO UPDATE SET
+                    score = {table}.score * power(
+                        0.5, GREATEST(EXTRACT(EPOCH FROM EXCLUDED.updated_at - {table}.updated_at), 0) / %s
+                    ) + EXCLUDED.score * power(
+                        0.5, GREATEST(EXTRACT(EPOCH FROM {table}.updated_at - EXCLUDED.updated_at), 0) / %s
+                    ),
+                    category = EXCLUDED.category,
+                    updated_at = GREATEST(EXCLUDED.updated_at, {table}.updated_at)
+                """,
+                [*params, *[settings.TRENDING_HALF_LIFE_HOURS * 3600] * 2]
+            )
+
+
+class TrendingScore(models.Model):
+    """
+    Exponentially decayed units sold per product or category (see
+    analytics/trending.py), stored as its value at updated_at.
+    """
+    kind = models.CharField(max_length=10, choices=TrendingKind.choices)
+    key = models.CharField(max_length=100)
+    # Category of a product row; the key itself for category rows
+    category = models.CharField(max_length=100)
+    score = models.FloatField()
+    updated_at = models.DateTimeField(db_index=True)
+
+    objects = TrendingScoreManager()
+
+    class Meta:
+        db_table = 'trending_scores'
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'key'], name='trending_scores_kind_key_uniq'),
+        ]
+
+    def __str__(self):
+        return f'{self.kind}:{self.key}'
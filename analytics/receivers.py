@@ -0,0 +1,64 @@
+import copy
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from products.models import Product, Sale
+from products.signals import sales_recorded
+
+from .cube import apply_committed_sales, loaded_cube
+from .models import SalesDailyRollup
+from .sketches import get_sketches
+from .trending import get_trending
+
+
+@receiver(sales_recorded)
+def update_rollup_on_sales(sender, sales, **kwargs):
+    SalesDailyRollup.objects.record_sales(sales)
+
+
+@receiver(post_delete, sender=Sale)
+def update_rollup_on_sale_delete(sender, instance, **kwargs):
+    SalesDailyRollup.objects.record_sales([instance], sign=-1)
+
+
+@receiver(post_save, sender=Product)
+def update_rollup_dimensions(sender, instance, created, **kwargs):
+    if not created:
+        SalesDailyRollup.objects.filter(product_id=instance.pk).exclude(
+            category=instance.category, brand=instance.brand
+        ).update(category=instance.category, brand=instance.brand)
+
+
+@receiver(sales_recorded)
+def update_cube_on_sales(sender, sales, **kwargs):
+    transaction.on_commit(lambda: apply_committed_sales(sales))
+
+
+@receiver(post_delete, sender=Sale)
+def update_cube_on_sale_delete(sender, instance, **kwargs):
+    # A copy: delete() clears the instance's pk before the commit, and a reload needs the id
+    sale = copy.copy(instance)
+    transaction.on_commit(lambda: apply_committed_sales([sale], sign=-1))
+
+
+@receiver(post_save, sender=Product)
+def update_cube_product(sender, instance, **kwargs):
+    cube = loaded_cube()
+    if cube is not None:
+        transaction.on_commit(lambda: cube.update_product(instance.pk, instance.category, instance.brand))
+
+
+@receiver(sales_recorded)
+def update_sketches_on_sales(sender, sales, **kwargs):
+    # Streaming sketches only count insertions; deletions are not reflected.
+    # In memory only: flushing to the snapshots happens on the read side, and
+    # robust=True keeps a failure here from surfacing as an error for a committed sale
+    transaction.on_commit(lambda: get_sketches(sync=False).record(sales), robust=True)
+
+
+@receiver(sales_recorded)
+def update_trending_on_sales(sender, sales, **kwargs):
+    # In memory only, like the sketches above
+    transaction.on_commit(lambda: get_trending(sync=False).record(sales), robust=True)
@@ -0,0 +1,333 @@
+"""
+Streaming sketches over the sales stream.
+
+* Top products: a count-min sketch of units sold per product plus a small
+  heap of heavy-hitter candidates (top-K).
+* Unique buyers: one HyperLogLog per (day, category), kept for
+  SKETCH_RETENTION_DAYS days. Ranges and category totals are answered by
+  merging registers.
+
+Every structure has a fixed size and each sale costs O(depth) counter
+increments plus one register update, independent of history length.
+
+Each process updates its own copy in memory as it writes sales (see
+receivers.py) and, when it serves a read, periodically flushes into the shared
+`SketchSnapshot` rows. Count-min
+counters are flushed as deltas (they add), HyperLogLog registers as a
+register-wise max (idempotent), so concurrent processes merge without losing
+updates. The flush also reloads what other processes have persisted.
+"""
+import hashlib
+import heapq
+import io
+import json
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from products.models import Product
+
+from .models import SketchSnapshot
+
+CMS_WIDTH = 4096
+CMS_DEPTH = 5
+CMS_PRIME = (1 << 61) - 1
+TOP_K = 50
+HLL_PRECISION = 12
+
+PRODUCTS_CMS = 'products:cms'
+PRODUCTS_TOPK = 'products:topk'
+BUYERS_PREFIX = 'buyers:'
+
+
+def _array_to_bytes(array):
+    buffer = io.BytesIO()
+    np.save(buffer, array, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _array_from_bytes(data):
+    return np.load(io.BytesIO(bytes(data)), allow_pickle=False)
+
+
+class CountMinSketch:
+    def __init__(self, width=CMS_WIDTH, depth=CMS_DEPTH, table=None):
+        self.width = width
+        self.depth = depth
+        self.table = np.zeros((depth, width), dtype=np.int64) if table is None else table
+        # Fixed seeds so every process (and every snapshot) hashes the same way
+        rng = np.random.default_rng(20240601)
+        self._a = [int(a) for a in rng.integers(1, CMS_PRIME, size=depth)]
+        self._b = [int(b) for b in rng.integers(0, CMS_PRIME, size=depth)]
+
+    def _columns(self, key):
+        return [((a * key + b) % CMS_PRIME) % self.width for a, b in zip(self._a, self._b)]
+
+    def add(self, key, count=1):
+        for row, column in enumerate(self._columns(key)):
+            self.table[row, column] += count
+
+    def estimate(self, key):
+        return int(min(self.table[row, column] for row, column in enumerate(self._columns(key))))
+
+    def to_bytes(self):
+        return _array_to_bytes(self.table)
+
+    @classmethod
+    def from_bytes(cls, data):
+        table = _array_from_bytes(data)
+        return cls(width=table.shape[1], depth=table.shape[0], table=table)
+
+
+class TopK:
+    """Heavy-hitter candidates with their latest estimated counts."""
+
+    def __init__(self, k=TOP_K):
+        self.k = k
+        self.counts = {}
+        self._heap = []
+
+    def offer(self, key, count):
+        if key in self.counts or len(self.counts) < self.k:
+            self.counts[key] = count
+            heapq.heappush(self._heap, (count, key))
+        else:
+            smallest = self._min()
+            if count <= smallest[0]:
+                return
+            del self.counts[smallest[1]]
+            self.counts[key] = count
+            heapq.heappush(self._heap, (count, key))
+        if len(self._heap) > 4 * self.k:
+            self._heap = [(count, key) for key, count in self.counts.items()]
+            heapq.heapify(self._heap)
+
+    def _min(self):
+        # Stale entries (evicted keys or outdated counts) are dropped when they reach the top
+        while True:
+            count, key = self._heap[0]
+            if self.counts.get(key) == count:
+                return count, key
+            heapq.heappop(self._heap)
+
+    def items(self, limit=None):
+        ranked = sorted(self.counts.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+
+
+class HyperLogLog:
+    def __init__(self, precision=HLL_PRECISION, registers=None):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = np.zeros(self.m, dtype=np.uint8) if registers is None else registers
+
+    def add(self, value):
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        h = int.from_bytes(digest, 'big')
+        index = h >> (64 - self.precision)
+        rest = h & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def count(self):
+        alpha = 0.7213 / (1 + 1.079 / self.m)
+        estimate = alpha * self.m ** 2 / np.sum(np.ldexp(1.0, -self.registers.astype(np.int32)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if estimate <= 2.5 * self.m and zeros:
+            estimate = self.m * np.log(self.m / zeros)
+        return int(round(estimate))
+
+    def copy(self):
+        return HyperLogLog(self.precision, self.registers.copy())
+
+    def to_bytes(self):
+        return _array_to_bytes(self.registers)
+
+    @classmethod
+    def from_bytes(cls, data):
+        registers = _array_from_bytes(data)
+        return cls(precision=int(registers.size).bit_length() - 1, registers=registers)
+
+
+def sale_categories(sales):
+    """{product_id: category} for the sales, reading only products not already loaded."""
+    categories, missing = {}, set()
+    for sale in sales:
+        if type(sale).product.is_cached(sale):
+            categories[sale.product_id] = sale.product.category
+        else:
+            missing.add(sale.product_id)
+    if missing:
+        categories.update(Product.objects.filter(id__in=missing).values_list('id', 'category'))
+    return categories
+
+
+def buyers_key(day, category):
+    return f'{BUYERS_PREFIX}{day.isoformat()}:{category}'
+
+
+class SalesSketches:
+    def __init__(self):
+        self.products = CountMinSketch()
+        self.pending = CountMinSketch()
+        self.top = TopK()
+        self.buyers = {}
+        self.dirty_buyers = set()
+        self.synced_at = None
+        self.synced_clock = 0.0
+        self._lock = threading.RLock()
+
+    def record(self, sales):
+        """Apply committed sales; each one costs O(CMS depth) plus one HLL register."""
+        sales = list(sales)
+        categories = sale_categories(sales)
+        cutoff = timezone.localdate() - timedelta(days=settings.SKETCH_RETENTION_DAYS)
+        with self._lock:
+            for sale in sales:
+                self.products.add(sale.product_id, sale.quantity)
+                self.pending.add(sale.product_id, sale.quantity)
+                self.top.offer(sale.product_id, self.products.estimate(sale.product_id))
+                day = timezone.localdate(sale.created_at)
+                category = categories.get(sale.product_id)
+                if sale.user_id is None or category is None or day < cutoff:
+                    continue
+                key = (day, category)
+                self.buyers.setdefault(key, HyperLogLog()).add(sale.user_id)
+                self.dirty_buyers.add(key)
+
+    def top_products(self, limit=10):
+        with self._lock:
+            return [
+                (product_id, self.products.estimate(product_id))
+                for product_id, _ in self.top.items(limit)
+            ]
+
+    def unique_buyers(self, date_from, date_to, category=None):
+        """Return (total, {day: count}) of distinct buyers between two days, inclusive."""
+        total, per_day = HyperLogLog(), {}
+        with self._lock:
+            for (day, day_category), sketch in self.buyers.items():
+                if not date_from <= day <= date_to or (category is not None and day_category != category):
+                    continue
+                per_day.setdefault(day, HyperLogLog()).merge(sketch)
+                total.merge(sketch)
+        return total.count(), {day: sketch.count() for day, sketch in sorted(per_day.items())}
+
+    @property
+    def nbytes(self):
+        with self._lock:
+            return (
+                self.products.table.nbytes + self.pending.table.nbytes
+                + sum(sketch.registers.nbytes for sketch in self.buyers.values())
+            )
+
+    def sync_due(self):
+        return self.synced_at is None or time.monotonic() - self.synced_clock > settings.SKETCH_SYNC_INTERVAL
+
+    def sync(self, force=True):
+        """
+        Flush local deltas into the shared snapshots and reload the merged
+        state, including what other processes persisted since the last sync.
+        """
+        cutoff = timezone.localdate() - timedelta(days=settings.SKETCH_RETENTION_DAYS)
+        with self._lock, transaction.atomic():
+            if not force and not self.sync_due():
+                return
+            dirty_names = sorted(buyers_key(day, category) for day, category in self.dirty_buyers)
+            names = [PRODUCTS_CMS, PRODUCTS_TOPK, *dirty_names]
+            SketchSnapshot.objects.bulk_create(
+                [SketchSnapshot(name=name, data=b'') for name in names], ignore_conflicts=True
+            )
+            rows = {
+                row.name: row
+                for row in SketchSnapshot.objects.select_for_update().filter(name__in=names).order_by('name')
+            }
+
+            stored = rows[PRODUCTS_CMS].data
+            merged = CountMinSketch.from_bytes(stored) if stored else CountMinSketch()
+            merged.table += self.pending.table
+            rows[PRODUCTS_CMS].data = merged.to_bytes()
+
+            stored = rows[PRODUCTS_TOPK].data
+            candidates = {int(key) for key in json.loads(bytes(stored))} if stored else set()
+            candidates.update(self.top.counts)
+            top = TopK()
+            for product_id in candidates:
+                top.offer(product_id, merged.estimate(product_id))
+            rows[PRODUCTS_TOPK].data = json.dumps([key for key, _ in top.items()]).encode()
+
+            for name in dirty_names:
+                key = self._parse_buyers_key(name)
+                sketch = self.buyers[key]
+                stored = rows[name].data
+                if stored:
+                    sketch.merge(HyperLogLog.from_bytes(stored))
+                rows[name].data = sketch.to_bytes()
+
+            now = timezone.now()
+            for row in rows.values():
+                row.updated_at = now
+            SketchSnapshot.objects.bulk_update(rows.values(), ['data', 'updated_at'])
+
+            # What other processes persisted since the last sync (with slack for late commits)
+            changed = SketchSnapshot.objects.filter(name__startswith=BUYERS_PREFIX).exclude(name__in=dirty_names)
+            if self.synced_at is not None:
+                changed = changed.filter(updated_at__gte=self.synced_at - timedelta(seconds=settings.SKETCH_SYNC_INTERVAL))
+            for name, data in changed.values_list('name', 'data'):
+                key = self._parse_buyers_key(name)
+                if data and key[0] >= cutoff:
+                    self.buyers[key] = HyperLogLog.from_bytes(data)
+            SketchSnapshot.objects.filter(
+                name__startswith=BUYERS_PREFIX, name__lt=buyers_key(cutoff, '')
+            ).delete()
+
+            self.products = merged
+            self.pending = CountMinSketch()
+            self.top = top
+            self.buyers = {key: sketch for key, sketch in self.buyers.items() if key[0] >= cutoff}
+            self.dirty_buyers.clear()
+            self.synced_at = now
+            self.synced_clock = time.monotonic()
+
+    @staticmethod
+    def _parse_buyers_key(name):
+        day, category = name[len(BUYERS_PREFIX):].split(':', 1)
+        return date.fromisoformat(day), category
+
+
+_sketches = None
+_sketches_lock = threading.Lock()
+
+
+def get_sketches(sync=True):
+    """
+    Return the process-wide sketches. Readers sync with the snapshots every
+    SKETCH_SYNC_INTERVAL seconds; the sales write path passes sync=False so it
+    never touches the shared rows.
+    """
+    global _sketches
+    with _sketches_lock:
+        if _sketches is None:
+            _sketches = SalesSketches()
+        sketches = _sketches
+    if sync and sketches.sync_due():
+        sketches.sync(force=False)
+    return sketches
+
+
+def loaded_sketches():
+    return _sketches
+
+
+def reset_sketches():
+    global _sketches
+    _sketches = None
@@ -0,0 +1,338 @@
+import threading
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Sum
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from products.inventory import checkout
+from products.models import Inventory, Product, Sale
+from users.models import User
+
+from .cache import get_or_compute
+from .cube import SalesCube, apply_committed_sales, get_cube, reset_cube
+from .models import SalesDailyRollup, SketchSnapshot, TrendingKind, TrendingScore
+from .sketches import CountMinSketch, HyperLogLog, SalesSketches, TopK, loaded_sketches, reset_sketches
+from .trending import TrendingTracker, reset_trending
+
+
+class SalesDailyRollupTests(TestCase):
+    def setUp(self):
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Producto {i}', brand='Marca', description='Descripción',
+                    base_price=10, category='Hogar')
+            for i in range(3)
+        ])
+        Inventory.objects.bulk_create([Inventory(product=product, quantity=100) for product in self.products])
+
+    def rollup(self):
+        return {
+            (row.day, row.product_id): (row.revenue, row.units_sold, row.sales_count)
+            for row in SalesDailyRollup.objects.all()
+        }
+
+    def test_rollup_is_maintained_incrementally_and_matches_rebuild(self):
+        product = self.products[0]
+        Sale.objects.create(product=product, quantity=2, created_at=timezone.now() - timedelta(days=40))
+        checkout([(p.id, 1) for p in self.products])
+        checkout([(product.id, 3)])
+        Sale.objects.filter(quantity=3).delete()
+
+        today = timezone.localdate()
+        incremental = self.rollup()
+        self.assertEqual(incremental[(today, product.id)], (Decimal('10.00'), 1, 1))
+        self.assertEqual(len(incremental), 4)
+
+        call_command('rebuild_sales_rollup', stdout=open('/dev/null', 'w'))
+        self.assertEqual(self.rollup(), incremental)
+
+    def test_category_follows_product(self):
+        checkout([(self.products[0].id, 1)])
+        Product.objects.filter(pk=self.products[0].pk).update(category='Deportes')
+        product = Product.objects.get(pk=self.products[0].pk)
+        product.save()
+        self.assertEqual(SalesDailyRollup.objects.get().category, 'Deportes')
+
+
+class StampedeCacheTests(TestCase):
+    key = 'analytics:test'
+
+    def setUp(self):
+        cache.delete_many([self.key, f'{self.key}:lock'])
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        time.sleep(0.2)
+        return self.calls
+
+    def test_concurrent_misses_compute_once(self):
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute(self.key, self.compute, ttl=60)))
+            for _ in range(8)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual({value for value, _ in results}, {1})
+
+    def test_stale_value_is_served_while_another_caller_recomputes(self):
+        cache.set(self.key, {'value': 'old', 'computed_at': time.time() - 120})
+        cache.add(f'{self.key}:lock', 1)
+        value, age = get_or_compute(self.key, self.compute, ttl=60)
+        self.assertEqual(value, 'old')
+        self.assertGreaterEqual(age, 120)
+        self.assertEqual(self.calls, 0)
+
+        cache.delete(f'{self.key}:lock')
+        value, age = get_or_compute(self.key, self.compute, ttl=60)
+        self.assertEqual((value, age), (1, 0.0))
+
+
+class DashboardSummaryTests(TestCase):
+    def setUp(self):
+        cache.delete_many(['analytics:dashboard:metrics', 'analytics:dashboard:summary'])
+        self.user = User.objects.create_user(email='admin@example.com', name='Admin')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        products = Product.objects.bulk_create([
+            Product(name=f'Producto {i}', brand='Marca', description='Descripción',
+                    base_price=10 + i, category='Hogar' if i % 3 else 'Deportes')
+            for i in range(6)
+        ])
+        Inventory.objects.bulk_create([
+            Inventory(product=product, quantity=0 if i % 2 else 10) for i, product in enumerate(products)
+        ])
+        Sale.objects.create(product=products[0], quantity=1, created_at=timezone.now() - timedelta(days=90))
+        checkout([(products[0].id, 2), (products[2].id, 1)])
+
+    def test_summary_matches_separate_endpoints(self):
+        with CaptureQueriesContext(connection) as ctx:
+            summary = self.client.get('/api/analytics/dashboard/summary/').data
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        metrics = self.client.get('/api/analytics/dashboard/metrics/').data
+        for key in ('last_month_sales', 'potential_losses', 'total_revenue'):
+            self.assertEqual(summary['metrics'][key], metrics[key])
+        self.assertEqual(summary['history'], self.client.get('/api/analytics/dashboard/sales-history/').data['history'])
+        self.assertEqual(
+            summary['distribution'],
+            self.client.get('/api/analytics/dashboard/category-distribution/').data['distribution']
+        )
+
+
+    def test_history_granularity_range_and_filters(self):
+        today = timezone.localdate()
+        week_ago = (today - timedelta(days=6)).isoformat()
+        response = self.client.get('/api/analytics/dashboard/sales-history/',
+                                   {'granularity': 'day', 'date_from': week_ago})
+        self.assertEqual(response.data['history'], [
+            {'date': today.isoformat(), 'total_sales': 32.0, 'sales_count': 2}
+        ])
+
+        response = self.client.get('/api/analytics/dashboard/sales-history/',
+                                   {'granularity': 'week', 'category': 'Hogar'})
+        self.assertEqual([item['sales_count'] for item in response.data['history']], [1])
+
+        response = self.client.get('/api/analytics/dashboard/sales-history/', {'brand': 'Otra'})
+        self.assertEqual(response.data['history'], [])
+
+        response = self.client.get('/api/analytics/dashboard/sales-history/', {'granularity': 'year'})
+        self.assertEqual(response.status_code, 400)
+
+class SalesCubeTests(TestCase):
+    def setUp(self):
+        reset_cube()
+        self.addCleanup(reset_cube)
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Producto {i}', brand=f'Marca {i % 2}', description='Descripción',
+                    base_price=10, category='Hogar' if i % 3 else 'Deportes')
+            for i in range(6)
+        ])
+        Inventory.objects.bulk_create([Inventory(product=product, quantity=100) for product in self.products])
+        for i, product in enumerate(self.products):
+            Sale.objects.create(product=product, quantity=i + 1, created_at=timezone.now() - timedelta(days=35 * i))
+
+    def orm_totals(self, dimension):
+        rows = Sale.objects.values(f'product__{dimension}').annotate(revenue=Sum('total_price'), units=Sum('quantity'))
+        return {row[f'product__{dimension}']: (float(row['revenue']), row['units']) for row in rows}
+
+    def cube_totals(self, cube, dimension):
+        frame = cube.query(dimensions=[dimension]).groupby(dimension)[['revenue', 'units']].sum()
+        return {key: (row['revenue'], row['units']) for key, row in frame.iterrows()}
+
+    def test_cube_matches_orm_and_applies_new_sales(self):
+        cube = get_cube()
+        self.assertEqual(self.cube_totals(cube, 'category'), self.orm_totals('category'))
+        self.assertEqual(self.cube_totals(cube, 'brand'), self.orm_totals('brand'))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout([(product.id, 2) for product in self.products])
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.filter(quantity=1).delete()
+        self.assertIs(get_cube(), cube)
+        self.assertEqual(self.cube_totals(cube, 'category'), self.orm_totals('category'))
+
+        weeks = cube.query(granularity='week', dimensions=[], date_from=timezone.localdate() - timedelta(days=6))
+        self.assertEqual(weeks['sales'].sum(), 6)
+        self.assertTrue(all(date.fromisoformat(p).weekday() == 0 for p in weeks['period']))
+
+    def test_sales_committed_during_a_reload_are_not_lost(self):
+        cube = get_cube()
+        cube.loaded_at -= settings.SALES_CUBE_MAX_AGE + 1
+        already_loaded = Sale.objects.first()
+        load = SalesCube.load.__func__
+
+        def load_while_selling(cls):
+            loaded = load(cls)
+            # Committed after the COPY: only the buffer has it. The other one the COPY already saw
+            with self.captureOnCommitCallbacks(execute=True):
+                Sale.objects.create(product=self.products[0], quantity=7)
+            apply_committed_sales([already_loaded])
+            return loaded
+
+        with mock.patch.object(SalesCube, 'load', classmethod(load_while_selling)):
+            reloaded = get_cube()
+        self.assertIsNot(reloaded, cube)
+        self.assertEqual(self.cube_totals(reloaded, 'category'), self.orm_totals('category'))
+
+    def test_sale_of_a_deleted_product_is_grouped_as_unknown(self):
+        cube = get_cube()
+        missing_id = max(product.id for product in self.products) + 1000
+        cube.apply_sales([Sale(product_id=missing_id, quantity=1, total_price=5, created_at=timezone.now())])
+
+        frame = cube.query(dimensions=['category'])
+        self.assertEqual(frame[frame['category'].isna()]['units'].sum(), 1)
+
+
+class SketchTests(TestCase):
+    def test_structures_estimate_within_bounds(self):
+        hll = HyperLogLog()
+        for user_id in range(20000):
+            hll.add(user_id)
+            hll.add(user_id)
+        self.assertAlmostEqual(hll.count(), 20000, delta=20000 * 0.05)
+
+        cms, top = CountMinSketch(), TopK(k=5)
+        for product_id in range(1, 2001):
+            units = 1000 - product_id if product_id <= 5 else 1 + product_id % 7
+            cms.add(product_id, units)
+            top.offer(product_id, cms.estimate(product_id))
+        self.assertEqual([key for key, _ in top.items()], [1, 2, 3, 4, 5])
+        self.assertGreaterEqual(cms.estimate(1), 999)
+
+    def test_processes_merge_through_snapshots(self):
+        user = User.objects.create_user(email='buyer@example.com', name='Buyer')
+        product = Product.objects.create(name='Producto', brand='Marca', description='Descripción',
+                                         base_price=10, category='Hogar')
+        first, second = SalesSketches(), SalesSketches()
+        first.sync()
+        second.sync()
+        first.record([Sale(product=product, user=user, quantity=3, created_at=timezone.now())])
+        second.record([Sale(product=product, user=user, quantity=2, created_at=timezone.now())])
+        first.sync()
+        second.sync()
+        first.sync()
+
+        today = timezone.localdate()
+        for sketches in (first, second):
+            self.assertEqual(sketches.top_products(1), [(product.id, 5)])
+            self.assertEqual(sketches.unique_buyers(today, today, 'Hogar'), (1, {today: 1}))
+
+    def test_sales_write_path_stays_in_memory(self):
+        reset_sketches()
+        self.addCleanup(reset_sketches)
+        user = User.objects.create_user(email='buyer@example.com', name='Buyer')
+        product = Product.objects.create(name='Producto', brand='Marca', description='Descripción',
+                                         base_price=10, category='Hogar')
+        Inventory.objects.create(product=product, quantity=5)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            checkout([(product.id, 2)], user=user)
+
+        # The sale stays in this process; snapshots are written when a read syncs
+        self.assertEqual(loaded_sketches().top_products(1), [(product.id, 2)])
+        self.assertFalse(SketchSnapshot.objects.exists())
+
+
+class TrendingTests(TestCase):
+    def setUp(self):
+        self.tent, self.stove, self.lamp = Product.objects.bulk_create([
+            Product(name=name, brand='Marca', description='d', base_price=10, category=category)
+            for name, category in (('Carpa', 'Camping'), ('Anafe', 'Camping'), ('Lámpara', 'Hogar'))
+        ])
+
+    def test_recent_sales_outrank_older_ones_and_processes_merge(self):
+        now = timezone.now()
+        first, second = TrendingTracker(half_life=3600), TrendingTracker(half_life=3600)
+        first.sync()
+        second.sync()
+        # 8 units two half-lives ago are worth 2 now, so 3 recent units outrank them
+        first.record([Sale(product=self.tent, quantity=8, created_at=now - timedelta(hours=2))])
+        first.record([Sale(product=self.stove, quantity=3, created_at=now)])
+        second.record([Sale(product=self.lamp, quantity=1, created_at=now)])
+        self.assertEqual([product_id for product_id, _ in first.trending_products()], [self.stove.id, self.tent.id])
+        tent_score = dict(first.trending_products())[self.tent.id]
+        self.assertAlmostEqual(tent_score, 2, places=2)
+
+        first.sync()
+        second.sync()
+        first.sync()
+        for tracker in (first, second):
+            self.assertEqual(
+                [product_id for product_id, _ in tracker.trending_products()],
+                [self.stove.id, self.tent.id, self.lamp.id]
+            )
+            self.assertEqual([product_id for product_id, _ in tracker.trending_products(category='Hogar')],
+                             [self.lamp.id])
+            self.assertEqual([category for category, _ in tracker.trending_categories()], ['Camping', 'Hogar'])
+            self.assertAlmostEqual(tracker.product_scores([self.tent.id])[self.tent.id], tent_score, places=2)
+
+    def test_late_delta_is_decayed_to_the_newer_row(self):
+        now = timezone.now()
+        half_life = timedelta(hours=settings.TRENDING_HALF_LIFE_HOURS)
+        key = (TrendingKind.PRODUCT, str(self.tent.id))
+        TrendingScore.objects.add({key: ('Camping', 4.0)}, now)
+        # A process whose sync commits late: its 4 units two half-lives back are worth 1 now
+        TrendingScore.objects.add({key: ('Camping', 4.0)}, now - 2 * half_life)
+
+        row = TrendingScore.objects.get(kind=TrendingKind.PRODUCT, key=str(self.tent.id))
+        self.assertAlmostEqual(row.score, 5.0, places=6)
+        self.assertEqual(row.updated_at, now)
+
+    def test_endpoint_reads_the_sorted_structure(self):
+        reset_trending()
+        self.addCleanup(reset_trending)
+        user = User.objects.create_user(email='trend@example.com', name='Trend')
+        client = APIClient()
+        client.force_authenticate(user)
+        with self.captureOnCommitCallbacks(execute=True):
+            Sale.objects.create(product=self.lamp, quantity=1)
+            Sale.objects.create(product=self.tent, quantity=4)
+            Sale.objects.create(product=self.stove, quantity=2)
+
+        response = client.get('/api/products/trending/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['id'] for item in response.data['data']], [self.tent.id, self.stove.id, self.lamp.id])
+        self.assertEqual(response.data['categories'][0]['category'], 'Camping')
+
+        # More sales do not change the cost of the read: one query for the products
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(20):
+                Sale.objects.create(product=self.lamp, quantity=1)
+        with self.assertNumQueries(1):
+            response = client.get('/api/products/trending/', {'category': 'Hogar', 'limit': 5})
+        self.assertEqual([item['id'] for item in response.data['data']], [self.lamp.id])
+        self.assertNotIn('categories', response.data)
@@ -0,0 +1,177 @@
+"""
+Trending products and categories: units sold with exponential decay.
+
+Scores use forward decay. With a landmark time L, a sale of q units at time t
+adds q * 2^((t - L) / half_life) to its product and its category. The decayed
+score at `now` is that sum times 2^(-(now - L) / half_life), the same factor
+for every key, so the passage of time never reorders anything: a sale is an
+O(1) dict update plus an O(log K) offer to bounded top-K heaps (overall and
+per category). Forward scores only grow, so those top-K lists are exact and
+reading them costs O(K) regardless of sales volume. The landmark is moved
+forward every REBASE_HALF_LIVES half-lives to keep the numbers in range.
+
+Each process keeps its own scores plus pending deltas in memory and, when it
+serves a read at least TRENDING_SYNC_INTERVAL seconds after the last sync,
+adds the deltas to the shared `TrendingScore` rows (stored as their value at
+updated_at, so they never overflow) and reloads the rows other processes
+changed. Like the sketches, deletions of sales are not reflected.
+"""
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import TrendingKind, TrendingScore
+from .sketches import TopK, sale_categories
+
+REBASE_HALF_LIVES = 64
+# Rows untouched for this many half-lives have decayed below a millionth and are dropped
+RETENTION_HALF_LIVES = 20
+
+
+class TrendingTracker:
+    def __init__(self, half_life=None, k=None):
+        self.half_life = half_life or settings.TRENDING_HALF_LIFE_HOURS * 3600
+        self.k = k or settings.TRENDING_TOP_K
+        self.landmark = timezone.now().timestamp()
+        self.products = {}
+        self.categories = {}
+        self.product_categories = {}
+        self.pending = {}
+        self.top_products = TopK(self.k)
+        self.top_by_category = {}
+        self.top_categories = TopK(self.k)
+        self.synced_at = None
+        self.synced_clock = 0.0
+        self._lock = threading.RLock()
+
+    def _weight(self, moment):
+        return 2 ** ((moment.timestamp() - self.landmark) / self.half_life)
+
+    def _set_product(self, product_id, category, score):
+        self.products[product_id] = score
+        self.product_categories[product_id] = category
+        self.top_products.offer(product_id, score)
+        self.top_by_category.setdefault(category, TopK(self.k)).offer(product_id, score)
+
+    def _set_category(self, category, score):
+        self.categories[category] = score
+        self.top_categories.offer(category, score)
+
+    def record(self, sales):
+        """Apply committed sales: O(1) score updates plus top-K offers per sale."""
+        sales = list(sales)
+        categories = sale_categories(sales)
+        with self._lock:
+            for sale in sales:
+                category = categories.get(sale.product_id)
+                if category is None:
+                    continue
+                delta = sale.quantity * self._weight(sale.created_at)
+                self._set_product(sale.product_id, category, self.products.get(sale.product_id, 0.0) + delta)
+                self._set_category(category, self.categories.get(category, 0.0) + delta)
+                for key in ((TrendingKind.PRODUCT, str(sale.product_id)), (TrendingKind.CATEGORY, category)):
+                    self.pending[key] = (category, self.pending.get(key, (category, 0.0))[1] + delta)
+
+    def trending_products(self, limit=10, category=None):
+        """[(product_id, score now)], best first; only the top TRENDING_TOP_K are tracked."""
+        with self._lock:
+            top = self.top_products if category is None else self.top_by_category.get(category)
+            if top is None:
+                return []
+            decay = 1 / self._weight(timezone.now())
+            return [(product_id, score * decay) for product_id, score in top.items(limit)]
+
+    def trending_categories(self, limit=10):
+        with self._lock:
+            decay = 1 / self._weight(timezone.now())
+            return [(category, score * decay) for category, score in self.top_categories.items(limit)]
+
+    def product_scores(self, product_ids):
+        """{product_id: score now} for any products, tracked in the top-K or not."""
+        with self._lock:
+            decay = 1 / self._weight(timezone.now())
+            return {product_id: self.products.get(product_id, 0.0) * decay for product_id in product_ids}
+
+    def sync_due(self):
+        return self.synced_at is None or time.monotonic() - self.synced_clock > settings.TRENDING_SYNC_INTERVAL
+
+    def sync(self, force=True):
+        """
+        Add local deltas to the shared rows and reload what other processes
+        changed since the last sync (everything still relevant the first time).
+        """
+        with self._lock, transaction.atomic():
+            if not force and not self.sync_due():
+                return
+            now = timezone.now()
+            if now.timestamp() - self.landmark > REBASE_HALF_LIVES * self.half_life:
+                self._rebase(now)
+
+            decay = 1 / self._weight(now)
+            TrendingScore.objects.add(
+                {key: (category, delta * decay) for key, (category, delta) in self.pending.items()}, now
+            )
+            self.pending = {}
+
+            retention = timedelta(seconds=RETENTION_HALF_LIVES * self.half_life)
+            changed = TrendingScore.objects.filter(updated_at__gte=now - retention)
+            if self.synced_at is not None:
+                changed = changed.filter(
+                    updated_at__gte=self.synced_at - timedelta(seconds=settings.TRENDING_SYNC_INTERVAL)
+                )
+            for kind, key, category, score, updated_at in changed.values_list(
+                'kind', 'key', 'category', 'score', 'updated_at'
+            ).iterator():
+                score *= self._weight(updated_at)
+                if kind == TrendingKind.PRODUCT:
+                    self._set_product(int(key), category, score)
+                else:
+                    self._set_category(key, score)
+            TrendingScore.objects.filter(updated_at__lt=now - retention).delete()
+
+            self.synced_at = now
+            self.synced_clock = time.monotonic()
+
+    def _rebase(self, now):
+        """Move the landmark to `now`, rescaling every score; negligible ones are dropped."""
+        factor = 1 / self._weight(now)
+        self.landmark = now.timestamp()
+        floor = 2 ** -RETENTION_HALF_LIVES
+        products = {key: score * factor for key, score in self.products.items() if score * factor >= floor}
+        categories = {key: score * factor for key, score in self.categories.items() if score * factor >= floor}
+        self.pending = {key: (category, delta * factor) for key, (category, delta) in self.pending.items()}
+        self.products, self.categories = {}, {}
+        self.top_products, self.top_by_category, self.top_categories = TopK(self.k), {}, TopK(self.k)
+        for product_id, score in products.items():
+            self._set_product(product_id, self.product_categories[product_id], score)
+        for category, score in categories.items():
+            self._set_category(category, score)
+        self.product_categories = {product_id: self.product_categories[product_id] for product_id in products}
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_trending(sync=True):
+    """
+    Return the process-wide tracker. Readers sync with the shared rows every
+    TRENDING_SYNC_INTERVAL seconds; the sales write path passes sync=False.
+    """
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = TrendingTracker()
+        tracker = _tracker
+    if sync and tracker.sync_due():
+        tracker.sync(force=False)
+    return tracker
+
+
+def reset_trending():
+    global _tracker
+    _tracker = None
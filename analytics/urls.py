@@ -5,4 +5,8 @@ urlpatterns = [
     path('dashboard/metrics/', views.get_dashboard_metrics, name='dashboard_metrics'),
     path('dashboard/sales-history/', views.get_sales_history, name='sales_history'),
     path('dashboard/category-distribution/', views.get_category_distribution, name='category_distribution'),
+    path('dashboard/summary/', views.get_dashboard_summary, name='dashboard_summary'),
+    path('cube/', views.get_sales_cube, name='sales_cube'),
+    path('sketches/top-products/', views.get_top_products, name='sketch_top_products'),
+    path('sketches/unique-buyers/', views.get_unique_buyers, name='sketch_unique_buyers'),
 ]
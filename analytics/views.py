@@ -2,13 +2,23 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
-from django.db.models import Sum, Count
+from django.db.models import F, Sum, Count, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-from products.models import Product, Sale, Inventory
-from django.db.models.functions import TruncMonth
+from products.models import Product, ProductStats
+from .cache import get_or_compute
+from .cube import GRANULARITIES, get_cube
+from .models import SalesDailyRollup
+from .sketches import HLL_PRECISION, TOP_K, get_sketches
+from django.db.models.functions import TruncMonth, TruncWeek
+
+DASHBOARD_METRICS_KEY = 'analytics:dashboard:metrics'
+DASHBOARD_SUMMARY_KEY = 'analytics:dashboard:summary'
+HISTORY_PERIODS = {'day': F('day'), 'week': TruncWeek('day'), 'month': TruncMonth('day')}
+HLL_RELATIVE_ERROR = 1.04 / (1 << HLL_PRECISION) ** 0.5
 
 @swagger_auto_schema(
     method='get',
@@ -22,6 +32,10 @@ from django.db.models.functions import TruncMonth
                     'last_month_sales': openapi.Schema(type=openapi.TYPE_NUMBER),
                     'potential_losses': openapi.Schema(type=openapi.TYPE_NUMBER),
                     'total_revenue': openapi.Schema(type=openapi.TYPE_NUMBER),
+                    'cache_age': openapi.Schema(
+                        type=openapi.TYPE_NUMBER,
+                        description="Seconds since the metrics were computed"
+                    ),
                 }
             )
         ),
@@ -33,42 +47,57 @@ from django.db.models.functions import TruncMonth
 @permission_classes([IsAuthenticated])
 def get_dashboard_metrics(request):
     try:
-        # Get last month's date
-        last_month = timezone.now() - timedelta(days=30)
-        
-        # Last month sales
-        last_month_sales = Sale.objects.filter(
-            created_at__gte=last_month
-        ).aggregate(
-            total=Sum('total_price')
-        )['total'] or 0
-        
-        # Potential losses (out of stock products * price)
-        potential_losses = Product.objects.filter(
-            inventory__quantity=0
-        ).aggregate(
-            total=Sum('base_price')
-        )['total'] or 0
-        
-        # Total revenue (all sales)
-        total_revenue = Sale.objects.aggregate(
-            total=Sum('total_price')
-        )['total'] or 0
-        
-        return Response({
-            'last_month_sales': float(last_month_sales),
-            'potential_losses': float(potential_losses),
-            'total_revenue': float(total_revenue)
-        })
+        metrics, age = get_or_compute(DASHBOARD_METRICS_KEY, compute_dashboard_metrics)
+        return Response(
+            {**metrics, 'cache_age': round(age, 1)},
+            headers={'Age': str(int(age))}
+        )
     except Exception as e:
         return Response(
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+def compute_dashboard_metrics():
+    # Get last month's date
+    last_month = timezone.localdate(timezone.now() - timedelta(days=30))
+    
+    # Last month sales (from the daily rollup)
+    last_month_sales = SalesDailyRollup.objects.filter(
+        day__gte=last_month
+    ).aggregate(
+        total=Sum('revenue')
+    )['total'] or 0
+    
+    # Potential losses (out of stock products * price)
+    potential_losses = Product.objects.filter(
+        inventory__quantity=0
+    ).aggregate(
+        total=Sum('base_price')
+    )['total'] or 0
+    
+    # Total revenue (per-product all-time counters, one row per product)
+    total_revenue = ProductStats.objects.aggregate(
+        total=Sum('revenue')
+    )['total'] or 0
+    
+    return {
+        'last_month_sales': float(last_month_sales),
+        'potential_losses': float(potential_losses),
+        'total_revenue': float(total_revenue)
+    }
+
 @swagger_auto_schema(
     method='get',
-    operation_description="Get historical sales data by month",
+    operation_description="Get historical sales data by day, week or month",
+    manual_parameters=[
+        openapi.Parameter('granularity', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          enum=list(HISTORY_PERIODS), default='month'),
+        openapi.Parameter('date_from', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="YYYY-MM-DD"),
+        openapi.Parameter('date_to', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="YYYY-MM-DD, inclusive"),
+        openapi.Parameter('category', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+        openapi.Parameter('brand', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    ],
     responses={
         200: openapi.Response(
             description="Historical data retrieved successfully",
@@ -96,18 +125,42 @@ def get_dashboard_metrics(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_sales_history(request):
+    granularity = request.GET.get('granularity', 'month')
+    if granularity not in HISTORY_PERIODS:
+        return Response(
+            {'error': f"granularity must be one of: {', '.join(HISTORY_PERIODS)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     try:
-        # Get sales by month
-        history = Sale.objects.annotate(
-            month=TruncMonth('created_at')
-        ).values('month').annotate(
-            total_sales=Sum('total_price'),
-            sales_count=Count('id')
-        ).order_by('month')
+        date_from = _parse_day(request.GET.get('date_from'))
+        date_to = _parse_day(request.GET.get('date_to'))
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        # Bounds and filters hit the (day, product), (category, day) and (brand, day) rollup indexes
+        rollup = SalesDailyRollup.objects.all()
+        if date_from:
+            rollup = rollup.filter(day__gte=date_from)
+        if date_to:
+            rollup = rollup.filter(day__lte=date_to)
+        if request.GET.get('category'):
+            rollup = rollup.filter(category=request.GET['category'])
+        if request.GET.get('brand'):
+            rollup = rollup.filter(brand=request.GET['brand'])
+
+        history = rollup.annotate(
+            period=HISTORY_PERIODS[granularity]
+        ).values('period').annotate(
+            total_sales=Sum('revenue'),
+            sales_count=Sum('sales_count')
+        ).order_by('period')
         
+        date_format = '%Y-%m' if granularity == 'month' else '%Y-%m-%d'
         return Response({
+            'granularity': granularity,
             'history': [{
-                'date': item['month'].strftime('%Y-%m'),
+                'date': item['period'].strftime(date_format),
                 'total_sales': float(item['total_sales']),
                 'sales_count': item['sales_count']
             } for item in history]
@@ -173,3 +226,218 @@ def get_category_distribution(request):
             {'error': str(e)},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Get metrics, monthly sales history and category distribution in one call",
+    responses={
+        200: openapi.Response(
+            description="Summary retrieved successfully",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'metrics': openapi.Schema(type=openapi.TYPE_OBJECT),
+                    'history': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                    'distribution': openapi.Schema(type=openapi.TYPE_ARRAY, items=openapi.Schema(type=openapi.TYPE_OBJECT)),
+                    'cache_age': openapi.Schema(
+                        type=openapi.TYPE_NUMBER,
+                        description="Seconds since the summary was computed"
+                    ),
+                }
+            )
+        ),
+        401: openapi.Response(description="Unauthorized"),
+        500: openapi.Response(description="Server error")
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_dashboard_summary(request):
+    try:
+        summary, age = get_or_compute(DASHBOARD_SUMMARY_KEY, compute_dashboard_summary)
+        return Response(
+            {**summary, 'cache_age': round(age, 1)},
+            headers={'Age': str(int(age))}
+        )
+    except Exception as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+def compute_dashboard_summary():
+    """Everything the dashboard shows, in two SQL statements."""
+    last_month = timezone.localdate(timezone.now() - timedelta(days=30))
+
+    # 1. Monthly history; last-month and all-time totals fall out of the same scan
+    months = list(SalesDailyRollup.objects.annotate(
+        month=TruncMonth('day')
+    ).values('month').annotate(
+        total_sales=Sum('revenue'),
+        sales_count=Sum('sales_count'),
+        last_month_sales=Sum('revenue', filter=Q(day__gte=last_month))
+    ).order_by('month'))
+
+    # 2. Category split; out-of-stock losses via conditional aggregation
+    categories = list(Product.objects.values('category').annotate(
+        count=Count('id', distinct=True),
+        potential_losses=Sum('base_price', filter=Q(inventory__quantity=0))
+    ).order_by('-count'))
+    total_products = sum(item['count'] for item in categories)
+
+    return {
+        'metrics': {
+            'last_month_sales': float(sum(item['last_month_sales'] or 0 for item in months)),
+            'potential_losses': float(sum(item['potential_losses'] or 0 for item in categories)),
+            'total_revenue': float(sum(item['total_sales'] for item in months)),
+        },
+        'history': [{
+            'date': item['month'].strftime('%Y-%m'),
+            'total_sales': float(item['total_sales']),
+            'sales_count': item['sales_count']
+        } for item in months],
+        'distribution': [{
+            'category': item['category'],
+            'count': item['count'],
+            'percentage': (item['count'] / total_products) * 100
+        } for item in categories]
+    }
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Slice and dice sales by period, category and brand from the in-memory sales cube",
+    manual_parameters=[
+        openapi.Parameter('granularity', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          enum=list(GRANULARITIES), default='month'),
+        openapi.Parameter('group_by', openapi.IN_QUERY, type=openapi.TYPE_STRING, default='category',
+                          description="Comma-separated dimensions: category, brand (empty for totals per period)"),
+        openapi.Parameter('date_from', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="YYYY-MM-DD"),
+        openapi.Parameter('date_to', openapi.IN_QUERY, type=openapi.TYPE_STRING, description="YYYY-MM-DD, inclusive"),
+        openapi.Parameter('category', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Only these categories (repeatable)"),
+        openapi.Parameter('brand', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="Only these brands (repeatable)"),
+    ],
+    responses={
+        200: openapi.Response(description="Cube slice retrieved successfully"),
+        400: openapi.Response(description="Invalid parameters"),
+        401: openapi.Response(description="Unauthorized"),
+        500: openapi.Response(description="Server error")
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_sales_cube(request):
+    granularity = request.GET.get('granularity', 'month')
+    group_by = [d for d in request.GET.get('group_by', 'category').split(',') if d]
+    try:
+        date_from = _parse_day(request.GET.get('date_from'))
+        date_to = _parse_day(request.GET.get('date_to'))
+        cube = get_cube()
+        frame = cube.query(
+            granularity=granularity,
+            dimensions=group_by,
+            date_from=date_from,
+            date_to=date_to,
+            categories=request.GET.getlist('category'),
+            brands=request.GET.getlist('brand'),
+        )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+    frame['revenue'] = frame['revenue'].round(2)
+    return Response({
+        'granularity': granularity,
+        'group_by': group_by,
+        'rows': frame.to_dict('records'),
+        'cube': {'sales': cube.size, 'memory_bytes': cube.nbytes},
+    })
+
+def _parse_day(value):
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(f'Invalid date: {value}')
+    return day
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Top selling products (all time) estimated by a count-min sketch",
+    manual_parameters=[
+        openapi.Parameter('limit', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, default=10,
+                          description=f"Number of products (max {TOP_K})"),
+    ],
+    responses={
+        200: openapi.Response(description="Top products retrieved successfully"),
+        401: openapi.Response(description="Unauthorized"),
+        500: openapi.Response(description="Server error")
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_top_products(request):
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), TOP_K)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        sketches = get_sketches()
+        top = sketches.top_products(limit)
+        names = Product.objects.in_bulk([product_id for product_id, _ in top])
+        return Response({
+            'products': [{
+                'product_id': product_id,
+                'name': names[product_id].name if product_id in names else None,
+                'estimated_units': units
+            } for product_id, units in top],
+            'memory_bytes': sketches.nbytes
+        })
+    except Exception as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Distinct buyers per day (and over the whole range) estimated by HyperLogLog",
+    manual_parameters=[
+        openapi.Parameter('date_from', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="YYYY-MM-DD, defaults to 30 days ago"),
+        openapi.Parameter('date_to', openapi.IN_QUERY, type=openapi.TYPE_STRING,
+                          description="YYYY-MM-DD, inclusive, defaults to today"),
+        openapi.Parameter('category', openapi.IN_QUERY, type=openapi.TYPE_STRING),
+    ],
+    responses={
+        200: openapi.Response(description="Unique buyers retrieved successfully"),
+        400: openapi.Response(description="Invalid parameters"),
+        401: openapi.Response(description="Unauthorized"),
+        500: openapi.Response(description="Server error")
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_unique_buyers(request):
+    try:
+        date_to = _parse_day(request.GET.get('date_to')) or timezone.localdate()
+        date_from = _parse_day(request.GET.get('date_from')) or date_to - timedelta(days=30)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        total, per_day = get_sketches().unique_buyers(date_from, date_to, request.GET.get('category'))
+        return Response({
+            'unique_buyers': total,
+            'by_day': [{'date': day.isoformat(), 'unique_buyers': count} for day, count in per_day.items()],
+            'relative_error': round(HLL_RELATIVE_ERROR, 4)
+        })
+    except Exception as e:
+        return Response(
+            {'error': str(e)},
+            status=status.HTTP_500_INTERNAL_SERVER_ERROR
+        )
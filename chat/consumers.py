@@ -6,8 +6,10 @@ from django.contrib.auth import get_user_model
 from asgiref.sync import sync_to_async
 import jwt
 from django.conf import settings
-from django.db.models import Count, Avg, F
+from django.db.models import F
 from products.models import Product, Sale
+from analytics.trending import get_trending
+from recommendations.models import UserAffinity
 from decimal import Decimal
 
 logger = logging.getLogger(__name__)
@@ -112,15 +114,12 @@ class ChatConsumer(AsyncWebsocketConsumer):
         try:
             if not self.products_cache:
                 # Obtener productos con sus métricas
-                self.products_cache = list(Product.objects.annotate(
-                    total_sales=Count('sale'),
-                    avg_rating=Avg('ratings__score'),
-                    total_ratings=Count('ratings'),
-                    current_stock=F('inventory__quantity'),
-                ).values(
+                self.products_cache = list(Product.objects.with_catalog_stats().values(
                     'id', 'name', 'category', 'brand', 'base_price',
-                    'description', 'total_sales', 'avg_rating', 
-                    'total_ratings', 'current_stock'
+                    'description', 'avg_rating',
+                    total_sales=F('num_sales'),
+                    total_ratings=F('num_ratings'),
+                    current_stock=F('stock'),
                 ))
             return self.products_cache
         except Exception as e:
@@ -136,7 +135,6 @@ class ChatConsumer(AsyncWebsocketConsumer):
             
             sales_data = []
             total_revenue = 0
-            product_counts = {}
             
             for sale in sales:
                 sale_dict = {
@@ -149,19 +147,26 @@ class ChatConsumer(AsyncWebsocketConsumer):
                 sales_data.append(sale_dict)
                 
                 total_revenue += float(sale.total_price)
-                product_counts[sale.product.name] = product_counts.get(sale.product.name, 0) + sale.quantity
             
-            # Obtener productos más vendidos
-            top_products = [
-                {'name': name, 'quantity': qty} 
-                for name, qty in sorted(product_counts.items(), key=lambda x: x[1], reverse=True)
-            ][:3]
+            # Lo que está en tendencia: unidades vendidas con decaimiento, no el total histórico
+            trending = get_trending()
+            top = trending.trending_products(3)
+            names = Product.objects.in_bulk([product_id for product_id, _ in top])
+            trending_products = [
+                {'name': names[product_id].name, 'category': names[product_id].category, 'score': round(score, 2)}
+                for product_id, score in top if product_id in names
+            ]
+            trending_categories = [
+                {'category': category, 'score': round(score, 2)}
+                for category, score in trending.trending_categories(3)
+            ]
             
             return {
                 'total_sales': len(sales_data),
                 'total_revenue': total_revenue,
                 'recent_sales': sales_data,
-                'top_products': top_products
+                'trending_products': trending_products,
+                'trending_categories': trending_categories
             }
             
         except Exception as e:
@@ -184,6 +189,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
             # Obtener datos contextuales
             products = await self.get_products_data()
             sales_data = await self.get_sales_data()
+            profile = await sync_to_async(UserAffinity.objects.profile)(user.id)
+            preferred_categories = ', '.join(value for value, _ in profile['categories'][:5]) or 'Sin datos'
+            preferred_brands = ', '.join(value for value, _ in profile['brands'][:5]) or 'Sin datos'
             
             # Convertir Decimal a float para serialización
             products = self.decimal_to_float(products) if products else None
@@ -211,6 +219,8 @@ class ChatConsumer(AsyncWebsocketConsumer):
             Contexto del usuario:
             - Nombre: {user.username}
             - Rol: {'Administrador' if user.is_staff else 'Cliente'}
+            - Categorías preferidas: {preferred_categories}
+            - Marcas preferidas: {preferred_brands}
             
             Datos de productos disponibles:
             {json.dumps(products, indent=2) if products else 'No hay datos de productos disponibles'}
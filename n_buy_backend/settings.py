@@ -49,6 +49,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'drf_yasg',
     'corsheaders',
@@ -104,6 +105,84 @@ CHANNEL_LAYERS = {
     }
 }
 
+# Caché: memoria local por defecto, Redis con CACHE_BACKEND=redis
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+if os.environ.get('CACHE_BACKEND', 'locmem').lower() == 'redis':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_URL', 'redis://localhost:6379/0'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'n-buy-backend',
+        }
+    }
+
+# Segundos que se conserva una respuesta cacheada del catálogo
+CATALOG_CACHE_TTL = int(os.environ.get('CATALOG_CACHE_TTL', 300))
+
+# Métricas del dashboard: segundos que se consideran frescas y ventana extra
+# en la que se sirven viejas mientras un único proceso las recalcula
+DASHBOARD_CACHE_TTL = int(os.environ.get('DASHBOARD_CACHE_TTL', 60))
+DASHBOARD_CACHE_STALE_TTL = int(os.environ.get('DASHBOARD_CACHE_STALE_TTL', 600))
+
+# Segundos tras los que cada proceso recarga su cubo de ventas en memoria
+SALES_CUBE_MAX_AGE = int(os.environ.get('SALES_CUBE_MAX_AGE', 900))
+
+# Sketches de ventas: cada cuánto se sincronizan con la base y días de HyperLogLog que se conservan
+SKETCH_SYNC_INTERVAL = int(os.environ.get('SKETCH_SYNC_INTERVAL', 60))
+SKETCH_RETENTION_DAYS = int(os.environ.get('SKETCH_RETENTION_DAYS', 90))
+
+# Tendencias: horas en que el puntaje de un producto o categoría pierde la mitad,
+# productos que se mantienen ordenados por categoría y cada cuánto se sincronizan con la base
+TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 24))
+TRENDING_TOP_K = int(os.environ.get('TRENDING_TOP_K', 50))
+TRENDING_SYNC_INTERVAL = int(os.environ.get('TRENDING_SYNC_INTERVAL', 60))
+
+# Recomendaciones: 'local' (filtrado colaborativo) o 'llm' (Gemini)
+RECOMMENDATION_ENGINE = os.environ.get('RECOMMENDATION_ENGINE', 'local').lower()
+RECOMMENDATION_NEIGHBOURS = int(os.environ.get('RECOMMENDATION_NEIGHBOURS', 50))
+RECOMMENDATION_BUCKET_SIZE = int(os.environ.get('RECOMMENDATION_BUCKET_SIZE', 10))
+RECOMMENDATION_MODEL_MAX_AGE = int(os.environ.get('RECOMMENDATION_MODEL_MAX_AGE', 3600))
+# Segundos que valen las recomendaciones precalculadas (compute_recommendations)
+RECOMMENDATION_MAX_AGE = int(os.environ.get('RECOMMENDATION_MAX_AGE', 86400))
+
+# Caché de respuestas del LLM: TTL, entradas en memoria por proceso y cambios
+# del catálogo (productos, ratings, ventas) que la invalidan
+LLM_CACHE_TTL = int(os.environ.get('LLM_CACHE_TTL', 3600))
+LLM_CACHE_MAX_ENTRIES = int(os.environ.get('LLM_CACHE_MAX_ENTRIES', 128))
+LLM_CACHE_CHANGE_THRESHOLD = int(os.environ.get('LLM_CACHE_CHANGE_THRESHOLD', 100))
+
+# Preselección para el prompt: máximo de candidatos y presupuesto de tokens del prompt completo
+LLM_MAX_CANDIDATES = int(os.environ.get('LLM_MAX_CANDIDATES', 200))
+LLM_PROMPT_TOKEN_BUDGET = int(os.environ.get('LLM_PROMPT_TOKEN_BUDGET', 8000))
+
+# Plazo en segundos de cada llamada al LLM (incluida la espera de turno) y llamadas simultáneas
+# por proceso (compartidas por todos sus event loops e hilos)
+LLM_TIMEOUT = float(os.environ.get('LLM_TIMEOUT', 20))
+LLM_MAX_CONCURRENCY = int(os.environ.get('LLM_MAX_CONCURRENCY', 16))
+# Segundos que /api/recommendations/ espera al LLM antes de responder con la clasificación local
+RECOMMENDATION_DEADLINE = float(os.environ.get('RECOMMENDATION_DEADLINE', 5))
+# Circuit breaker: fallos seguidos que lo abren y segundos hasta la llamada de prueba
+LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', 5))
+LLM_BREAKER_RESET_TIMEOUT = float(os.environ.get('LLM_BREAKER_RESET_TIMEOUT', 30))
+
+# Perfiles de preferencias: días en que una afinidad pierde la mitad de su peso
+# y afinidades que se conservan por usuario y tipo (categoría, marca)
+PREFERENCE_HALF_LIFE_DAYS = float(os.environ.get('PREFERENCE_HALF_LIFE_DAYS', 30))
+PREFERENCE_TOP_K = int(os.environ.get('PREFERENCE_TOP_K', 20))
+
+# Productos similares: dimensiones del vector de contenido, resultados por
+# defecto y segundos tras los que cada proceso relee los vectores de la base
+SIMILAR_PRODUCTS_DIMENSIONS = int(os.environ.get('SIMILAR_PRODUCTS_DIMENSIONS', 128))
+SIMILAR_PRODUCTS_LIMIT = int(os.environ.get('SIMILAR_PRODUCTS_LIMIT', 10))
+SIMILAR_PRODUCTS_SYNC_INTERVAL = int(os.environ.get('SIMILAR_PRODUCTS_SYNC_INTERVAL', 30))
+
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
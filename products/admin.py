@@ -3,10 +3,26 @@ from .models import Product, Sale, Inventory, Rating
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
-    list_display = ('name', 'brand', 'base_price', 'current_price', 'category', 'created_at')
+    list_display = ('name', 'brand', 'base_price', 'current_price', 'category',
+                    'rating', 'num_ratings', 'stock', 'created_at')
     list_filter = ('brand', 'category')
     search_fields = ('name', 'brand', 'description')
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_catalog_stats()
+
+    @admin.display(description='Rating', ordering='avg_rating')
+    def rating(self, obj):
+        return obj.average_rating
+
+    @admin.display(description='Ratings', ordering='num_ratings')
+    def num_ratings(self, obj):
+        return obj.num_ratings
+
+    @admin.display(description='Stock', ordering='stock')
+    def stock(self, obj):
+        return obj.stock
+
 @admin.register(Sale)
 class SaleAdmin(admin.ModelAdmin):
     list_display = ('product', 'quantity', 'unit_price', 'total_price', 'created_at')
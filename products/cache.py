@@ -0,0 +1,85 @@
+"""
+Caché de respuestas de lectura del catálogo.
+
+Las claves incluyen una versión del catálogo; cualquier escritura de
+productos, inventario o ratings incrementa la versión (ver receivers.py) y
+deja todas las respuestas anteriores fuera de uso sin tener que borrarlas una
+por una. Las entradas viejas expiran solas por TTL.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog:version'
+HITS_KEY = 'catalog:stats:hits'
+MISSES_KEY = 'catalog:stats:misses'
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # La clave no existe todavía (o expiró): se inicializa
+        if cache.add(key, 1, timeout=None):
+            return 1
+        return cache.incr(key)
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        cache.add(CATALOG_VERSION_KEY, 1, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, 1)
+    return version
+
+
+def bump_catalog_version():
+    return _incr(CATALOG_VERSION_KEY)
+
+
+def cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'version': catalog_version(),
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else 0,
+    }
+
+
+def response_cache_key(prefix, request, view_kwargs):
+    params = sorted((key, request.GET.getlist(key)) for key in request.GET)
+    raw = repr((params, sorted(view_kwargs.items())))
+    digest = hashlib.sha1(raw.encode('utf-8')).hexdigest()
+    return f'catalog:{catalog_version()}:{prefix}:{digest}'
+
+
+def cache_catalog_response(prefix):
+    """
+    Cachea las respuestas 200 de una vista de lectura del catálogo.
+    Se aplica debajo de @api_view/@permission_classes, así que la
+    autenticación se sigue validando en cada petición.
+    """
+    def decorator(view_func):
+        @wraps(view_func)
+        def wrapped_view(request, *args, **kwargs):
+            key = response_cache_key(prefix, request, kwargs)
+            data = cache.get(key)
+            if data is not None:
+                _incr(HITS_KEY)
+                return Response(data, headers={'X-Cache': 'HIT'})
+
+            _incr(MISSES_KEY)
+            response = view_func(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(key, response.data, timeout=settings.CATALOG_CACHE_TTL)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapped_view
+    return decorator
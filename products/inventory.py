@@ -0,0 +1,110 @@
+"""
+Reserva de inventario segura ante compras concurrentes.
+
+Toda reserva bloquea las filas de inventario con SELECT ... FOR UPDATE en orden
+de id antes de descontar, así que dos compras simultáneas no pueden vender la
+misma unidad y, al tomar los bloqueos siempre en el mismo orden, tampoco
+pueden esperarse mutuamente (deadlock).
+"""
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Inventory, Product, Sale
+from .signals import sales_recorded
+
+
+class InsufficientStock(Exception):
+    def __init__(self, product_id, requested):
+        self.product_id = product_id
+        self.requested = requested
+        super().__init__(f'No hay suficiente inventario para el producto {product_id}')
+
+
+def reserve_stock(product_id, quantity):
+    """Descuenta `quantity` unidades del producto dentro de la transacción en curso."""
+    reserve_stock_many({product_id: quantity})
+
+
+def reserve_stock_many(quantities):
+    """
+    Descuenta varias cantidades {product_id: unidades} en dos consultas: un
+    SELECT ... FOR UPDATE de todas las filas de inventario (en orden de id,
+    para no generar deadlocks con otras compras) y un único bulk_update.
+    """
+    rows = list(
+        Inventory.objects.select_for_update()
+        .filter(product_id__in=list(quantities))
+        .order_by('id')
+    )
+    rows_by_product = defaultdict(list)
+    for row in rows:
+        rows_by_product[row.product_id].append(row)
+
+    now = timezone.now()
+    changed = []
+    for product_id, quantity in quantities.items():
+        product_rows = rows_by_product[product_id]
+        if sum(row.quantity for row in product_rows) < quantity:
+            raise InsufficientStock(product_id, quantity)
+        remaining = quantity
+        for row in product_rows:
+            if remaining == 0:
+                break
+            take = min(row.quantity, remaining)
+            if take > 0:
+                row.quantity -= take
+                row.last_updated = now
+                remaining -= take
+                changed.append(row)
+    Inventory.objects.bulk_update(changed, ['quantity', 'last_updated'])
+    # bulk_update no emite post_save: el stock cacheado del catálogo se invalida aquí
+    transaction.on_commit(bump_catalog_version)
+
+
+def checkout(lines, user=None):
+    """
+    Registra un carrito completo en una transacción: todo o nada.
+    `lines` es una lista de (product_id, quantity). Devuelve las ventas creadas.
+    """
+    quantities = defaultdict(int)
+    for product_id, quantity in lines:
+        quantities[product_id] += quantity
+
+    with transaction.atomic():
+        products = Product.objects.with_current_price().in_bulk(list(quantities))
+        missing = [product_id for product_id in quantities if product_id not in products]
+        if missing:
+            raise Product.DoesNotExist(f'Productos no encontrados: {missing}')
+
+        reserve_stock_many(quantities)
+
+        now = timezone.now()
+        sales = Sale.objects.bulk_create([
+            Sale(
+                user=user,
+                product=products[product_id],
+                unit_price=products[product_id].effective_price,
+                quantity=quantity,
+                total_price=products[product_id].effective_price * quantity,
+                created_at=now
+            )
+            for product_id, quantity in lines
+        ])
+        # bulk_create no pasa por Sale.save()
+        sales_recorded.send(sender=Sale, sales=sales)
+    return sales
+
+
+def place_sale(product, quantity, user=None):
+    """Reserva el stock y registra la venta en la misma transacción."""
+    with transaction.atomic():
+        reserve_stock(product.id, quantity)
+        return Sale.objects.create(
+            user=user,
+            product=product,
+            quantity=quantity,
+            unit_price=product.current_price
+        )
@@ -0,0 +1,67 @@
+"""
+Utilidades compartidas por los comandos de benchmark.
+
+Los datos sintéticos se crean dentro de una transacción que se revierte al
+final, por lo que los benchmarks se pueden ejecutar contra cualquier base de
+datos sin dejar rastro.
+"""
+import math
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from users.models import User
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def measure(func, iterations=20):
+    """Ejecuta `func` varias veces y devuelve consultas por llamada y latencias en ms."""
+    func()  # Calentamiento
+    samples = []
+    with CaptureQueriesContext(connection) as ctx:
+        start_queries = len(ctx.captured_queries)
+        for _ in range(iterations):
+            start = time.perf_counter()
+            func()
+            samples.append((time.perf_counter() - start) * 1000)
+        total_queries = len(ctx.captured_queries) - start_queries
+    return {
+        'queries': total_queries / iterations,
+        'p50': percentile(samples, 50),
+        'p95': percentile(samples, 95),
+    }
+
+
+@contextmanager
+def rollback_atomic():
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def benchmark_user():
+    return User.objects.create_user(
+        email='benchmark@example.com',
+        name='Benchmark',
+        password=None
+    )
+
+
+def call_view(view, user, path='/', params=None, method='get', data=None, **view_kwargs):
+    factory = APIRequestFactory()
+    if method == 'get':
+        request = factory.get(path, params or {})
+    else:
+        request = getattr(factory, method)(path, data or {}, format='json')
+    force_authenticate(request, user=user)
+    return view(request, **view_kwargs)
@@ -0,0 +1,76 @@
+import random
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import Avg
+
+from products.models import Product, Inventory, Rating
+from products.views import get_products
+from users.models import User
+from ._benchmark import benchmark_user, call_view, measure, rollback_atomic
+
+
+class Command(BaseCommand):
+    help = 'Benchmark get_products: query count and latency per page size'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=500)
+        parser.add_argument('--ratings-per-product', type=int, default=5)
+        parser.add_argument('--iterations', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with rollback_atomic():
+            user = benchmark_user()
+            self.create_catalog(options['products'], options['ratings_per_product'])
+
+            self.stdout.write(f"{'limit':>6} {'path':>9} {'queries':>8} {'p50 ms':>8} {'p95 ms':>8}")
+            for limit in (10, 50, 200):
+                results = {
+                    'legacy': measure(lambda: self.legacy_page(limit), options['iterations']),
+                    'annotated': measure(
+                        lambda: call_view(get_products, user, params={'limit': limit}),
+                        options['iterations']
+                    ),
+                }
+                for path, result in results.items():
+                    self.stdout.write(
+                        f"{limit:>6} {path:>9} {result['queries']:>8.0f} "
+                        f"{result['p50']:>8.2f} {result['p95']:>8.2f}"
+                    )
+
+    def create_catalog(self, num_products, ratings_per_product):
+        raters = User.objects.bulk_create([
+            User(email=f'rater{i}@example.com', name=f'Rater {i}')
+            for i in range(ratings_per_product)
+        ])
+        products = Product.objects.bulk_create([
+            Product(
+                name=f'Producto {i}',
+                brand=f'Marca {i % 20}',
+                description=f'Descripción del producto {i}',
+                base_price=Decimal(random.randint(1000, 100000)) / 100,
+                category=f'Categoría {i % 10}',
+            )
+            for i in range(num_products)
+        ])
+        Inventory.objects.bulk_create([
+            Inventory(product=product, quantity=random.randint(0, 100))
+            for product in products
+        ])
+        Rating.objects.bulk_create([
+            Rating(user=rater, product=product, score=random.randint(1, 5))
+            for product in products
+            for rater in raters
+        ])
+
+    def legacy_page(self, limit):
+        """Recorrido anterior: dos consultas de ratings por producto."""
+        data = []
+        for product in Product.objects.order_by('id')[:limit]:
+            avg_rating = product.ratings.aggregate(avg=Avg('score'))['avg']
+            data.append({
+                'id': product.id,
+                'rating': round(avg_rating, 2) if avg_rating is not None else 0,
+                'num_ratings': product.ratings.count(),
+            })
+        return data
@@ -0,0 +1,59 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from products.inventory import InsufficientStock, place_sale
+from products.models import Inventory, Product, Sale
+
+
+class Command(BaseCommand):
+    help = 'Stress-test concurrent checkouts: sales/sec and oversell check per number of buyers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stock', type=int, default=2000)
+        parser.add_argument('--buyers', type=int, nargs='+', default=[1, 8, 64])
+
+    def handle(self, *args, **options):
+        # Los hilos usan conexiones propias, así que los datos se confirman y se borran al final
+        product = Product.objects.create(
+            name='Benchmark inventario', brand='Benchmark', description='Producto sintético',
+            base_price=10, category='Benchmark'
+        )
+        try:
+            self.stdout.write(f"{'buyers':>7} {'sold':>6} {'stock left':>11} {'sales/sec':>10}")
+            for buyers in options['buyers']:
+                Sale.objects.filter(product=product).delete()
+                Inventory.objects.filter(product=product).delete()
+                Inventory.objects.create(product=product, quantity=options['stock'])
+
+                sold, elapsed = self.run_buyers(product, buyers)
+                left = Inventory.objects.get(product=product).quantity
+                self.stdout.write(f'{buyers:>7} {sold:>6} {left:>11} {sold / elapsed:>10.1f}')
+                if sold != options['stock'] or left != 0:
+                    self.stdout.write(self.style.ERROR('Oversell or lost update detected'))
+        finally:
+            product.delete()
+
+    def run_buyers(self, product, buyers):
+        sold = []
+
+        def buyer():
+            try:
+                while True:
+                    try:
+                        place_sale(product, 1)
+                    except InsufficientStock:
+                        return
+                    sold.append(1)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=buyer) for _ in range(buyers)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return len(sold), time.perf_counter() - start
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from products.models import Product
+from ._benchmark import measure, rollback_atomic
+
+WORDS = [
+    'mochila', 'auriculares', 'portátil', 'teclado', 'zapatillas', 'camiseta',
+    'reloj', 'cafetera', 'lámpara', 'silla', 'escritorio', 'monitor', 'cámara',
+    'altavoz', 'bicicleta', 'chaqueta', 'tostadora', 'licuadora', 'tablet', 'ratón',
+    'inalámbrico', 'resistente', 'ergonómico', 'compacto', 'premium', 'recargable',
+]
+BRANDS = ['Samsung', 'Sony', 'Lenovo', 'Nike', 'Adidas', 'Philips', 'Bosch', 'Apple']
+CATEGORIES = ['Electrónica', 'Deportes', 'Hogar', 'Moda', 'Oficina']
+
+QUERIES = ['M4217', 'mochila', 'auriculares inalámbricos', 'samsung monitor', 'mochil']
+
+
+class Command(BaseCommand):
+    help = 'Benchmark product search: icontains scan vs full-text + trigram indexes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1_000_000)
+        parser.add_argument('--iterations', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with rollback_atomic():
+            self.stdout.write(f"Generando {options['products']} productos sintéticos...")
+            self.create_catalog(options['products'])
+
+            self.stdout.write(f"{'query':>26} {'path':>9} {'rows':>8} {'p50 ms':>9} {'p95 ms':>9}")
+            for text in QUERIES:
+                paths = {
+                    'icontains': lambda: Product.objects.filter(
+                        Q(name__icontains=text) | Q(description__icontains=text)
+                    ).order_by('id'),
+                    'search': lambda: Product.objects.search(text),
+                }
+                for path, build in paths.items():
+                    rows = build().count()
+                    result = measure(lambda: (build().count(), list(build()[:10])), options['iterations'])
+                    self.stdout.write(
+                        f"{text:>26} {path:>9} {rows:>8} {result['p50']:>9.2f} {result['p95']:>9.2f}"
+                    )
+
+    def create_catalog(self, num_products):
+        """
+        Inserta el catálogo con generate_series; el trigger calcula search_vector.
+        Cada producto combina un tipo, una marca, dos adjetivos y un código de
+        modelo, así que hay términos frecuentes y términos muy selectivos.
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO products (name, brand, description, base_price, discount_percentage,
+                                      category, created_at)
+                SELECT
+                    initcap(w[1 + floor(random() * n)::int]) || ' ' || brand || ' M' || i,
+                    brand,
+                    'Modelo M' || i || ' ' || w[1 + floor(random() * n)::int] || ' '
+                        || w[1 + floor(random() * n)::int] || ' con acabado '
+                        || w[1 + floor(random() * n)::int] || ' y garantía extendida',
+                    (random() * 1000)::numeric(10, 2),
+                    0,
+                    c[1 + floor(random() * nc)::int],
+                    now()
+                FROM generate_series(1, %s) AS i,
+                     (SELECT %s::text[] AS w, %s::text[] AS b, %s::text[] AS c) AS vocab,
+                     LATERAL (SELECT cardinality(w) AS n, cardinality(c) AS nc,
+                                     b[1 + abs(hashint4(i)) %% cardinality(b)] AS brand) AS row_values
+                """,
+                [num_products, WORDS, BRANDS, CATEGORIES]
+            )
+            cursor.execute('ANALYZE products')
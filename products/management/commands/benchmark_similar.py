@@ -0,0 +1,56 @@
+import itertools
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+
+from products.models import Product
+from products.similarity import get_index, refresh_embeddings, reset_index
+from products.views import get_similar_products
+from ._benchmark import benchmark_user, call_view, measure, rollback_atomic
+from .benchmark_search import Command as SearchBenchmark
+
+
+class Command(BaseCommand):
+    help = 'Benchmark /api/products/<id>/similar: embedding build, index load and top-K latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=100_000)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with rollback_atomic():
+            user = benchmark_user()
+            self.stdout.write(f"Generando {options['products']} productos sintéticos...")
+            SearchBenchmark().create_catalog(options['products'])
+            product_ids = list(Product.objects.values_list('id', flat=True))
+
+            started = time.perf_counter()
+            for start in range(0, len(product_ids), 5000):
+                refresh_embeddings(product_ids[start:start + 5000])
+            self.stdout.write(f'Vectores calculados y guardados: {time.perf_counter() - started:.1f} s')
+
+            reset_index()
+            started = time.perf_counter()
+            index = get_index()
+            self.stdout.write(f'Índice cargado ({len(index)} productos): {time.perf_counter() - started:.1f} s')
+
+            # Ids al azar para que la caché de respuestas del catálogo no intervenga
+            sample = itertools.cycle(random.sample(product_ids, min(len(product_ids), 1000)))
+            cache.clear()
+            results = {
+                'index': measure(lambda: index.similar(next(sample), options['limit']), options['iterations']),
+                'endpoint': measure(
+                    lambda: call_view(get_similar_products, user, params={'limit': options['limit']},
+                                      product_id=next(sample)),
+                    options['iterations']
+                ),
+            }
+            self.stdout.write(f"{'path':>9} {'queries':>8} {'p50 ms':>8} {'p95 ms':>8}")
+            for path, result in results.items():
+                self.stdout.write(
+                    f"{path:>9} {result['queries']:>8.0f} {result['p50']:>8.2f} {result['p95']:>8.2f}"
+                )
+        reset_index()
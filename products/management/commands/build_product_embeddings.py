@@ -0,0 +1,31 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.models import Product
+from products.similarity import refresh_embeddings
+
+
+class Command(BaseCommand):
+    help = 'Compute and store the content embeddings used by /api/products/<id>/similar'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--missing-only', action='store_true',
+                            help='Only embed products that have no stored vector yet')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        products = Product.objects.order_by('id')
+        if options['missing_only']:
+            products = products.filter(embedding__isnull=True)
+        product_ids = list(products.values_list('id', flat=True))
+        size = options['batch_size']
+        stored = 0
+        for start in range(0, len(product_ids), size):
+            with transaction.atomic():
+                stored += refresh_embeddings(product_ids[start:start + size])
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully stored {stored} product embeddings in {time.perf_counter() - started:.1f} s'
+        ))
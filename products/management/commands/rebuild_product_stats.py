@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from products.models import ProductStats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the product_stats table from ratings and sales'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--product', type=int, action='append', dest='product_ids',
+            help='Rebuild only this product id (can be repeated)'
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            ProductStats.objects.rebuild(options['product_ids'])
+        count = ProductStats.objects.count()
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt stats for {count} products'))
@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 11:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+BACKFILL_SQL = """
+INSERT INTO product_stats (product_id, rating_sum, rating_count, rating_1_count, rating_2_count,
+                           rating_3_count, rating_4_count, rating_5_count, units_sold, sales_count,
+                           revenue, last_sale_at)
+SELECT p.id,
+       COALESCE(r.rating_sum, 0), COALESCE(r.rating_count, 0),
+       COALESCE(r.c1, 0), COALESCE(r.c2, 0), COALESCE(r.c3, 0), COALESCE(r.c4, 0), COALESCE(r.c5, 0),
+       COALESCE(s.units_sold, 0), COALESCE(s.sales_count, 0), COALESCE(s.revenue, 0), s.last_sale_at
+FROM products p
+LEFT JOIN (
+    SELECT product_id, SUM(score) AS rating_sum, COUNT(*) AS rating_count,
+           COUNT(*) FILTER (WHERE score = 1) AS c1, COUNT(*) FILTER (WHERE score = 2) AS c2,
+           COUNT(*) FILTER (WHERE score = 3) AS c3, COUNT(*) FILTER (WHERE score = 4) AS c4,
+           COUNT(*) FILTER (WHERE score = 5) AS c5
+    FROM ratings GROUP BY product_id
+) r ON r.product_id = p.id
+LEFT JOIN (
+    SELECT product_id, SUM(quantity) AS units_sold, COUNT(*) AS sales_count,
+           SUM(total_price) AS revenue, MAX(created_at) AS last_sale_at
+    FROM sales GROUP BY product_id
+) s ON s.product_id = p.id
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_product_search_vector'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductStats',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='products.product')),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('rating_count', models.IntegerField(default=0)),
+                ('rating_1_count', models.IntegerField(default=0)),
+                ('rating_2_count', models.IntegerField(default=0)),
+                ('rating_3_count', models.IntegerField(default=0)),
+                ('rating_4_count', models.IntegerField(default=0)),
+                ('rating_5_count', models.IntegerField(default=0)),
+                ('units_sold', models.IntegerField(default=0)),
+                ('sales_count', models.IntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('last_sale_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'product_stats',
+            },
+        ),
+        migrations.RunSQL(BACKFILL_SQL, migrations.RunSQL.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_sales_product_created_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProductEmbedding',
+            fields=[
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='embedding', serialize=False, to='products.product')),
+                ('vector', models.BinaryField()),
+                ('updated_at', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'product_embeddings',
+                'indexes': [models.Index(fields=['updated_at'], name='product_embeddings_updated_idx')],
+            },
+        ),
+    ]
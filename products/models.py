@@ -3,7 +3,127 @@ from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 from users.models import User
 from django.utils import timezone
-from django.db.models import Avg
+from django.db import connection
+from django.db.models import (
+    Case, DecimalField, ExpressionWrapper, F, FloatField, IntegerField, Max, OuterRef, Q,
+    Subquery, Sum, When
+)
+from django.db.models.functions import Cast, Coalesce, NullIf
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVectorField, TrigramWordSimilarity
+from .signals import sales_recorded
+
+# Configuración de texto de Postgres usada por el trigger de search_vector
+SEARCH_CONFIG = 'spanish'
+
+
+# Precio con descuento aplicado; el índice products_discounted_price_idx usa la misma expresión
+DISCOUNTED_PRICE = Cast(
+    F('base_price') * (100 - F('discount_percentage')) / 100,
+    output_field=DecimalField(max_digits=10, decimal_places=2)
+)
+
+
+def discount_active_q(now):
+    return (
+        Q(discount_percentage__gt=0)
+        & (Q(discount_start_date__isnull=True) | Q(discount_start_date__lte=now))
+        & (Q(discount_end_date__isnull=True) | Q(discount_end_date__gte=now))
+    )
+
+
+def discount_inactive_q(now):
+    return (
+        Q(discount_percentage__lte=0)
+        | Q(discount_start_date__gt=now)
+        | Q(discount_end_date__lt=now)
+    )
+
+
+class ProductQuerySet(models.QuerySet):
+    def with_stats(self):
+        """
+        Anota rating promedio, número de ratings y ventas leyendo la tabla
+        materializada product_stats (un LEFT JOIN uno a uno, sin agregados).
+        """
+        return self.annotate(
+            avg_rating=ExpressionWrapper(
+                F('stats__rating_sum') * 1.0 / NullIf(F('stats__rating_count'), 0),
+                output_field=FloatField()
+            ),
+            num_ratings=Coalesce(F('stats__rating_count'), 0),
+            num_sales=Coalesce(F('stats__sales_count'), 0),
+            units_sold=Coalesce(F('stats__units_sold'), 0),
+        )
+
+    def with_catalog_stats(self):
+        """
+        Anota además el stock en la misma consulta. Se usa una subconsulta
+        correlacionada para que el join con inventario no multiplique las filas.
+        """
+        inventory = Inventory.objects.filter(product=OuterRef('pk')).order_by().values('product')
+        return self.with_stats().annotate(
+            stock=Coalesce(
+                Subquery(inventory.annotate(value=Sum('quantity')).values('value'), output_field=IntegerField()),
+                0
+            ),
+            stock_updated_at=Subquery(inventory.annotate(value=Max('last_updated')).values('value')),
+        )
+
+    def with_current_price(self, now=None):
+        """
+        Anota `effective_price`: el precio que se paga en `now`, calculado en
+        la base de datos con la misma regla que Product.current_price.
+        """
+        now = now or timezone.now()
+        return self.annotate(
+            effective_price=Case(
+                When(discount_active_q(now), then=DISCOUNTED_PRICE),
+                default=F('base_price'),
+                output_field=DecimalField(max_digits=10, decimal_places=2)
+            )
+        )
+
+    def filter_current_price(self, min_price=None, max_price=None, now=None):
+        """
+        Filtra por precio efectivo sin evaluar el CASE fila a fila: se separa
+        en productos con descuento vigente (índice sobre el precio con
+        descuento) y sin descuento (índice sobre base_price).
+        """
+        now = now or timezone.now()
+        discounted_range, base_range = Q(), Q()
+        if min_price is not None:
+            discounted_range &= Q(discounted_price__gte=min_price)
+            base_range &= Q(base_price__gte=min_price)
+        if max_price is not None:
+            discounted_range &= Q(discounted_price__lte=max_price)
+            base_range &= Q(base_price__lte=max_price)
+        return self.alias(discounted_price=DISCOUNTED_PRICE).filter(
+            (discount_active_q(now) & discounted_range) | (discount_inactive_q(now) & base_range)
+        )
+
+    def current_prices(self, now=None):
+        """Precio efectivo de varios productos en una consulta: {id: precio}."""
+        return dict(self.with_current_price(now).values_list('id', 'effective_price'))
+
+    def search(self, text):
+        """
+        Búsqueda de texto completo sobre search_vector (índice GIN), ordenada
+        por relevancia. Si no hay coincidencias de palabras completas se recurre
+        a similitud por trigramas sobre el nombre, que cubre palabras parciales
+        y errores de tipeo.
+        """
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        matches = self.filter(search_vector=query)
+        if matches.exists():
+            return matches.annotate(
+                search_rank=SearchRank(F('search_vector'), query)
+            ).order_by('-search_rank', 'id')
+
+        return self.filter(name__trigram_word_similar=text).annotate(
+            name_similarity=TrigramWordSimilarity(text, 'name')
+        ).order_by('-name_similarity', 'id')
+
 
 class Product(models.Model):
     name = models.CharField(max_length=200)
@@ -23,12 +143,25 @@ class Product(models.Model):
     image_url = models.URLField(max_length=500, null=True, blank=True)
     category = models.CharField(max_length=100)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Mantenido por el trigger products_search_vector_trigger (migración 0007)
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
 
     class Meta:
         db_table = 'products'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='products_created_id_idx'),
+            models.Index(fields=['base_price'], name='products_base_price_idx'),
+            models.Index(DISCOUNTED_PRICE, name='products_discounted_price_idx'),
+            GinIndex(fields=['search_vector'], name='products_search_vector_idx'),
+            GinIndex(fields=['name'], name='products_name_trgm_idx', opclasses=['gin_trgm_ops']),
+        ]
 
     @property
     def current_price(self):
+        if hasattr(self, 'effective_price'):
+            return self.effective_price
         if self.discount_percentage > 0:
             now = timezone.now()
             if (self.discount_start_date is None or self.discount_start_date <= now) and \
@@ -39,7 +172,11 @@ class Product(models.Model):
 
     @property
     def average_rating(self):
-        avg = self.ratings.aggregate(avg=Avg('score'))['avg']
+        if hasattr(self, 'avg_rating'):
+            avg = self.avg_rating
+        else:
+            stats = ProductStats.objects.filter(product=self).first()
+            avg = stats.average_rating if stats else None
         return round(avg, 2) if avg is not None else 0
 
     def __str__(self):
@@ -63,13 +200,20 @@ class Sale(models.Model):
     
     class Meta:
         db_table = 'sales'
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='sales_created_id_idx'),
+            models.Index(fields=['product', 'created_at'], name='sales_product_created_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.unit_price:
             self.unit_price = self.product.current_price
         if not self.total_price:
             self.total_price = self.unit_price * self.quantity
+        created = self._state.adding
         super().save(*args, **kwargs)
+        if created:
+            sales_recorded.send(sender=Sale, sales=[self])
 
 class Rating(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
@@ -85,5 +229,190 @@ class Rating(models.Model):
         db_table = 'ratings'
         unique_together = ('user', 'product')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Puntaje guardado, para aplicar la diferencia en ProductStats al actualizar
+        instance._stored_score = instance.__dict__.get('score')
+        return instance
+
     def __str__(self):
-        return f"{self.user.email} - {self.product.name} - {self.score}"
\ No newline at end of file
+        return f"{self.user.email} - {self.product.name} - {self.score}"
+
+
+STATS_COUNTER_FIELDS = [
+    'rating_sum', 'rating_count',
+    'rating_1_count', 'rating_2_count', 'rating_3_count', 'rating_4_count', 'rating_5_count',
+    'units_sold', 'sales_count', 'revenue',
+]
+
+
+class ProductStatsManager(models.Manager):
+    def apply_deltas(self, deltas, create=True):
+        """
+        Suma incrementos a los contadores con un único INSERT ... ON CONFLICT.
+        `deltas` es {product_id: {campo: incremento, 'last_sale_at': fecha}}.
+
+        Con create=False solo se actualizan filas existentes. Se usa al borrar
+        ratings o ventas, porque en un borrado en cascada del producto la fila
+        de estadísticas puede haberse eliminado ya y no debe recrearse.
+        """
+        if not deltas:
+            return
+        if not create:
+            for product_id, delta in deltas.items():
+                self.filter(product_id=product_id).update(**{
+                    field: F(field) + value
+                    for field, value in delta.items() if field in STATS_COUNTER_FIELDS
+                })
+            return
+        table = self.model._meta.db_table
+        columns = ['product_id', *STATS_COUNTER_FIELDS, 'last_sale_at']
+        row = '(' + ', '.join(['%s'] * len(columns)) + ')'
+        params = []
+        for product_id, delta in deltas.items():
+            params.append(product_id)
+            params.extend(delta.get(field, 0) for field in STATS_COUNTER_FIELDS)
+            params.append(delta.get('last_sale_at'))
+        updates = ', '.join(f'{field} = {table}.{field} + EXCLUDED.{field}' for field in STATS_COUNTER_FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                INSERT INTO {table} ({', '.join(columns)})
+                VALUES {', '.join([row] * len(deltas))}
+                ON CONFLICT (product_id) DO UPDATE SET {updates},
+                    last_sale_at = GREATEST({table}.last_sale_at, EXCLUDED.last_sale_at)
+                """,
+                params
+            )
+
+    def record_sales(self, sales, sign=1):
+        deltas = {}
+        for sale in sales:
+            delta = deltas.setdefault(sale.product_id, {'units_sold': 0, 'sales_count': 0, 'revenue': 0})
+            delta['units_sold'] += sign * sale.quantity
+            delta['sales_count'] += sign
+            delta['revenue'] += sign * sale.total_price
+            if sign > 0 and (delta.get('last_sale_at') is None or sale.created_at > delta['last_sale_at']):
+                delta['last_sale_at'] = sale.created_at
+        self.apply_deltas(deltas, create=sign > 0)
+
+    def record_rating(self, product_id, old_score=None, new_score=None):
+        # Un puntaje 0 también cuenta, igual que en rebuild(): solo None significa "sin puntaje"
+        old_score = int(old_score) if old_score is not None else None
+        new_score = int(new_score) if new_score is not None else None
+        delta = {'rating_sum': 0, 'rating_count': 0}
+        if old_score is not None:
+            delta['rating_sum'] -= old_score
+            delta['rating_count'] -= 1
+            delta[f'rating_{old_score}_count'] = delta.get(f'rating_{old_score}_count', 0) - 1
+        if new_score is not None:
+            delta['rating_sum'] += new_score
+            delta['rating_count'] += 1
+            delta[f'rating_{new_score}_count'] = delta.get(f'rating_{new_score}_count', 0) + 1
+        self.apply_deltas({product_id: delta}, create=new_score is not None)
+
+    def rebuild(self, product_ids=None):
+        """Recalcula las estadísticas desde ratings y sales (todas o las indicadas)."""
+        table = self.model._meta.db_table
+        where, params = '', []
+        if product_ids is not None:
+            where, params = 'WHERE p.id = ANY(%s)', [list(product_ids)]
+        with connection.cursor() as cursor:
+            if product_ids is None:
+                cursor.execute(f'DELETE FROM {table}')
+            else:
+                cursor.execute(f'DELETE FROM {table} WHERE product_id = ANY(%s)', params)
+            cursor.execute(REBUILD_STATS_SQL.format(table=table, where=where), params)
+
+
+REBUILD_STATS_SQL = """
+INSERT INTO {table} (product_id, rating_sum, rating_count, rating_1_count, rating_2_count,
+                     rating_3_count, rating_4_count, rating_5_count, units_sold, sales_count,
+                     revenue, last_sale_at)
+SELECT p.id,
+       COALESCE(r.rating_sum, 0), COALESCE(r.rating_count, 0),
+       COALESCE(r.c1, 0), COALESCE(r.c2, 0), COALESCE(r.c3, 0), COALESCE(r.c4, 0), COALESCE(r.c5, 0),
+       COALESCE(s.units_sold, 0), COALESCE(s.sales_count, 0), COALESCE(s.revenue, 0), s.last_sale_at
+FROM products p
+LEFT JOIN (
+    SELECT product_id, SUM(score) AS rating_sum, COUNT(*) AS rating_count,
+           COUNT(*) FILTER (WHERE score = 1) AS c1, COUNT(*) FILTER (WHERE score = 2) AS c2,
+           COUNT(*) FILTER (WHERE score = 3) AS c3, COUNT(*) FILTER (WHERE score = 4) AS c4,
+           COUNT(*) FILTER (WHERE score = 5) AS c5
+    FROM ratings GROUP BY product_id
+) r ON r.product_id = p.id
+LEFT JOIN (
+    SELECT product_id, SUM(quantity) AS units_sold, COUNT(*) AS sales_count,
+           SUM(total_price) AS revenue, MAX(created_at) AS last_sale_at
+    FROM sales GROUP BY product_id
+) s ON s.product_id = p.id
+{where}
+"""
+
+
+class ProductStats(models.Model):
+    """
+    Contadores materializados por producto. Se actualizan de forma incremental
+    al escribir ratings y ventas (ver products/receivers.py) y se pueden
+    reconstruir con `manage.py rebuild_product_stats`.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    rating_sum = models.IntegerField(default=0)
+    rating_count = models.IntegerField(default=0)
+    rating_1_count = models.IntegerField(default=0)
+    rating_2_count = models.IntegerField(default=0)
+    rating_3_count = models.IntegerField(default=0)
+    rating_4_count = models.IntegerField(default=0)
+    rating_5_count = models.IntegerField(default=0)
+    units_sold = models.IntegerField(default=0)
+    sales_count = models.IntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_sale_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ProductStatsManager()
+
+    class Meta:
+        db_table = 'product_stats'
+
+    @property
+    def average_rating(self):
+        return self.rating_sum / self.rating_count if self.rating_count else None
+
+    @property
+    def rating_histogram(self):
+        return {score: getattr(self, f'rating_{score}_count') for score in range(1, 6)}
+
+class ProductEmbeddingManager(models.Manager):
+    def store(self, product_ids, vectors):
+        """Guarda (o reemplaza) los vectores float32 de varios productos en una sentencia."""
+        now = timezone.now()
+        self.bulk_create(
+            [
+                ProductEmbedding(product_id=product_id, vector=vector.astype('<f4').tobytes(), updated_at=now)
+                for product_id, vector in zip(product_ids, vectors)
+            ],
+            update_conflicts=True,
+            unique_fields=['product'],
+            update_fields=['vector', 'updated_at'],
+            batch_size=1000,
+        )
+
+
+class ProductEmbedding(models.Model):
+    """
+    Vector de contenido de un producto (float32, SIMILAR_PRODUCTS_DIMENSIONS
+    componentes) para la búsqueda de productos similares; ver products/similarity.py.
+    """
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='embedding')
+    vector = models.BinaryField()
+    updated_at = models.DateTimeField()
+
+    objects = ProductEmbeddingManager()
+
+    class Meta:
+        db_table = 'product_embeddings'
+        indexes = [
+            # Cada proceso relee solo lo modificado desde su última sincronización
+            models.Index(fields=['updated_at'], name='product_embeddings_updated_idx'),
+        ]
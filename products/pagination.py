@@ -0,0 +1,84 @@
+"""
+Paginación por cursor (keyset) para los listados.
+
+El cursor es un token firmado y opaco con los valores de las columnas de
+orden del último elemento devuelto. Cada página filtra `WHERE (claves) > cursor`
+y lee `limit + 1` filas, así que no hace falta `COUNT(*)` ni `OFFSET` y el costo
+es el mismo en cualquier página.
+"""
+from datetime import datetime
+
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'products.pagination.cursor'
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 200
+
+
+class InvalidPagination(ValueError):
+    pass
+
+
+class InvalidCursor(InvalidPagination):
+    pass
+
+
+def encode_cursor(values):
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return signing.dumps(values, salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(token, keys):
+    try:
+        values = signing.loads(token, salt=CURSOR_SALT)
+    except signing.BadSignature:
+        raise InvalidCursor('Cursor inválido')
+    if not isinstance(values, list) or len(values) != len(keys):
+        raise InvalidCursor('Cursor inválido')
+    return values
+
+
+def keyset_filter(keys, values):
+    """
+    Construye `(k1, k2, ...) > (v1, v2, ...)` como OR de prefijos iguales.
+    La condición redundante sobre la primera clave permite que Postgres use
+    el índice compuesto como rango.
+    """
+    condition = Q()
+    for i, key in enumerate(keys):
+        prefix = {keys[j]: values[j] for j in range(i)}
+        condition |= Q(**prefix, **{f'{key}__gt': values[i]})
+    return Q(**{f'{keys[0]}__gte': values[0]}) & condition
+
+
+def parse_limit(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        limit = int(value or default)
+    except (TypeError, ValueError):
+        raise InvalidPagination('limit debe ser un entero')
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def paginate_by_cursor(queryset, cursor, limit, keys=('created_at', 'id')):
+    """Devuelve (items, pagination) para la página que sigue a `cursor`."""
+    if cursor:
+        queryset = queryset.filter(keyset_filter(keys, decode_cursor(cursor, keys)))
+
+    items = list(queryset.order_by(*keys)[:limit + 1])
+    has_next = len(items) > limit
+    items = items[:limit]
+
+    next_cursor = None
+    if has_next:
+        last = items[-1]
+        next_cursor = encode_cursor([
+            last[key] if isinstance(last, dict) else getattr(last, key)
+            for key in keys
+        ])
+
+    return items, {
+        'nextCursor': next_cursor,
+        'hasNextPage': has_next,
+        'itemsPerPage': limit,
+    }
@@ -0,0 +1,57 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import bump_catalog_version
+from .models import Inventory, Product, ProductStats, Rating, Sale
+from .signals import rating_changed, sales_recorded
+from .similarity import forget_products, refresh_embeddings
+
+
+@receiver(sales_recorded)
+def update_stats_on_sales(sender, sales, **kwargs):
+    ProductStats.objects.record_sales(sales)
+
+
+@receiver(post_delete, sender=Sale)
+def update_stats_on_sale_delete(sender, instance, **kwargs):
+    ProductStats.objects.record_sales([instance], sign=-1)
+
+
+@receiver(post_save, sender=Rating)
+def update_stats_on_rating_save(sender, instance, created, **kwargs):
+    old_score = None if created else getattr(instance, '_stored_score', None)
+    if created or hasattr(instance, '_stored_score'):
+        ProductStats.objects.record_rating(instance.product_id, old_score=old_score, new_score=instance.score)
+    else:
+        # Sin el puntaje anterior no se puede aplicar la diferencia
+        ProductStats.objects.rebuild([instance.product_id])
+    instance._stored_score = instance.score
+    rating_changed.send(sender=Rating, rating=instance, old_score=old_score, new_score=instance.score)
+
+
+@receiver(post_delete, sender=Rating)
+def update_stats_on_rating_delete(sender, instance, **kwargs):
+    ProductStats.objects.record_rating(instance.product_id, old_score=instance.score)
+    rating_changed.send(sender=Rating, rating=instance, old_score=instance.score, new_score=None)
+
+
+@receiver(post_save, sender=Product)
+def update_embedding_on_product_save(sender, instance, **kwargs):
+    refresh_embeddings([instance.id])
+
+
+@receiver(post_delete, sender=Product)
+def remove_embedding_on_product_delete(sender, instance, **kwargs):
+    forget_products([instance.id])
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Inventory)
+@receiver(post_delete, sender=Inventory)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def invalidate_catalog_cache(sender, **kwargs):
+    # Tras el commit, para que ninguna lectura concurrente vuelva a cachear datos viejos
+    transaction.on_commit(bump_catalog_version)
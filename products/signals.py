@@ -0,0 +1,10 @@
+from django.dispatch import Signal
+
+# Enviada con `sales=[...]` cada vez que se registran ventas nuevas, tanto desde
+# Sale.save() como desde escrituras en lote que no pasan por save() (bulk_create).
+sales_recorded = Signal()
+
+# Enviada con `rating`, `old_score` y `new_score` cada vez que se crea, cambia o
+# borra un rating (None = no había / ya no hay). La diferencia se calcula una sola
+# vez aquí, así los receptores no dependen de leer el estado de la instancia.
+rating_changed = Signal()
@@ -0,0 +1,201 @@
+"""
+Productos similares por contenido.
+
+Cada producto se representa con un vector denso float32 obtenido con un
+HashingVectorizer sobre su nombre, marca, categoría y descripción. El hashing
+no necesita vocabulario ni ajuste previo, así que el vector de un producto
+nuevo o editado se calcula solo, sin tocar los demás. Los vectores se guardan
+normalizados en `ProductEmbedding` al escribir el producto (ver receivers.py)
+y `manage.py build_product_embeddings` los genera para el catálogo existente.
+
+Cada proceso mantiene el índice en memoria como una matriz (productos x
+SIMILAR_PRODUCTS_DIMENSIONS): aplica al momento los cambios que hace él mismo
+y relee de la base los de otros procesos cada SIMILAR_PRODUCTS_SYNC_INTERVAL
+segundos. Los borrados de otros procesos no se ven al sincronizar: la vista
+quita del índice los productos que ya no encuentra en la base. La búsqueda es
+exacta: un producto matriz-vector (similitud coseno) y un argpartition, unos
+pocos milisegundos con 100.000 productos.
+"""
+import re
+import threading
+import time
+import unicodedata
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from sklearn.feature_extraction.text import HashingVectorizer
+
+from .models import Product, ProductEmbedding
+
+EMBEDDING_FIELDS = ('id', 'name', 'brand', 'category', 'description')
+# Repeticiones de cada campo: el nombre, la marca y la categoría pesan más que la descripción
+NAME_WEIGHT = 3
+LABEL_WEIGHT = 2
+# Margen al releer cambios, para no perder escrituras que confirmaron tarde
+SYNC_OVERLAP = timedelta(seconds=60)
+WORD_RE = re.compile(r'\w{3,}')
+
+
+def _words(text):
+    text = unicodedata.normalize('NFKD', (text or '').lower())
+    return WORD_RE.findall(''.join(char for char in text if not unicodedata.combining(char)))
+
+
+def product_tokens(product):
+    """Términos de un producto (dict con EMBEDDING_FIELDS); la marca y la categoría van como etiquetas."""
+    tokens = _words(product['name']) * NAME_WEIGHT + _words(product['description'])
+    for field in ('brand', 'category'):
+        label = ' '.join(_words(product[field]))
+        if label:
+            tokens += [f'{field}={label}'] * LABEL_WEIGHT
+    return tokens
+
+
+def embed(products):
+    """Matriz float32 (len(products) x SIMILAR_PRODUCTS_DIMENSIONS) con filas de norma 1."""
+    vectorizer = HashingVectorizer(
+        n_features=settings.SIMILAR_PRODUCTS_DIMENSIONS, analyzer=product_tokens, norm='l2', dtype=np.float32
+    )
+    return vectorizer.transform(products).toarray()
+
+
+def refresh_embeddings(product_ids=None):
+    """Recalcula y guarda los vectores de los productos indicados (o de todos). Devuelve cuántos."""
+    products = Product.objects.order_by('id').values(*EMBEDDING_FIELDS)
+    if product_ids is not None:
+        products = products.filter(id__in=product_ids)
+    products = list(products)
+    if not products:
+        return 0
+    ids = [product['id'] for product in products]
+    vectors = embed(products)
+    ProductEmbedding.objects.store(ids, vectors)
+    _apply_on_commit('upsert', ids, vectors)
+    return len(ids)
+
+
+def forget_products(product_ids):
+    _apply_on_commit('remove', product_ids)
+
+
+def _apply_on_commit(method, *args):
+    # Si este proceso ya cargó su índice, el cambio se ve al momento; si no, lo leerá al cargarlo
+    def apply():
+        if _index is not None:
+            getattr(_index, method)(*args)
+    transaction.on_commit(apply)
+
+
+class SimilarityIndex:
+    def __init__(self, dimensions, capacity=1024):
+        self.dimensions = dimensions
+        self.matrix = np.zeros((capacity, dimensions), dtype=np.float32)
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.rows = {}
+        self.size = 0
+        self.synced_at = None
+        self.last_updated_at = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def upsert(self, product_ids, vectors):
+        with self._lock:
+            for product_id, vector in zip(product_ids, vectors):
+                row = self.rows.get(product_id)
+                if row is None:
+                    if self.size == len(self.ids):
+                        self._grow()
+                    row = self.rows[product_id] = self.size
+                    self.ids[row] = product_id
+                    self.size += 1
+                self.matrix[row] = vector
+
+    def remove(self, product_ids):
+        with self._lock:
+            for product_id in product_ids:
+                row = self.rows.pop(product_id, None)
+                if row is None:
+                    continue
+                # La última fila ocupa el hueco para que la matriz siga compacta
+                last = self.size - 1
+                if row != last:
+                    self.matrix[row] = self.matrix[last]
+                    self.ids[row] = self.ids[last]
+                    self.rows[int(self.ids[row])] = row
+                self.size = last
+
+    def _grow(self):
+        capacity = 2 * len(self.ids)
+        matrix = np.zeros((capacity, self.dimensions), dtype=np.float32)
+        matrix[:self.size] = self.matrix[:self.size]
+        ids = np.zeros(capacity, dtype=np.int64)
+        ids[:self.size] = self.ids[:self.size]
+        self.matrix, self.ids = matrix, ids
+
+    def similar(self, product_id, k):
+        """[(product_id, similitud)] de los k productos más parecidos, sin el propio producto."""
+        with self._lock:
+            row = self.rows.get(product_id)
+            if row is None:
+                return []
+            matrix, ids = self.matrix[:self.size], self.ids[:self.size]
+            scores = matrix @ matrix[row]
+            scores[row] = -np.inf
+            k = min(k, self.size - 1)
+            if k <= 0:
+                return []
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top], kind='stable')]
+            return [(int(ids[i]), float(scores[i])) for i in top]
+
+    def sync(self):
+        """Carga los vectores guardados desde la última sincronización (todos la primera vez)."""
+        rows = ProductEmbedding.objects.order_by()
+        if self.last_updated_at is not None:
+            rows = rows.filter(updated_at__gte=self.last_updated_at - SYNC_OVERLAP)
+        ids, vectors = [], []
+        for product_id, vector, updated_at in rows.values_list('product_id', 'vector', 'updated_at').iterator():
+            ids.append(product_id)
+            vectors.append(np.frombuffer(vector, dtype='<f4'))
+            if self.last_updated_at is None or updated_at > self.last_updated_at:
+                self.last_updated_at = updated_at
+        # Vectores de otra dimensión (cambió la configuración) se ignoran hasta recalcularlos
+        valid = [i for i, vector in enumerate(vectors) if len(vector) == self.dimensions]
+        self.upsert([ids[i] for i in valid], [vectors[i] for i in valid])
+        self.synced_at = time.monotonic()
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    """Índice del proceso; se sincroniza con la base cada SIMILAR_PRODUCTS_SYNC_INTERVAL segundos."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = SimilarityIndex(settings.SIMILAR_PRODUCTS_DIMENSIONS)
+        index = _index
+        if index.synced_at is None or time.monotonic() - index.synced_at > settings.SIMILAR_PRODUCTS_SYNC_INTERVAL:
+            index.sync()
+    return index
+
+
+def reset_index():
+    global _index
+    _index = None
+
+
+def forget_stale_products(product_ids):
+    """Quita del índice productos que ya no existen (borrados en otro proceso)."""
+    if _index is not None:
+        _index.remove(product_ids)
+
+
+def similar_products(product_id, k=None):
+    k = k or settings.SIMILAR_PRODUCTS_LIMIT
+    return get_index().similar(product_id, k)
@@ -1,3 +1,283 @@
-from django.test import TestCase
+import threading
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from users.models import User
+from .inventory import InsufficientStock, place_sale
+from .models import Inventory, Product, ProductStats, Sale
+from .similarity import get_index, reset_index
+
+
+def buy_until_sold_out(product, buyers, quantity=1):
+    """
+    Lanza `buyers` hilos que compran hasta agotar el stock; devuelve las unidades
+    vendidas. Falla si algún comprador terminó por otra excepción (p. ej. un deadlock).
+    """
+    sold = []
+    errors = []
+
+    def buyer():
+        try:
+            while True:
+                try:
+                    place_sale(product, quantity)
+                except InsufficientStock:
+                    return
+                sold.append(quantity)
+        except Exception as e:
+            errors.append(e)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=buyer) for _ in range(buyers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise AssertionError(f'{len(errors)} compradores fallaron: {errors!r}')
+    return sum(sold)
+
+
+class InventoryReservationTests(TransactionTestCase):
+    def setUp(self):
+        self.product = Product.objects.create(
+            name='Auriculares', brand='Sony', description='Inalámbricos',
+            base_price=100, category='Electrónica'
+        )
+
+    def assert_sold_out(self, stock, sold):
+        self.assertEqual(sold, stock)
+        self.assertEqual(sum(Inventory.objects.values_list('quantity', flat=True)), 0)
+        self.assertFalse(Inventory.objects.filter(quantity__lt=0).exists())
+        self.assertEqual(sum(Sale.objects.values_list('quantity', flat=True)), stock)
+        self.assertEqual(ProductStats.objects.get(product=self.product).units_sold, stock)
+
+    def test_concurrent_buyers_never_oversell(self):
+        for buyers in (1, 8, 64):
+            with self.subTest(buyers=buyers):
+                Sale.objects.all().delete()
+                Inventory.objects.all().delete()
+                ProductStats.objects.all().delete()
+                Inventory.objects.create(product=self.product, quantity=200)
+
+                self.assert_sold_out(200, buy_until_sold_out(self.product, buyers))
+
+    def test_stock_split_across_rows(self):
+        Inventory.objects.create(product=self.product, quantity=31)
+        Inventory.objects.create(product=self.product, quantity=29)
+
+        sold = buy_until_sold_out(self.product, buyers=16, quantity=3)
+
+        self.assert_sold_out(60, sold)
+
+    def test_insufficient_stock_leaves_no_sale(self):
+        Inventory.objects.create(product=self.product, quantity=2)
+
+        with self.assertRaises(InsufficientStock):
+            place_sale(self.product, 3)
+
+        self.assertEqual(Inventory.objects.get().quantity, 2)
+        self.assertFalse(Sale.objects.exists())
+
+
+class CheckoutTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='buyer@example.com', name='Buyer')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Producto {i}', brand='Marca', description='Descripción',
+                    base_price=10 + i, category='Hogar')
+            for i in range(20)
+        ])
+        Inventory.objects.bulk_create([
+            Inventory(product=product, quantity=5) for product in self.products
+        ])
+
+    def test_twenty_item_cart_uses_a_handful_of_queries(self):
+        items = [{'product_id': product.id, 'quantity': 2} for product in self.products]
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/products/checkout/', {'items': items}, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(Sale.objects.count(), 20)
+        self.assertEqual(sum(Inventory.objects.values_list('quantity', flat=True)), 60)
+        # Productos, bloqueo de inventario, update, insert, estadísticas, rollup diario
+        # invalidación de recomendaciones, afinidades del usuario con su poda (+ savepoint)
+        self.assertLessEqual(len(ctx.captured_queries), 11)
+
+    def test_cart_is_all_or_nothing(self):
+        items = [{'product_id': product.id, 'quantity': 1} for product in self.products]
+        items[-1]['quantity'] = 6
+
+        response = self.client.post('/api/products/checkout/', {'items': items}, format='json')
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data['product_id'], self.products[-1].id)
+        self.assertFalse(Sale.objects.exists())
+        self.assertEqual(sum(Inventory.objects.values_list('quantity', flat=True)), 100)
+
+    def test_sale_invalidates_cached_product_detail(self):
+        cache.clear()
+        product = self.products[0]
+        url = f'/api/products/{product.id}'
+        self.assertEqual(self.client.get(url).data['inventory']['quantity'], 5)
+        self.assertEqual(self.client.get(url)['X-Cache'], 'HIT')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/products/sales/create/', {'product_id': product.id, 'quantity': 3}, format='json'
+            )
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.data['inventory']['quantity'], 2)
+
+
+class RatingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='rater@example.com', name='Rater')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.product = Product.objects.create(name='Lámpara', brand='Marca', description='Descripción',
+                                              base_price=10, category='Hogar')
+
+    def rate(self, rating):
+        return self.client.post(
+            '/api/products/ratings/create/',
+            {'product_id': self.product.id, 'rating': rating, 'review': 'ok'}, format='json'
+        )
+
+    def test_scores_outside_one_to_five_are_rejected(self):
+        for rating in (0, 6, -1, 'abc', None):
+            with self.subTest(rating=rating):
+                self.assertEqual(self.rate(rating).status_code, 400)
+        self.assertFalse(ProductStats.objects.exists())
+
+        self.assertEqual(self.rate(4).status_code, 201)
+        self.assertEqual(self.rate(2).status_code, 201)
+        stats = ProductStats.objects.get(product=self.product)
+        self.assertEqual(stats.rating_count, 1)
+        self.assertEqual(stats.rating_histogram, {1: 0, 2: 1, 3: 0, 4: 0, 5: 0})
+
+
+class SalesListingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='analyst@example.com', name='Analyst')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Producto {i}', brand='Marca', description='Descripción',
+                    base_price=10, category='Hogar' if i % 2 else 'Deportes')
+            for i in range(10)
+        ])
+        Sale.objects.bulk_create([
+            Sale(product=product, user=self.user, quantity=1, unit_price=10, total_price=10)
+            for product in self.products for _ in range(5)
+        ])
+
+    def test_listing_query_count_does_not_grow_with_page_size(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/products/sales/', {'limit': 50})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['data']), 50)
+        # Conteo del paginador + página con el join a products
+        self.assertEqual(len(ctx.captured_queries), 2)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get('/api/products/sales/', {'cursor': '', 'limit': 50})
+        self.assertEqual(len(response.data['data']), 50)
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+    def test_filters(self):
+        response = self.client.get('/api/products/sales/', {'category': 'Hogar', 'limit': 200})
+        self.assertEqual(response.data['pagination']['totalItems'], 25)
+
+        response = self.client.get('/api/products/sales/', {'product_id': self.products[0].id})
+        self.assertEqual(response.data['pagination']['totalItems'], 5)
+
+        today = timezone.localdate().isoformat()
+        response = self.client.get('/api/products/sales/', {'date_from': today, 'date_to': today})
+        self.assertEqual(response.data['pagination']['totalItems'], 50)
+
+        response = self.client.get('/api/products/sales/', {'date_from': 'ayer'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_invalid_pagination_is_rejected(self):
+        for url in ('/api/products/', '/api/products/sales/', '/api/products/inventory/'):
+            with self.subTest(url=url):
+                response = self.client.get(url, {'cursor': '', 'limit': 'abc'})
+                self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/api/products/', {'limit': 'abc'}).status_code, 400)
+
+        # El cursor ordena por (created_at, id): combinarlo con otro orden daría resultados inesperados
+        for params in ({'ordering': 'current_price'}, {'search': 'producto'}):
+            with self.subTest(**params):
+                with self.assertNumQueries(0):
+                    response = self.client.get('/api/products/', {'cursor': '', **params})
+                self.assertEqual(response.status_code, 400)
+
+
+class SimilarProductsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_index()
+        self.addCleanup(reset_index)
+        self.user = User.objects.create_user(email='similar@example.com', name='Similar')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        specs = [
+            ('Zapatillas running Nike', 'Nike', 'Deportes', 'Zapatillas livianas para correr'),
+            ('Zapatillas trail Nike', 'Nike', 'Deportes', 'Zapatillas para correr en montaña'),
+            ('Pelota de fútbol', 'Adidas', 'Deportes', 'Pelota oficial de fútbol'),
+            ('Cafetera espresso', 'Philips', 'Hogar', 'Cafetera automática con molinillo'),
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.products = [
+                Product.objects.create(name=name, brand=brand, category=category, description=description,
+                                       base_price=100)
+                for name, brand, category, description in specs
+            ]
+
+    def similar_ids(self, product):
+        response = self.client.get(f'/api/products/{product.id}/similar', {'limit': 3})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.data['data']]
+
+    def test_ranks_by_content_and_follows_updates(self):
+        running, trail, ball, coffee = self.products
+        self.assertEqual(self.similar_ids(running), [trail.id, ball.id, coffee.id])
+
+        # Editar un producto recalcula solo su vector y el índice lo ve al momento
+        with self.captureOnCommitCallbacks(execute=True):
+            coffee.name, coffee.brand, coffee.category = 'Zapatillas urbanas Nike', 'Nike', 'Deportes'
+            coffee.description = 'Zapatillas para correr y caminar'
+            coffee.save()
+        self.assertEqual(self.similar_ids(trail)[0], running.id)
+        self.assertIn(coffee.id, self.similar_ids(trail)[:2])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            trail.delete()
+        self.assertNotIn(trail.id, self.similar_ids(running))
+
+    def test_products_deleted_elsewhere_are_dropped_from_the_index(self):
+        running, trail, ball, coffee = self.products
+        self.similar_ids(running)
+        # Borrados por otro proceso: este índice no recibe los callbacks
+        with self.captureOnCommitCallbacks(execute=False):
+            Product.objects.filter(id__in=[trail.id, ball.id]).delete()
+
+        response = self.client.get(f'/api/products/{running.id}/similar', {'limit': 1})
+        self.assertEqual([item['id'] for item in response.data['data']], [coffee.id])
+        self.assertEqual(len(get_index()), 2)
+
+    def test_unknown_product_is_not_found(self):
+        self.assertEqual(self.client.get('/api/products/999999/similar').status_code, 404)
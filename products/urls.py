@@ -5,9 +5,12 @@ urlpatterns = [
     # Products
     path('', views.get_products, name='get_products'),
     path('<int:product_id>', views.get_product_by_id, name='get_product_by_id'),
+    path('<int:product_id>/similar', views.get_similar_products, name='get_similar_products'),
     path('create/', views.create_product, name='create_product'),
     path('update/<int:product_id>/', views.update_product, name='update_product'),
     path('delete/<int:product_id>/', views.delete_product, name='delete_product'),
+    path('cache/stats/', views.get_catalog_cache_stats, name='catalog_cache_stats'),
+    path('trending/', views.get_trending_products, name='get_trending_products'),
     
     # Inventory
     path('inventory/', views.get_inventory, name='get_inventory'),
@@ -20,5 +23,6 @@ urlpatterns = [
     
     # Sales
     path('sales/create/', views.create_sale, name='create_sale'),
+    path('checkout/', views.create_checkout, name='create_checkout'),
     path('sales/', views.get_sales, name='get_sales'),
 ] 
\ No newline at end of file
@@ -8,16 +8,61 @@ from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 from recommendations.ai_recommendations import AIRecommendationEngine
 from recommendations.models import RecommendationType
+from django.conf import settings
 from django.utils import timezone
+from asgiref.sync import async_to_sync
 import logging
 from users.authentication import validate_token
 from django.core.paginator import Paginator
-from django.db.models import Avg, Q
+from decimal import Decimal, InvalidOperation
+from datetime import datetime, time, timedelta
+from django.utils.dateparse import parse_date, parse_datetime
+from .pagination import InvalidPagination, paginate_by_cursor, parse_limit
+from .cache import cache_catalog_response, cache_stats
+from .inventory import InsufficientStock, checkout, place_sale
+from .similarity import forget_stale_products, similar_products
+from analytics.trending import get_trending
 
 logger = logging.getLogger('django.request')
 
+CURSOR_PARAMETER = openapi.Parameter(
+    'cursor',
+    openapi.IN_QUERY,
+    description='Activa la paginación por cursor. Vacío para la primera página; '
+                'luego el valor de pagination.nextCursor',
+    type=openapi.TYPE_STRING,
+    required=False
+)
+
 # Create your views here.
 
+def _parse_price(value):
+    if value in (None, ''):
+        return None
+    try:
+        return Decimal(value)
+    except InvalidOperation:
+        raise InvalidOperation(f'Precio inválido: {value}')
+
+def _product_list_data(product):
+    """Serializa un producto anotado con with_catalog_stats() para los listados."""
+    return {
+        'id': product.id,
+        'name': product.name,
+        'brand': product.brand,
+        'description': product.description,
+        'base_price': str(product.base_price),
+        'current_price': str(product.current_price),
+        'discount_percentage': str(product.discount_percentage),
+        'discount_start_date': product.discount_start_date,
+        'discount_end_date': product.discount_end_date,
+        'image_url': getattr(product, 'image_url', f'https://via.placeholder.com/300x300.png?text={product.category}'),
+        'category': product.category,
+        'rating': product.average_rating,
+        'num_ratings': product.num_ratings,
+        'stock': product.stock
+    }
+
 # Productos
 @swagger_auto_schema(
     method='post',
@@ -94,10 +139,34 @@ def create_product(request):
         openapi.Parameter(
             'search',
             openapi.IN_QUERY,
-            description='Buscar productos por nombre',
+            description='Buscar productos por nombre, marca, categoría o descripción '
+                        '(ordenados por relevancia; no se combina con cursor)',
+            type=openapi.TYPE_STRING,
+            required=False
+        ),
+        openapi.Parameter(
+            'min_price',
+            openapi.IN_QUERY,
+            description='Precio actual mínimo (con descuento vigente aplicado)',
+            type=openapi.TYPE_NUMBER,
+            required=False
+        ),
+        openapi.Parameter(
+            'max_price',
+            openapi.IN_QUERY,
+            description='Precio actual máximo (con descuento vigente aplicado)',
+            type=openapi.TYPE_NUMBER,
+            required=False
+        ),
+        openapi.Parameter(
+            'ordering',
+            openapi.IN_QUERY,
+            description='Ordenar por precio actual: current_price o -current_price '
+                        '(no se combina con cursor)',
             type=openapi.TYPE_STRING,
             required=False
         ),
+        CURSOR_PARAMETER,
     ],
     responses={
         200: openapi.Response(
@@ -121,6 +190,7 @@ def create_product(request):
                                 'image_url': openapi.Schema(type=openapi.TYPE_STRING),
                                 'rating': openapi.Schema(type=openapi.TYPE_NUMBER),
                                 'num_ratings': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'stock': openapi.Schema(type=openapi.TYPE_INTEGER),
                             }
                         )
                     ),
@@ -138,12 +208,14 @@ def create_product(request):
                 }
             )
         ),
+        400: openapi.Response(description="Invalid pagination, cursor or filter"),
         401: openapi.Response(description="Unauthorized"),
         500: openapi.Response(description="Server error")
     }
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_catalog_response('products')
 def get_products(request):
     try:
         # Obtener parámetros de paginación
@@ -151,15 +223,45 @@ def get_products(request):
         limit = int(request.GET.get('limit', 10))
         search = request.GET.get('search', '').strip()
         
-        # Obtener todos los productos
-        products = Product.objects.all()
+        min_price = _parse_price(request.GET.get('min_price'))
+        max_price = _parse_price(request.GET.get('max_price'))
+        ordering = request.GET.get('ordering')
+        if ordering not in (None, 'current_price', '-current_price'):
+            return Response(
+                {'error': 'ordering debe ser current_price o -current_price'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        # El cursor ordena por (created_at, id): se rechaza antes de consultar nada
+        if 'cursor' in request.GET and (ordering or search):
+            return Response(
+                {'error': 'cursor no se puede combinar con ordering ni search; use page'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Obtener todos los productos con rating, stock y precio efectivo anotados en la misma consulta
+        now = timezone.now()
+        products = Product.objects.with_catalog_stats().with_current_price(now).order_by('id')
+        
+        # Filtrar por el precio que se paga hoy
+        if min_price is not None or max_price is not None:
+            products = products.filter_current_price(min_price, max_price, now)
         
-        # Aplicar filtro de búsqueda si existe
+        # Aplicar búsqueda de texto completo si existe (ordenada por relevancia)
         if search:
-            products = products.filter(
-                Q(name__icontains=search) |  # Buscar en nombre
-                Q(description__icontains=search)  # Buscar en descripción
+            products = products.search(search)
+
+        if ordering:
+            products = products.order_by(ordering.replace('current_price', 'effective_price'), 'id')
+
+        # Modo cursor: sin COUNT(*) ni OFFSET, ordenado por (created_at, id)
+        if 'cursor' in request.GET:
+            items, pagination = paginate_by_cursor(
+                products, request.GET['cursor'], parse_limit(request.GET.get('limit'))
             )
+            return Response({
+                'data': [_product_list_data(product) for product in items],
+                'pagination': pagination
+            })
 
         # Crear paginador
         paginator = Paginator(products, limit)
@@ -167,32 +269,9 @@ def get_products(request):
         # Obtener página actual
         current_page = paginator.page(page)
         
-        # Preparar datos de respuesta
-        products_data = []
-        for product in current_page:
-            # Calcular rating promedio
-            avg_rating = product.ratings.aggregate(avg=Avg('score'))['avg']
-            rating = round(avg_rating, 2) if avg_rating is not None else 0
-            
-            products_data.append({
-                'id': product.id,
-                'name': product.name,
-                'brand': product.brand,
-                'description': product.description,
-                'base_price': str(product.base_price),
-                'current_price': str(product.current_price),
-                'discount_percentage': str(product.discount_percentage),
-                'discount_start_date': product.discount_start_date,
-                'discount_end_date': product.discount_end_date,
-                'image_url': getattr(product, 'image_url', f'https://via.placeholder.com/300x300.png?text={product.category}'),
-                'category': product.category,
-                'rating': rating,
-                'num_ratings': product.ratings.count()
-            })
-        
         # Preparar respuesta con metadatos de paginación
         response_data = {
-            'data': products_data,
+            'data': [_product_list_data(product) for product in current_page],
             'pagination': {
                 'currentPage': page,
                 'totalPages': paginator.num_pages,
@@ -204,6 +283,10 @@ def get_products(request):
         }
         
         return Response(response_data)
+    except (InvalidPagination, InvalidOperation) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ValueError:
+        return Response({'error': 'page y limit deben ser enteros'}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Error en get_products: {str(e)}")
         return Response({'error': str(e)}, status=500)
@@ -309,10 +392,10 @@ def delete_product(request, product_id):
 )
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@cache_catalog_response('product')
 def get_product_by_id(request, product_id):
     try:
-        product = Product.objects.get(id=product_id)
-        inventory = Inventory.objects.filter(product=product).first()
+        product = Product.objects.with_catalog_stats().get(id=product_id)
         
         response_data = {
             'id': product.id,
@@ -328,9 +411,9 @@ def get_product_by_id(request, product_id):
             'current_price': float(product.current_price),
             'average_rating': product.average_rating,
             'inventory': {
-                'quantity': inventory.quantity if inventory else 0,
-                'last_updated': inventory.last_updated if inventory else None
-            } if inventory else None
+                'quantity': product.stock,
+                'last_updated': product.stock_updated_at
+            } if product.stock_updated_at else None
         }
         
         return Response(response_data)
@@ -345,6 +428,192 @@ def get_product_by_id(request, product_id):
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+@swagger_auto_schema(
+    method='get',
+    operation_description="Productos más parecidos por contenido (nombre, marca, categoría y descripción)",
+    manual_parameters=[
+        openapi.Parameter(
+            'limit',
+            openapi.IN_QUERY,
+            description='Cantidad de productos similares',
+            type=openapi.TYPE_INTEGER,
+            default=10
+        ),
+    ],
+    responses={
+        200: openapi.Response(
+            description="Productos similares, del más parecido al menos parecido",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'product_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'data': openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'name': openapi.Schema(type=openapi.TYPE_STRING),
+                                'brand': openapi.Schema(type=openapi.TYPE_STRING),
+                                'category': openapi.Schema(type=openapi.TYPE_STRING),
+                                'current_price': openapi.Schema(type=openapi.TYPE_STRING),
+                                'rating': openapi.Schema(type=openapi.TYPE_NUMBER),
+                                'stock': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'similarity': openapi.Schema(type=openapi.TYPE_NUMBER),
+                            }
+                        )
+                    ),
+                }
+            )
+        ),
+        401: openapi.Response(description="Unauthorized"),
+        404: openapi.Response(description="Product not found"),
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@cache_catalog_response('similar')
+def get_similar_products(request, product_id):
+    try:
+        limit = parse_limit(request.GET.get('limit'), settings.SIMILAR_PRODUCTS_LIMIT)
+    except ValueError:
+        return Response({'error': 'limit debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # El índice puede tener productos que otro proceso borró: los que no aparecen en la
+    # base se quitan del índice y se vuelve a buscar (casi siempre basta una consulta)
+    products, wanted = {}, [product_id]
+    while True:
+        similar = similar_products(product_id, limit)
+        wanted += [similar_id for similar_id, _ in similar if similar_id not in products]
+        products.update(
+            (product.id, product)
+            for product in Product.objects.with_catalog_stats().with_current_price().filter(id__in=wanted)
+        )
+        stale = [missing_id for missing_id in wanted if missing_id not in products]
+        wanted = []
+        if not stale:
+            break
+        forget_stale_products(stale)
+        if product_id in stale:
+            return Response({'error': 'Producto no encontrado'}, status=status.HTTP_404_NOT_FOUND)
+
+    data = [
+        {**_product_list_data(products[similar_id]), 'similarity': round(score, 4)}
+        for similar_id, score in similar
+    ]
+    return Response({'product_id': product_id, 'data': data})
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Productos en tendencia: unidades vendidas con decaimiento exponencial "
+                          "(la mitad cada TRENDING_HALF_LIFE_HOURS horas). Sin categoría incluye "
+                          "también las categorías en tendencia",
+    manual_parameters=[
+        openapi.Parameter(
+            'category',
+            openapi.IN_QUERY,
+            description='Solo productos de esta categoría',
+            type=openapi.TYPE_STRING,
+            required=False
+        ),
+        openapi.Parameter(
+            'limit',
+            openapi.IN_QUERY,
+            description='Cantidad de productos (como máximo TRENDING_TOP_K)',
+            type=openapi.TYPE_INTEGER,
+            default=10
+        ),
+    ],
+    responses={
+        200: openapi.Response(
+            description="Productos en tendencia, del puntaje más alto al más bajo",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'category': openapi.Schema(type=openapi.TYPE_STRING),
+                    'data': openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                                'name': openapi.Schema(type=openapi.TYPE_STRING),
+                                'category': openapi.Schema(type=openapi.TYPE_STRING),
+                                'current_price': openapi.Schema(type=openapi.TYPE_STRING),
+                                'trending_score': openapi.Schema(type=openapi.TYPE_NUMBER),
+                            }
+                        )
+                    ),
+                    'categories': openapi.Schema(
+                        type=openapi.TYPE_ARRAY,
+                        items=openapi.Schema(
+                            type=openapi.TYPE_OBJECT,
+                            properties={
+                                'category': openapi.Schema(type=openapi.TYPE_STRING),
+                                'trending_score': openapi.Schema(type=openapi.TYPE_NUMBER),
+                            }
+                        )
+                    ),
+                }
+            )
+        ),
+        400: openapi.Response(description="Invalid limit"),
+        401: openapi.Response(description="Unauthorized"),
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_trending_products(request):
+    try:
+        limit = min(parse_limit(request.GET.get('limit')), settings.TRENDING_TOP_K)
+    except ValueError:
+        return Response({'error': 'limit debe ser un entero'}, status=status.HTTP_400_BAD_REQUEST)
+    category = request.GET.get('category') or None
+
+    # Lectura de la lista ordenada en memoria: no depende del volumen de ventas
+    trending = get_trending()
+    ranked = trending.trending_products(limit, category)
+    products = Product.objects.with_catalog_stats().with_current_price().in_bulk(
+        [product_id for product_id, _ in ranked]
+    )
+    response_data = {
+        'category': category,
+        'data': [
+            {**_product_list_data(products[product_id]), 'trending_score': round(score, 4)}
+            for product_id, score in ranked if product_id in products
+        ],
+    }
+    if category is None:
+        response_data['categories'] = [
+            {'category': name, 'trending_score': round(score, 4)}
+            for name, score in trending.trending_categories(limit)
+        ]
+    return Response(response_data)
+
+@swagger_auto_schema(
+    method='get',
+    operation_description="Contadores de la caché de lecturas del catálogo",
+    responses={
+        200: openapi.Response(
+            description="Estadísticas de la caché",
+            schema=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'version': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'hits': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'misses': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    'hit_ratio': openapi.Schema(type=openapi.TYPE_NUMBER),
+                }
+            )
+        ),
+        401: openapi.Response(description="Unauthorized")
+    }
+)
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_catalog_cache_stats(request):
+    return Response(cache_stats())
+
 # Inventario
 @swagger_auto_schema(
     method='post',
@@ -385,6 +654,7 @@ def create_inventory(request):
 
 @swagger_auto_schema(
     method='get',
+    manual_parameters=[CURSOR_PARAMETER],
     responses={
         200: openapi.Response('Inventario encontrado'),
         401: openapi.Response(description="Unauthorized"),
@@ -414,14 +684,32 @@ def get_inventory(request, product_id=None):
             return Response({'error': 'Inventory not found'}, status=status.HTTP_404_NOT_FOUND)
     else:
         inventories = Inventory.objects.select_related('product').all()
+
+        # Inventory no tiene created_at: el cursor se ordena solo por id
+        if 'cursor' in request.GET:
+            try:
+                items, pagination = paginate_by_cursor(
+                    inventories, request.GET['cursor'], parse_limit(request.GET.get('limit')),
+                    keys=('id',)
+                )
+            except InvalidPagination as e:
+                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            return Response({
+                'data': [_inventory_data(inventory) for inventory in items],
+                'pagination': pagination
+            })
+
         logger.info(f"Número de inventarios encontrados: {inventories.count()}")
-        return Response([{
-            'id': inventory.id,
-            'product_id': inventory.product.id,
-            'product_name': inventory.product.name,
-            'quantity': inventory.quantity,
-            'last_updated': inventory.last_updated
-        } for inventory in inventories])
+        return Response([_inventory_data(inventory) for inventory in inventories])
+
+def _inventory_data(inventory):
+    return {
+        'id': inventory.id,
+        'product_id': inventory.product.id,
+        'product_name': inventory.product.name,
+        'quantity': inventory.quantity,
+        'last_updated': inventory.last_updated
+    }
 
 # Ratings
 @swagger_auto_schema(
@@ -431,12 +719,13 @@ def get_inventory(request, product_id=None):
         required=['product_id', 'rating', 'review'],
         properties={
             'product_id': openapi.Schema(type=openapi.TYPE_INTEGER),
-            'rating': openapi.Schema(type=openapi.TYPE_INTEGER),
+            'rating': openapi.Schema(type=openapi.TYPE_INTEGER, minimum=1, maximum=5),
             'review': openapi.Schema(type=openapi.TYPE_STRING),
         }
     ),
     responses={
         201: openapi.Response(description="Rating created successfully"),
+        400: openapi.Response(description="Invalid rating"),
         401: openapi.Response(description="Unauthorized"),
         404: openapi.Response(description="Product not found"),
         500: openapi.Response(description="Server error")
@@ -445,19 +734,29 @@ def get_inventory(request, product_id=None):
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def create_rating(request):
+    try:
+        score = int(request.data['rating'])
+    except (KeyError, TypeError, ValueError):
+        score = None
+    if score is None or not 1 <= score <= 5:
+        return Response({'error': 'rating debe ser un entero entre 1 y 5'}, status=status.HTTP_400_BAD_REQUEST)
+
     try:
         product = Product.objects.get(id=request.data['product_id'])
-        rating = Rating.objects.create(
-            user=None,
+        # Un rating por usuario y producto: si ya existe se actualiza
+        rating, _ = Rating.objects.update_or_create(
+            user=request.user,
             product=product,
-            rating=request.data['rating'],
-            review=request.data['review']
+            defaults={
+                'score': score,
+                'review': request.data['review']
+            }
         )
         return Response({
             'id': rating.id,
-            'user_id': None,
+            'user_id': rating.user_id,
             'product_id': rating.product.id,
-            'rating': rating.rating,
+            'rating': rating.score,
             'review': rating.review,
             'created_at': rating.created_at
         }, status=status.HTTP_201_CREATED)
@@ -472,9 +771,9 @@ def get_product_ratings(request, product_id):
     ratings = Rating.objects.filter(product_id=product_id)
     return Response([{
         'id': rating.id,
-        'user_id': rating.user.id if rating.user else None,
-        'product_id': rating.product.id,
-        'rating': rating.rating,
+        'user_id': rating.user_id,
+        'product_id': rating.product_id,
+        'rating': rating.score,
         'review': rating.review,
         'created_at': rating.created_at
     } for rating in ratings])
@@ -505,8 +804,8 @@ def get_recommendations(request):
         # Inicializar el motor de recomendaciones
         recommendation_engine = AIRecommendationEngine()
         
-        # Obtener recomendaciones
-        recommendations = recommendation_engine.get_recommendations(
+        # Obtener recomendaciones (el motor es asíncrono)
+        recommendations = async_to_sync(recommendation_engine.get_recommendations)(
             user_data=user_data,
             is_admin=is_admin
         )
@@ -544,34 +843,28 @@ def create_sale(request):
     try:
         product = Product.objects.get(id=request.data['product_id'])
         quantity = int(request.data['quantity'])
+        if quantity <= 0:
+            return Response(
+                {'error': 'La cantidad debe ser mayor que cero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        # Verificar inventario
-        inventory = product.inventory_set.first()
-        if not inventory or inventory.quantity < quantity:
+        # Descontar inventario y crear la venta de forma atómica
+        try:
+            sale = place_sale(product, quantity, user=request.user)
+        except InsufficientStock:
             return Response(
                 {'error': 'No hay suficiente inventario'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Crear la venta
-        sale = Sale.objects.create(
-            user=None,
-            product=product,
-            quantity=quantity,
-            unit_price=product.current_price
-        )
-        
-        # Actualizar inventario
-        inventory.quantity -= quantity
-        inventory.save()
-        
         return Response({
             'id': sale.id,
             'product_name': product.name,
             'quantity': sale.quantity,
             'unit_price': str(sale.unit_price),
-            'total_amount': str(sale.total_amount),
-            'sale_date': sale.sale_date
+            'total_amount': str(sale.total_price),
+            'sale_date': sale.created_at
         }, status=status.HTTP_201_CREATED)
     except Product.DoesNotExist:
         return Response(
@@ -581,19 +874,175 @@ def create_sale(request):
     except Exception as e:
         return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+@swagger_auto_schema(
+    method='post',
+    operation_description="Registra todas las líneas de un carrito en una sola transacción (todo o nada)",
+    request_body=openapi.Schema(
+        type=openapi.TYPE_OBJECT,
+        required=['items'],
+        properties={
+            'items': openapi.Schema(
+                type=openapi.TYPE_ARRAY,
+                items=openapi.Schema(
+                    type=openapi.TYPE_OBJECT,
+                    required=['product_id', 'quantity'],
+                    properties={
+                        'product_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+                        'quantity': openapi.Schema(type=openapi.TYPE_INTEGER),
+                    }
+                )
+            ),
+        }
+    ),
+    responses={
+        201: openapi.Response(description="Order created successfully"),
+        400: openapi.Response(description="Invalid cart or not enough inventory"),
+        401: openapi.Response(description="Unauthorized"),
+        404: openapi.Response(description="Product not found")
+    }
+)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_checkout(request):
+    try:
+        items = request.data.get('items')
+        if not isinstance(items, list) or not items:
+            return Response(
+                {'error': 'items debe ser una lista no vacía'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        lines = [(int(item['product_id']), int(item['quantity'])) for item in items]
+        if any(quantity <= 0 for _, quantity in lines):
+            return Response(
+                {'error': 'La cantidad debe ser mayor que cero'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            sales = checkout(lines, user=request.user)
+        except InsufficientStock as e:
+            return Response(
+                {'error': 'No hay suficiente inventario', 'product_id': e.product_id},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response({
+            'sales': [{
+                'id': sale.id,
+                'product_id': sale.product_id,
+                'product_name': sale.product.name,
+                'quantity': sale.quantity,
+                'unit_price': str(sale.unit_price),
+                'total_price': str(sale.total_price)
+            } for sale in sales],
+            'total_price': str(sum(sale.total_price for sale in sales)),
+            'created_at': sales[0].created_at
+        }, status=status.HTTP_201_CREATED)
+    except Product.DoesNotExist as e:
+        return Response({'error': str(e)}, status=status.HTTP_404_NOT_FOUND)
+    except Exception as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+@swagger_auto_schema(
+    method='get',
+    manual_parameters=[
+        openapi.Parameter('page', openapi.IN_QUERY, description='Número de página',
+                          type=openapi.TYPE_INTEGER, default=1),
+        openapi.Parameter('limit', openapi.IN_QUERY, description='Elementos por página (máximo 200)',
+                          type=openapi.TYPE_INTEGER, default=10),
+        openapi.Parameter('date_from', openapi.IN_QUERY, description='Fecha o fecha-hora inicial (ISO 8601)',
+                          type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('date_to', openapi.IN_QUERY, description='Fecha o fecha-hora final, inclusiva (ISO 8601)',
+                          type=openapi.TYPE_STRING, required=False),
+        openapi.Parameter('product_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=False),
+        openapi.Parameter('user_id', openapi.IN_QUERY, type=openapi.TYPE_INTEGER, required=False),
+        openapi.Parameter('category', openapi.IN_QUERY, type=openapi.TYPE_STRING, required=False),
+        CURSOR_PARAMETER,
+    ]
+)
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_sales(request):
-    sales = Sale.objects.all()
-    return Response([{
-        'id': sale.id,
-        'product_name': sale.product.name,
-        'product_id': sale.product.id,
-        'quantity': sale.quantity,
-        'unit_price': str(sale.unit_price),
-        'total_price': str(sale.total_price),
-        'created_at': sale.created_at
-    } for sale in sales])
+    try:
+        sales = _filter_sales(Sale.objects.all(), request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Proyección con values(): una sola consulta con el join a products, sin instanciar modelos
+    sales = sales.values(
+        'id', 'product_id', 'product__name', 'user_id', 'quantity',
+        'unit_price', 'total_price', 'created_at'
+    ).order_by('created_at', 'id')
+    try:
+        limit = parse_limit(request.GET.get('limit'))
+    except InvalidPagination as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    if 'cursor' in request.GET:
+        try:
+            items, pagination = paginate_by_cursor(sales, request.GET['cursor'], limit)
+        except InvalidPagination as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'data': [_sale_data(sale) for sale in items],
+            'pagination': pagination
+        })
+
+    paginator = Paginator(sales, limit)
+    current_page = paginator.get_page(request.GET.get('page', 1))
+    return Response({
+        'data': [_sale_data(sale) for sale in current_page],
+        'pagination': {
+            'currentPage': current_page.number,
+            'totalPages': paginator.num_pages,
+            'totalItems': paginator.count,
+            'hasNextPage': current_page.has_next(),
+            'hasPrevPage': current_page.has_previous(),
+            'itemsPerPage': limit,
+        }
+    })
+
+def _parse_moment(value, end_of_day=False):
+    # Una fecha sin hora cubre el día completo cuando es el límite superior
+    try:
+        day = parse_date(value)
+        moment = parse_datetime(value) if day is None else None
+    except ValueError:
+        day = moment = None
+    if day is not None:
+        moment = datetime.combine(day + timedelta(days=1) if end_of_day else day, time.min)
+        if end_of_day:
+            moment -= timedelta(microseconds=1)
+    elif moment is None:
+        raise ValueError(f'Fecha inválida: {value}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+def _filter_sales(sales, params):
+    if params.get('date_from'):
+        sales = sales.filter(created_at__gte=_parse_moment(params['date_from']))
+    if params.get('date_to'):
+        sales = sales.filter(created_at__lte=_parse_moment(params['date_to'], end_of_day=True))
+    if params.get('product_id'):
+        sales = sales.filter(product_id=int(params['product_id']))
+    if params.get('user_id'):
+        sales = sales.filter(user_id=int(params['user_id']))
+    if params.get('category'):
+        sales = sales.filter(product__category=params['category'])
+    return sales
+
+def _sale_data(sale):
+    return {
+        'id': sale['id'],
+        'product_name': sale['product__name'],
+        'product_id': sale['product_id'],
+        'user_id': sale['user_id'],
+        'quantity': sale['quantity'],
+        'unit_price': str(sale['unit_price']),
+        'total_price': str(sale['total_price']),
+        'created_at': sale['created_at']
+    }
 
 @api_view(['GET'])
 @validate_token
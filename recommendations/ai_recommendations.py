@@ -1,44 +1,55 @@
-import google.generativeai as genai
-from django.conf import settings
 from products.models import Product
-from django.db.models import Avg, Count
 from asgiref.sync import sync_to_async
 import json
+import time
+from functools import partial
+
+from .llm_client import generate, get_generative_model
+from .models import LLMCallLog
+from .prompting import add_trend, products_for_prompt
 
 class AIRecommendationEngine:
     def __init__(self):
-        if not hasattr(settings, 'GOOGLE_API_KEY') or not settings.GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY no está configurada en settings")
-        genai.configure(api_key=settings.GOOGLE_API_KEY)
-        self.model = genai.GenerativeModel('gemini-pro')
+        # Cliente asíncrono compartido por el proceso (plazo y límite de concurrencia)
+        self.model = get_generative_model()
 
     @sync_to_async
     def get_product_data(self):
         """Obtener datos de productos para enviar al modelo"""
-        products = Product.objects.annotate(
-            avg_rating=Avg('ratings__score'),
-            num_ratings=Count('ratings'),
-            num_sales=Count('order_items')
-        ).values(
+        products = Product.objects.with_stats().values(
             'id', 'name', 'category', 'brand', 'base_price',
             'avg_rating', 'num_ratings', 'num_sales'
         )
-        return list(products)
+        return add_trend(list(products))
 
     async def get_recommendations(self, user_data, is_admin=False):
         """Obtener recomendaciones usando Google AI"""
         products = await self.get_product_data()
         
-        # Preparar el prompt según el tipo de usuario
+        # Preparar el prompt según el tipo de usuario, con una lista corta de candidatos
         if is_admin:
-            prompt = self._create_admin_prompt(products)
+            template_name, create_prompt = 'admin', self._create_admin_prompt
         else:
-            prompt = self._create_user_prompt(products, user_data)
+            template_name = 'history'
+            create_prompt = partial(self._create_user_prompt, user_data=user_data)
+        products_json, candidates = products_for_prompt(
+            products, user_data or {}, is_admin, fixed_text=create_prompt('')
+        )
+        prompt = create_prompt(products_json)
 
         try:
-            # Generar respuesta usando el modelo
-            response = await self.model.generate_content(prompt)
-            response_text = response.text
+            # Generar respuesta usando el modelo, registrando tamaño del prompt y latencia
+            started = time.perf_counter()
+            try:
+                response_text = await generate(prompt)
+            except Exception as e:
+                await sync_to_async(LLMCallLog.objects.record)(
+                    template_name, len(products), len(candidates), prompt, started, str(e)
+                )
+                raise
+            await sync_to_async(LLMCallLog.objects.record)(
+                template_name, len(products), len(candidates), prompt, started
+            )
             
             # Asegurarnos de que la respuesta es JSON válido
             # Si la respuesta contiene texto antes o después del JSON, lo limpiamos
@@ -61,15 +72,16 @@ class AIRecommendationEngine:
         except Exception as e:
             raise ValueError(f"Error al generar recomendaciones: {str(e)}")
 
-    def _create_admin_prompt(self, products):
+    def _create_admin_prompt(self, products_json):
         """Crear prompt para administradores"""
         return f"""
         Actúa como un sistema de recomendación de productos. 
         Analiza los siguientes productos y sus métricas:
-        {json.dumps(products, indent=2)}
+        {products_json}
 
         Como administrador, necesito que clasifiques los productos en tres categorías 
-        basándote en ventas, ratings y número de reseñas:
+        basándote en ventas, ratings y número de reseñas. num_sales es el total histórico;
+        trend son las unidades vendidas recientemente (con decaimiento), lo que está en tendencia:
         1. Altamente Recomendado (productos más vendidos y mejor calificados)
         2. Recomendado (productos con rendimiento promedio)
         3. No Recomendado (productos con bajo rendimiento)
@@ -82,7 +94,7 @@ class AIRecommendationEngine:
         }
         """
 
-    def _create_user_prompt(self, products, user_data):
+    def _create_user_prompt(self, products_json, user_data):
         """Crear prompt personalizado para usuarios"""
         return f"""
         Actúa como un sistema de recomendación de productos personalizado.
@@ -90,7 +102,7 @@ class AIRecommendationEngine:
         {json.dumps(user_data, indent=2)}
 
         Productos disponibles:
-        {json.dumps(products, indent=2)}
+        {products_json}
 
         Basándote en el historial de compras del usuario, sus preferencias y comportamiento,
         clasifica los productos en tres categorías:
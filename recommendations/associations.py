@@ -0,0 +1,127 @@
+"""
+Productos que se compran juntos, minados de la tabla de ventas.
+
+Las ventas de cada usuario se agrupan en sesiones (canastas): dos compras
+pertenecen a la misma canasta si las separan menos de `session_gap`. La tabla
+se recorre en orden (usuario, fecha) con un cursor del servidor, de a
+`chunk_size` filas, así que en memoria solo hay una canasta abierta.
+
+Los pares de cada canasta se acumulan en un búfer fijo de índices y se vuelcan
+periódicamente en una matriz dispersa triangular de co-ocurrencias: la memoria
+depende de la cantidad de pares distintos, no del largo del historial. Las
+canastas de más de `max_basket` productos (compras mayoristas) no aportan
+pares, porque su costo es cuadrático y no dicen nada de afinidad.
+
+Para cada par se calcula soporte (canastas con ambos / canastas), confianza
+(canastas con ambos / canastas con el producto) y lift (cuánto más se compran
+juntos de lo esperable si fueran independientes). Se conservan los pares con
+soporte y lift sobre los umbrales y, por producto, los top_k de mayor confianza.
+"""
+import math
+
+import numpy as np
+from scipy import sparse
+
+from products.models import Product, Sale
+
+# Pares que se acumulan antes de volcarlos en la matriz (dos arreglos int32 de este largo)
+PAIR_BUFFER = 1_000_000
+
+
+def iter_baskets(session_gap, chunk_size=10_000):
+    """Genera el conjunto de productos de cada sesión de compra."""
+    sales = Sale.objects.filter(user__isnull=False).order_by('user_id', 'created_at', 'id').values_list(
+        'user_id', 'product_id', 'created_at'
+    )
+    basket, current_user, last_at = set(), None, None
+    for user_id, product_id, created_at in sales.iterator(chunk_size=chunk_size):
+        if basket and (user_id != current_user or created_at - last_at > session_gap):
+            yield basket
+            basket = set()
+        basket.add(product_id)
+        current_user, last_at = user_id, created_at
+    if basket:
+        yield basket
+
+
+class PairCounter:
+    """Cuenta canastas por producto y por par de productos con memoria acotada."""
+
+    def __init__(self, product_ids, max_basket):
+        self.product_ids = np.asarray(list(product_ids), dtype=np.int64)
+        self.index = {int(product_id): i for i, product_id in enumerate(self.product_ids)}
+        if max_basket * (max_basket - 1) // 2 > PAIR_BUFFER:
+            raise ValueError(f'max_basket={max_basket} genera más pares por canasta de los que entran en el búfer')
+        self.max_basket = max_basket
+        n = len(self.product_ids)
+        self.item_counts = np.zeros(n, dtype=np.int64)
+        self.pairs = sparse.csr_matrix((n, n), dtype=np.int32)
+        self.baskets = 0
+        self.skipped = 0
+        self._rows = np.empty(PAIR_BUFFER, dtype=np.int32)
+        self._cols = np.empty(PAIR_BUFFER, dtype=np.int32)
+        self._buffered = 0
+
+    def add(self, basket):
+        items = sorted(self.index[product_id] for product_id in basket if product_id in self.index)
+        if not items:
+            return
+        self.baskets += 1
+        self.item_counts[items] += 1
+        if len(items) > self.max_basket:
+            self.skipped += 1
+            return
+        rows, cols = np.triu_indices(len(items), k=1)
+        if self._buffered + len(rows) > PAIR_BUFFER:
+            self._flush()
+        items = np.asarray(items, dtype=np.int32)
+        end = self._buffered + len(rows)
+        self._rows[self._buffered:end] = items[rows]
+        self._cols[self._buffered:end] = items[cols]
+        self._buffered = end
+
+    def _flush(self):
+        if not self._buffered:
+            return
+        rows, cols = self._rows[:self._buffered], self._cols[:self._buffered]
+        # coo -> csr suma los pares repetidos
+        self.pairs = self.pairs + sparse.csr_matrix(
+            (np.ones(len(rows), dtype=np.int32), (rows, cols)), shape=self.pairs.shape
+        )
+        self._buffered = 0
+
+    def associations(self, min_support, min_lift, top_k):
+        """[(product_id, associated_id, rank, canastas, soporte, confianza, lift)]"""
+        self._flush()
+        if not self.baskets:
+            return []
+        min_count = max(2, math.ceil(min_support * self.baskets))
+        pairs = (self.pairs + self.pairs.T).tocoo()
+        keep = pairs.data >= min_count
+        rows, cols, counts = pairs.row[keep], pairs.col[keep], pairs.data[keep].astype(np.float64)
+        lift = counts * self.baskets / (self.item_counts[rows] * self.item_counts[cols])
+        keep = lift >= min_lift
+        rows, cols, counts, lift = rows[keep], cols[keep], counts[keep], lift[keep]
+        confidence = counts / self.item_counts[rows]
+
+        # Por producto, de mayor a menor confianza (a igualdad, mayor lift)
+        order = np.lexsort((-lift, -confidence, rows))
+        result = []
+        rank, previous = 0, None
+        for i in order:
+            rank = rank + 1 if rows[i] == previous else 1
+            previous = rows[i]
+            if rank <= top_k:
+                result.append((
+                    int(self.product_ids[rows[i]]), int(self.product_ids[cols[i]]), rank, int(counts[i]),
+                    float(counts[i] / self.baskets), float(confidence[i]), float(lift[i])
+                ))
+        return result
+
+
+def mine_associations(session_gap, min_support, min_lift, top_k, max_basket, chunk_size=10_000):
+    """Devuelve (asociaciones, contador) recorriendo las ventas una sola vez."""
+    counter = PairCounter(Product.objects.order_by('id').values_list('id', flat=True), max_basket)
+    for basket in iter_baskets(session_gap, chunk_size):
+        counter.add(basket)
+    return counter.associations(min_support, min_lift, top_k), counter
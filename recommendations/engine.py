@@ -0,0 +1,225 @@
+"""
+Motor local de recomendaciones por filtrado colaborativo ítem-ítem.
+
+Se construye una matriz dispersa usuario x producto a partir de las ventas
+(unidades compradas, en escala logarítmica) y los ratings (puntaje / 5). Las
+columnas se normalizan y la similitud coseno entre productos se calcula por
+bloques, conservando solo los TOP-K vecinos de cada producto.
+
+Recomendar a un usuario es multiplicar su vector de interacciones (leído en
+el momento, así que incluye compras posteriores a la construcción) por la
+matriz de vecinos: unas pocas consultas pequeñas y un producto disperso.
+"""
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Sum
+from scipy import sparse
+from sklearn.preprocessing import normalize
+
+from products.models import Product, Rating, Sale
+
+BUCKETS = ('highly_recommended', 'recommended', 'not_recommended')
+LOW_SCORE = 2
+SIMILARITY_BLOCK = 2048
+
+
+def interaction_weight(units=0, score=None):
+    weight = np.log1p(units)
+    if score:
+        weight += score / 5
+    return weight
+
+
+class ItemSimilarityModel:
+    def __init__(self, product_ids, neighbours, popularity):
+        self.product_ids = product_ids
+        self.index = {int(product_id): i for i, product_id in enumerate(product_ids)}
+        self.neighbours = neighbours
+        self.popularity = popularity
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, top_k=None):
+        top_k = top_k or settings.RECOMMENDATION_NEIGHBOURS
+        product_ids = np.array(sorted(Product.objects.values_list('id', flat=True)), dtype=np.int64)
+        index = {int(product_id): i for i, product_id in enumerate(product_ids)}
+
+        interactions = {}
+        purchases = Sale.objects.filter(user__isnull=False).values('user_id', 'product_id').annotate(
+            units=Sum('quantity')
+        ).values_list('user_id', 'product_id', 'units')
+        for user_id, product_id, units in purchases.iterator():
+            interactions[user_id, product_id] = [units, None]
+        for user_id, product_id, score in Rating.objects.values_list('user_id', 'product_id', 'score').iterator():
+            interactions.setdefault((user_id, product_id), [0, None])[1] = score
+
+        users = {}
+        rows, cols, values = [], [], []
+        for (user_id, product_id), (units, score) in interactions.items():
+            if product_id not in index:
+                continue
+            rows.append(users.setdefault(user_id, len(users)))
+            cols.append(index[product_id])
+            values.append(interaction_weight(units, score))
+        matrix = sparse.csr_matrix(
+            (np.asarray(values, dtype=np.float32), (rows, cols)),
+            shape=(len(users), len(product_ids))
+        )
+        popularity = np.asarray(matrix.sum(axis=0)).ravel()
+        return cls(product_ids, cls._top_k_similarities(matrix, top_k), popularity)
+
+    @staticmethod
+    def _top_k_similarities(matrix, top_k):
+        """Coseno ítem-ítem por bloques de filas, dejando los top_k vecinos de cada producto."""
+        n = matrix.shape[1]
+        if not matrix.nnz:
+            return sparse.csr_matrix((n, n), dtype=np.float32)
+        items = normalize(matrix.tocsc(), axis=0).T.tocsr()
+        rows, cols, values = [], [], []
+        for start in range(0, n, SIMILARITY_BLOCK):
+            block = (items[start:start + SIMILARITY_BLOCK] @ items.T).tocsr()
+            for offset in range(block.shape[0]):
+                begin, end = block.indptr[offset], block.indptr[offset + 1]
+                data, indices = block.data[begin:end], block.indices[begin:end]
+                other = (indices != start + offset) & (data > 0)
+                data, indices = data[other], indices[other]
+                if len(data) > top_k:
+                    keep = np.argpartition(data, -top_k)[-top_k:]
+                    data, indices = data[keep], indices[keep]
+                rows.extend([start + offset] * len(data))
+                cols.extend(indices)
+                values.extend(data)
+        return sparse.csr_matrix((np.asarray(values, dtype=np.float32), (rows, cols)), shape=(n, n))
+
+    @staticmethod
+    def load_interactions(user_ids):
+        """{user_id: (compras, ratings)} de varios usuarios en dos consultas."""
+        interactions = {user_id: ({}, {}) for user_id in user_ids}
+        for user_id, product_id, units in Sale.objects.filter(user_id__in=user_ids).values(
+            'user_id', 'product_id'
+        ).annotate(units=Sum('quantity')).values_list('user_id', 'product_id', 'units'):
+            interactions[user_id][0][product_id] = units
+        for user_id, product_id, score in Rating.objects.filter(user_id__in=user_ids).values_list(
+            'user_id', 'product_id', 'score'
+        ):
+            interactions[user_id][1][product_id] = score
+        return interactions
+
+    def user_vector(self, purchased, rated):
+        vector = np.zeros(len(self.product_ids), dtype=np.float32)
+        for product_id in purchased.keys() | rated.keys():
+            if product_id in self.index:
+                vector[self.index[product_id]] = interaction_weight(purchased.get(product_id, 0), rated.get(product_id))
+        return vector
+
+    def recommend(self, user_id, size=None):
+        """
+        Devuelve {bucket: [(product_id, puntaje, razón)]} con las tres
+        categorías de siempre. Sin historial, se recurre a la popularidad.
+        """
+        purchased, rated = self.load_interactions([user_id])[user_id]
+        return self.recommend_from(purchased, rated, size)
+
+    def recommend_many(self, user_ids, size=None):
+        """Como recommend, para un lote de usuarios con las mismas dos consultas."""
+        return {
+            user_id: self.recommend_from(purchased, rated, size)
+            for user_id, (purchased, rated) in self.load_interactions(user_ids).items()
+        }
+
+    def recommend_from(self, purchased, rated, size=None):
+        size = size or settings.RECOMMENDATION_BUCKET_SIZE
+        vector = self.user_vector(purchased, rated)
+        seen = {self.index[p] for p in purchased.keys() | rated.keys() if p in self.index}
+        disliked = [self.index[p] for p, score in rated.items() if score <= LOW_SCORE and p in self.index]
+        # Un producto que no le gustó no debe atraer a sus vecinos
+        vector[disliked] = 0
+        scores = self.neighbours.T @ vector if seen else np.zeros(len(self.product_ids), dtype=np.float32)
+
+        result = {bucket: [] for bucket in BUCKETS}
+        taken = set(seen)
+        candidates = np.flatnonzero(scores > 0)
+        candidates = candidates[~np.isin(candidates, list(seen))]
+        ranked = candidates[np.argsort(-scores[candidates], kind='stable')][:2 * size].tolist()
+        for i in ranked[:size]:
+            result['highly_recommended'].append((i, scores[i], 'Comprado o valorado junto con productos de tu historial'))
+            taken.add(i)
+        for i in ranked[size:2 * size]:
+            result['recommended'].append((i, scores[i], 'Relacionado con productos que te interesaron'))
+            taken.add(i)
+        for i in np.argsort(-self.popularity, kind='stable'):
+            if len(result['recommended']) >= size:
+                break
+            if i not in taken:
+                result['recommended'].append((i, 0.0, 'Popular entre otros clientes'))
+                taken.add(i)
+
+        # No recomendados: lo que valoró mal y lo más parecido a eso. El puntaje es
+        # negativo: -2 para lo valorado mal y la similitud relativa (hasta -1) para el resto
+        for i in disliked:
+            result['not_recommended'].append((i, -2.0, 'Lo valoraste con una puntuación baja'))
+        if disliked:
+            dislike_scores = np.asarray(self.neighbours[disliked].sum(axis=0)).ravel()
+            dislike_scores /= max(dislike_scores.max(), 1e-9)
+            for i in np.argsort(-dislike_scores, kind='stable'):
+                if len(result['not_recommended']) >= size or dislike_scores[i] <= 0:
+                    break
+                if i not in taken and i not in disliked:
+                    result['not_recommended'].append((i, -float(dislike_scores[i]), 'Similar a productos que no te gustaron'))
+                    taken.add(i)
+
+        return {
+            bucket: [(int(self.product_ids[i]), float(score), reason) for i, score, reason in items[:size]]
+            for bucket, items in result.items()
+        }
+
+
+def rank_for_admin(size=None):
+    """
+    Clasificación por rendimiento para administradores: ventas y un rating
+    bayesiano (con pocas reseñas se acerca a la media del catálogo).
+    """
+    size = size or settings.RECOMMENDATION_BUCKET_SIZE
+    products = list(Product.objects.with_stats().values_list('id', 'avg_rating', 'num_ratings', 'units_sold'))
+    if not products:
+        return {bucket: [] for bucket in BUCKETS}
+    rated = [(avg, count) for _, avg, count, _ in products if count]
+    mean = sum(float(avg) * count for avg, count in rated) / max(sum(count for _, count in rated), 1)
+    max_units = max(units or 0 for _, _, _, units in products) or 1
+
+    def performance(row):
+        _, avg, count, units = row
+        bayes = (float(avg or 0) * count + mean * 5) / (count + 5)
+        return 0.5 * bayes / 5 + 0.5 * (units or 0) / max_units
+
+    ranked = [(row[0], performance(row)) for row in sorted(products, key=performance, reverse=True)]
+    return {
+        'highly_recommended': [(*row, 'Entre los más vendidos y mejor valorados') for row in ranked[:size]],
+        'recommended': [(*row, 'Rendimiento medio en ventas y valoraciones') for row in ranked[size:2 * size]],
+        'not_recommended': [(*row, 'Bajo rendimiento en ventas y valoraciones')
+                            for row in ranked[max(2 * size, len(ranked) - size):][::-1]],
+    }
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    """Modelo del proceso; se reconstruye al superar RECOMMENDATION_MODEL_MAX_AGE segundos."""
+    global _model
+    model = _model
+    if model is None or time.monotonic() - model.built_at > settings.RECOMMENDATION_MODEL_MAX_AGE:
+        with _model_lock:
+            if _model is model:
+                _model = ItemSimilarityModel.build()
+            model = _model
+    return model
+
+
+def reset_model():
+    global _model
+    _model = None
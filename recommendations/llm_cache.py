@@ -0,0 +1,147 @@
+"""
+Caché de respuestas del LLM de recomendaciones.
+
+El prompt solo depende de la plantilla, del catálogo y del segmento del
+usuario (administrador, sin historial o un usuario concreto con historial),
+así que muchas peticiones producen exactamente el mismo prompt. La clave es un
+hash de esos tres datos y hay dos niveles:
+
+* un LRU con TTL en la memoria del proceso (LLM_CACHE_MAX_ENTRIES entradas);
+* la caché compartida de Django (Redis con CACHE_BACKEND=redis), a través de
+  analytics.cache.aget_or_compute, que además garantiza una sola llamada al
+  LLM a la vez por clave.
+
+La versión del catálogo para el LLM no cambia con cada escritura: productos,
+ratings y ventas suman cambios (ver receivers.py) y la versión solo avanza al
+superar LLM_CACHE_CHANGE_THRESHOLD. Las entradas de versiones anteriores
+quedan sin uso y expiran por TTL o por LRU.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from analytics.cache import aget_or_compute
+
+LLM_VERSION_KEY = 'recommendations:llm:version'
+LLM_CHANGES_KEY = 'recommendations:llm:changes'
+
+
+class LRUCache:
+    """LRU con TTL por entrada, seguro entre hilos."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_memory = None
+_memory_lock = threading.Lock()
+
+
+def memory_cache():
+    global _memory
+    with _memory_lock:
+        if _memory is None:
+            _memory = LRUCache(settings.LLM_CACHE_MAX_ENTRIES)
+        return _memory
+
+
+def reset_memory_cache():
+    global _memory
+    _memory = None
+
+
+def _incr(key, delta=1):
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # La clave no existe todavía (o expiró): se inicializa
+        if cache.add(key, delta, timeout=None):
+            return delta
+        return cache.incr(key, delta)
+
+
+def llm_catalog_version():
+    version = cache.get(LLM_VERSION_KEY)
+    if version is None:
+        cache.add(LLM_VERSION_KEY, 1, timeout=None)
+        version = cache.get(LLM_VERSION_KEY, 1)
+    return version
+
+
+def record_catalog_changes(count=1):
+    """Suma cambios del catálogo; al superar el umbral invalida las respuestas cacheadas."""
+    if _incr(LLM_CHANGES_KEY, count) >= settings.LLM_CACHE_CHANGE_THRESHOLD:
+        cache.delete(LLM_CHANGES_KEY)
+        _incr(LLM_VERSION_KEY)
+
+
+def user_segment(template_name, user_data):
+    # Con historial el prompt incluye los datos del usuario, que entran en la clave
+    if template_name != 'history':
+        return template_name
+    raw = json.dumps(user_data, sort_keys=True, default=str)
+    return f"user:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+def llm_cache_key(template, segment):
+    raw = json.dumps([template, llm_catalog_version(), segment])
+    return f"recommendations:llm:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+async def acached_llm_response(template, segment, compute):
+    """
+    Devuelve (respuesta, hit) para el prompt identificado por la plantilla y
+    el segmento, esperando la corrutina `compute()` solo si no está en ninguno
+    de los dos niveles. Los errores no se cachean.
+    """
+    ttl = settings.LLM_CACHE_TTL
+    key = await sync_to_async(llm_cache_key)(template, segment)
+    memory = memory_cache()
+    value = memory.get(key)
+    if value is not None:
+        return value, True
+
+    computed = []
+
+    async def compute_once():
+        computed.append(True)
+        return await compute()
+
+    value, age = await aget_or_compute(key, compute_once, ttl=ttl, stale_ttl=0)
+    # En memoria no debe durar más que en la caché compartida
+    memory.set(key, value, max(ttl - age, 0))
+    return value, not computed
@@ -0,0 +1,175 @@
+"""
+Cliente asíncrono del LLM de recomendaciones.
+
+Las llamadas usan la API asíncrona de Gemini (generate_content_async): una
+petición en curso no ocupa un hilo mientras espera la respuesta. Cada llamada
+tiene un plazo de LLM_TIMEOUT segundos, que incluye la espera por un turno, y
+cada proceso admite como mucho LLM_MAX_CONCURRENCY llamadas simultáneas; las
+demás esperan sin bloquear el event loop. El límite es un semáforo de hilos
+compartido por todos los event loops del proceso: bajo WSGI, async_to_sync
+corre cada request en un loop propio, y un semáforo de asyncio por loop no
+limitaría nada.
+
+Un circuit breaker por proceso deja de llamar al modelo tras
+LLM_BREAKER_FAILURES fallos seguidos (errores, plazos vencidos o llamadas
+canceladas por el plazo de quien llama). Pasados LLM_BREAKER_RESET_TIMEOUT
+segundos deja pasar una sola llamada de prueba: si responde, se cierra; si
+falla, vuelve a abrirse.
+"""
+import asyncio
+import contextlib
+import json
+import threading
+import time
+
+from django.conf import settings
+
+
+class LLMUnavailable(Exception):
+    pass
+
+
+class LLMTimeout(LLMUnavailable):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.probe_started_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half-open' if self.probe_started_at is not None else 'open'
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            now = time.monotonic()
+            if now - self.opened_at < self.reset_timeout:
+                return False
+            # Una sola prueba a la vez; si quedó colgada, se permite otra
+            if self.probe_started_at is not None and now - self.probe_started_at < self.reset_timeout:
+                return False
+            self.probe_started_at = now
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.probe_started_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.probe_started_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                self.probe_started_at = None
+
+
+_model = None
+_model_lock = threading.Lock()
+
+# (límite, semáforo) del proceso; se recrea si cambia LLM_MAX_CONCURRENCY
+_slots = None
+_slots_lock = threading.Lock()
+# Cada cuánto reintenta tomar un turno una llamada que espera
+SLOT_POLL_INTERVAL = 0.01
+
+_breaker = None
+_breaker_lock = threading.Lock()
+
+
+def get_breaker():
+    global _breaker
+    with _breaker_lock:
+        if _breaker is None:
+            _breaker = CircuitBreaker(settings.LLM_BREAKER_FAILURES, settings.LLM_BREAKER_RESET_TIMEOUT)
+        return _breaker
+
+
+def reset_breaker():
+    global _breaker
+    _breaker = None
+
+
+def get_generative_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            if not getattr(settings, 'GOOGLE_API_KEY', None):
+                raise ValueError("GOOGLE_API_KEY no está configurada en settings")
+            # Dependencia opcional: solo hace falta con RECOMMENDATION_ENGINE=llm
+            import google.generativeai as genai
+            genai.configure(api_key=settings.GOOGLE_API_KEY)
+            _model = genai.GenerativeModel('gemini-pro')
+        return _model
+
+
+def _get_slots():
+    global _slots
+    with _slots_lock:
+        if _slots is None or _slots[0] != settings.LLM_MAX_CONCURRENCY:
+            _slots = (settings.LLM_MAX_CONCURRENCY, threading.BoundedSemaphore(settings.LLM_MAX_CONCURRENCY))
+        return _slots[1]
+
+
+@contextlib.asynccontextmanager
+async def _slot():
+    """Turno en el límite del proceso. Se espera sin bloquear el loop, y cancelar la espera no pierde turnos."""
+    slots = _get_slots()
+    while not slots.acquire(blocking=False):
+        await asyncio.sleep(SLOT_POLL_INTERVAL)
+    try:
+        yield
+    finally:
+        slots.release()
+
+
+async def generate(prompt, timeout=None):
+    """
+    Texto de la respuesta del modelo. LLMTimeout si no llega dentro del plazo,
+    LLMUnavailable si el circuito está abierto.
+    """
+    timeout = settings.LLM_TIMEOUT if timeout is None else timeout
+    breaker = get_breaker()
+    if not breaker.allow():
+        raise LLMUnavailable('El LLM está fuera de servicio (circuito abierto)')
+
+    async def call():
+        async with _slot():
+            response = await get_generative_model().generate_content_async(prompt)
+            return response.text
+
+    try:
+        text = await asyncio.wait_for(call(), timeout)
+    except asyncio.TimeoutError as e:
+        breaker.record_failure()
+        raise LLMTimeout(f'El LLM no respondió en {timeout} s') from e
+    except (Exception, asyncio.CancelledError):
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return text
+
+
+def parse_json_response(response_text):
+    """Extrae el objeto JSON de la respuesta, aunque venga rodeado de texto."""
+    try:
+        return json.loads(response_text)
+    except json.JSONDecodeError:
+        start_idx = response_text.find('{')
+        end_idx = response_text.rfind('}') + 1
+        if start_idx >= 0 and end_idx > start_idx:
+            json_str = response_text[start_idx:end_idx]
+            json_str = json_str.replace('\n', '').replace('\r', '').strip()
+            return json.loads(json_str)
+        raise ValueError("No se encontró JSON válido en la respuesta")
@@ -0,0 +1,61 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.utils import timezone
+
+from recommendations.engine import ItemSimilarityModel
+from recommendations.models import ProductRecommendation
+from users.models import User
+
+# Built once in the parent; forked workers inherit it instead of rebuilding
+_model = None
+
+
+def score_batch(user_ids):
+    with transaction.atomic():
+        return ProductRecommendation.objects.store(_model.recommend_many(user_ids))
+
+
+class Command(BaseCommand):
+    help = 'Precompute and store recommendations for every non-admin user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=1,
+                            help='Worker processes scoring batches in parallel (forked after building the model)')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--stale-only', action='store_true',
+                            help='Only score users without rows newer than RECOMMENDATION_MAX_AGE')
+
+    def handle(self, *args, **options):
+        global _model
+        started = time.perf_counter()
+        _model = ItemSimilarityModel.build()
+        built = time.perf_counter() - started
+
+        users = User.objects.filter(is_admin=False)
+        if options['stale_only']:
+            fresh_since = timezone.now() - timedelta(seconds=settings.RECOMMENDATION_MAX_AGE)
+            users = users.exclude(
+                id__in=ProductRecommendation.objects.filter(last_updated__gte=fresh_since).values('user_id')
+            )
+        user_ids = list(users.order_by('id').values_list('id', flat=True))
+        size = options['batch_size']
+        batches = [user_ids[i:i + size] for i in range(0, len(user_ids), size)]
+
+        if options['workers'] > 1:
+            # Children must open their own connections
+            connections.close_all()
+            with ProcessPoolExecutor(options['workers'], mp_context=multiprocessing.get_context('fork')) as pool:
+                rows = sum(pool.map(score_batch, batches))
+        else:
+            rows = sum(map(score_batch, batches))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully stored {rows} recommendations for {len(user_ids)} users '
+            f'(model {built:.1f} s, total {time.perf_counter() - started:.1f} s)'
+        ))
@@ -0,0 +1,43 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recommendations.associations import mine_associations
+from recommendations.models import ProductAssociation
+
+
+class Command(BaseCommand):
+    help = 'Mine frequently-bought-together product pairs from the sales table and store the top ones per product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--session-gap', type=int, default=30,
+                            help='Minutes between two purchases of a user that start a new basket')
+        parser.add_argument('--min-support', type=float, default=0.00001,
+                            help='Minimum fraction of baskets containing the pair (and at least 2 baskets)')
+        parser.add_argument('--min-lift', type=float, default=1.5)
+        parser.add_argument('--top-k', type=int, default=10, help='Associations stored per product')
+        parser.add_argument('--max-basket', type=int, default=50,
+                            help='Baskets with more distinct products add no pairs')
+        parser.add_argument('--chunk-size', type=int, default=10_000,
+                            help='Sales rows fetched per round trip while streaming')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        associations, counter = mine_associations(
+            session_gap=timedelta(minutes=options['session_gap']),
+            min_support=options['min_support'],
+            min_lift=options['min_lift'],
+            top_k=options['top_k'],
+            max_basket=options['max_basket'],
+            chunk_size=options['chunk_size'],
+        )
+        mined = time.perf_counter() - started
+        with transaction.atomic():
+            stored = ProductAssociation.objects.replace(associations)
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully stored {stored} associations from {counter.baskets} baskets '
+            f'({counter.skipped} over --max-basket, {counter.pairs.nnz} distinct pairs; '
+            f'mining {mined:.1f} s, total {time.perf_counter() - started:.1f} s)'
+        ))
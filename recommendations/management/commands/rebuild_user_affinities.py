@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from recommendations.models import UserAffinity
+
+
+class Command(BaseCommand):
+    help = 'Rebuild decayed category/brand affinities for every user from the sales and ratings tables'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = UserAffinity.objects.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully rebuilt user affinities ({created} rows before pruning to the top-K per user)'
+        ))
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0002_recommendation_reason'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LLMCallLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('template', models.CharField(max_length=20)),
+                ('catalog_size', models.PositiveIntegerField()),
+                ('candidates', models.PositiveIntegerField()),
+                ('prompt_chars', models.PositiveIntegerField()),
+                ('prompt_tokens', models.PositiveIntegerField()),
+                ('latency_ms', models.FloatField()),
+                ('success', models.BooleanField(default=True)),
+                ('error', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'llm_call_logs',
+                'indexes': [models.Index(fields=['created_at'], name='llm_call_logs_created_idx')],
+            },
+        ),
+    ]
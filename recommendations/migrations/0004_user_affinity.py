@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-17 12:38
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0003_llm_call_log'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserAffinity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('category', 'Categoría'), ('brand', 'Marca')], max_length=10)),
+                ('value', models.CharField(max_length=100)),
+                ('weight', models.FloatField()),
+                ('updated_at', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='affinities', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'user_affinities',
+                'constraints': [models.UniqueConstraint(fields=('user', 'kind', 'value'), name='user_affinities_user_kind_value_uniq')],
+            },
+        ),
+    ]
@@ -1,7 +1,13 @@
-from django.db import models
+import math
+import time
+
+from django.db import connection, models
 from django.conf import settings
+from django.utils import timezone
 from products.models import Product
 
+from .prompting import estimate_tokens
+
 class RecommendationType(models.TextChoices):
     HIGHLY_RECOMMENDED = 'HR', 'Altamente Recomendado'
     RECOMMENDED = 'R', 'Recomendado'
@@ -20,6 +26,35 @@ class UserPreference(models.Model):
         db_table = 'user_preferences'
         unique_together = ('user', 'product')
 
+class ProductRecommendationManager(models.Manager):
+    def store(self, recommendations):
+        """
+        Guarda {user_id: {bucket: [(product_id, puntaje, razón)]}} con un upsert
+        por lote y borra las filas de esos usuarios que ya no se recomiendan.
+        """
+        types = {
+            'highly_recommended': RecommendationType.HIGHLY_RECOMMENDED,
+            'recommended': RecommendationType.RECOMMENDED,
+            'not_recommended': RecommendationType.NOT_RECOMMENDED,
+        }
+        started = timezone.now()
+        rows = [
+            self.model(
+                user_id=user_id, product_id=product_id, score=score,
+                recommendation_type=types[bucket], reason=reason
+            )
+            for user_id, buckets in recommendations.items()
+            for bucket, items in buckets.items()
+            for product_id, score, reason in items
+        ]
+        self.bulk_create(
+            rows, batch_size=5000, update_conflicts=True, unique_fields=['user', 'product'],
+            update_fields=['score', 'recommendation_type', 'reason', 'last_updated']
+        )
+        self.filter(user_id__in=list(recommendations), last_updated__lt=started).delete()
+        return len(rows)
+
+
 class ProductRecommendation(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
@@ -29,8 +64,261 @@ class ProductRecommendation(models.Model):
         choices=RecommendationType.choices,
         default=RecommendationType.RECOMMENDED
     )
+    reason = models.CharField(max_length=255, blank=True, default='')
     last_updated = models.DateTimeField(auto_now=True)
 
+    objects = ProductRecommendationManager()
+
     class Meta:
         db_table = 'product_recommendations'
         unique_together = ('user', 'product')
+        indexes = [
+            # Lectura de las recomendaciones vigentes de un usuario
+            models.Index(fields=['user', 'last_updated'], name='product_recs_user_updated_idx'),
+        ]
+
+
+class LLMCallLogManager(models.Manager):
+    def record(self, template, catalog_size, candidates, prompt, started, error=''):
+        """Registra una llamada; `started` es el time.perf_counter() previo a la llamada."""
+        return self.create(
+            template=template, catalog_size=catalog_size, candidates=candidates,
+            prompt_chars=len(prompt), prompt_tokens=estimate_tokens(prompt),
+            latency_ms=(time.perf_counter() - started) * 1000,
+            success=not error, error=error
+        )
+
+
+class LLMCallLog(models.Model):
+    """Tamaño del prompt y latencia de cada llamada al LLM de recomendaciones."""
+    template = models.CharField(max_length=20)
+    catalog_size = models.PositiveIntegerField()
+    candidates = models.PositiveIntegerField()
+    prompt_chars = models.PositiveIntegerField()
+    prompt_tokens = models.PositiveIntegerField()
+    latency_ms = models.FloatField()
+    success = models.BooleanField(default=True)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = LLMCallLogManager()
+
+    class Meta:
+        db_table = 'llm_call_logs'
+        indexes = [
+            models.Index(fields=['created_at'], name='llm_call_logs_created_idx'),
+        ]
+
+
+class AffinityKind(models.TextChoices):
+    CATEGORY = 'category', 'Categoría'
+    BRAND = 'brand', 'Marca'
+
+
+class UserAffinityManager(models.Manager):
+    def record(self, events, now=None, create=True):
+        """
+        Suma eventos [(user_id, product_id, peso)] a las afinidades por categoría
+        y marca del producto con una sola sentencia. El peso guardado decae a la
+        mitad cada PREFERENCE_HALF_LIFE_DAYS días: al actualizar se decae el
+        valor anterior hasta `now` y se suma el nuevo.
+
+        Con create=False solo se actualizan filas existentes; se usa al borrar
+        ratings, que en un borrado en cascada del usuario no deben recrear filas.
+        """
+        events = [event for event in events if event[0] is not None and event[2]]
+        if not events:
+            return
+        now = now or timezone.now()
+        table = self.model._meta.db_table
+        row = '(%s::bigint, %s::bigint, %s::float8)'
+        dimensions = f"""
+            WITH e (user_id, product_id, weight) AS (VALUES {', '.join([row] * len(events))}),
+            {AFFINITY_DIMENSIONS_SQL}
+        """
+        decayed = f"{table}.weight * power(0.5, GREATEST(EXTRACT(EPOCH FROM %s - {table}.updated_at), 0) / %s)"
+        params = [
+            *(value for event in events for value in event),
+            AffinityKind.CATEGORY, AffinityKind.BRAND, now, now, _half_life_seconds()
+        ]
+        with connection.cursor() as cursor:
+            if not create:
+                cursor.execute(
+                    f"""
+                    {dimensions}
+                    UPDATE {table} SET updated_at = GREATEST(%s, {table}.updated_at), weight = {decayed} + d.weight
+                    FROM d WHERE {table}.user_id = d.user_id AND {table}.kind = d.kind AND {table}.value = d.value
+                    """,
+                    params
+                )
+                return
+            cursor.execute(
+                f"""
+                {dimensions}
+                INSERT INTO {table} (user_id, kind, value, weight, updated_at)
+                SELECT user_id, kind, value, weight, %s FROM d
+                ON CONFLICT (user_id, kind, value) DO UPDATE SET
+                    weight = {decayed} + EXCLUDED.weight,
+                    updated_at = GREATEST(EXCLUDED.updated_at, {table}.updated_at)
+                RETURNING user_id, xmax = 0
+                """,
+                params
+            )
+            grown = {user_id for user_id, inserted in cursor.fetchall() if inserted}
+        if grown:
+            self.prune(grown, now)
+
+    def rebuild(self, now=None):
+        """
+        Recalcula todas las afinidades desde las ventas y los ratings, decaídas a
+        `now`. Conserva los pesos negativos, igual que record(): solo profile()
+        los deja afuera.
+        """
+        now = now or timezone.now()
+        table = self.model._meta.db_table
+        half_life = _half_life_seconds()
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {table}')
+            cursor.execute(
+                f"""
+                WITH e (user_id, product_id, weight) AS (
+                    SELECT user_id, product_id, ln(1 + quantity) * power(0.5, EXTRACT(EPOCH FROM %s - created_at) / %s)
+                    FROM sales WHERE user_id IS NOT NULL
+                    UNION ALL
+                    SELECT user_id, product_id, (score - 3) / 2.0 * power(0.5, EXTRACT(EPOCH FROM %s - created_at) / %s)
+                    FROM ratings
+                ),
+                {AFFINITY_DIMENSIONS_SQL}
+                INSERT INTO {table} (user_id, kind, value, weight, updated_at)
+                SELECT user_id, kind, value, weight, %s FROM d WHERE weight <> 0
+                """,
+                [now, half_life, now, half_life, AffinityKind.CATEGORY, AffinityKind.BRAND, now]
+            )
+            created = cursor.rowcount
+        self.prune(None, now)
+        return created
+
+    def prune(self, user_ids, now=None):
+        """
+        Deja solo las PREFERENCE_TOP_K afinidades más fuertes por usuario y tipo
+        (de los usuarios indicados, o de todos con None).
+        """
+        now = now or timezone.now()
+        table = self.model._meta.db_table
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"""
+                DELETE FROM {table} WHERE id IN (
+                    SELECT id FROM (
+                        SELECT id, row_number() OVER (
+                            PARTITION BY user_id, kind
+                            ORDER BY weight * power(0.5, EXTRACT(EPOCH FROM %s - updated_at) / %s) DESC, id
+                        ) AS position
+                        FROM {table} {'WHERE user_id = ANY(%s)' if user_ids is not None else ''}
+                    ) ranked
+                    WHERE position > %s
+                )
+                """,
+                [now, _half_life_seconds(), *([list(user_ids)] if user_ids is not None else []), settings.PREFERENCE_TOP_K]
+            )
+
+    def profile(self, user_id, now=None):
+        """
+        Perfil del usuario en una consulta por índice: {'categories': [(valor, peso)],
+        'brands': [...]} con el peso decaído a `now`, de mayor a menor. Las
+        afinidades negativas (ratings bajos) no se incluyen.
+        """
+        now = now or timezone.now()
+        half_life = _half_life_seconds()
+        profile = {'categories': [], 'brands': []}
+        keys = {AffinityKind.CATEGORY: 'categories', AffinityKind.BRAND: 'brands'}
+        for kind, value, weight, updated_at in self.filter(user_id=user_id).values_list(
+            'kind', 'value', 'weight', 'updated_at'
+        ):
+            weight *= math.pow(0.5, max((now - updated_at).total_seconds(), 0) / half_life)
+            if weight > 0:
+                profile[keys[kind]].append((value, round(weight, 4)))
+        for items in profile.values():
+            items.sort(key=lambda item: (-item[1], item[0]))
+        return profile
+
+
+# Espera un CTE e (user_id, product_id, weight); agrega por categoría y marca del producto
+AFFINITY_DIMENSIONS_SQL = """
+d AS (
+    SELECT e.user_id, %s::varchar AS kind, p.category AS value, SUM(e.weight) AS weight
+    FROM e JOIN products p ON p.id = e.product_id GROUP BY e.user_id, p.category
+    UNION ALL
+    SELECT e.user_id, %s, p.brand, SUM(e.weight)
+    FROM e JOIN products p ON p.id = e.product_id GROUP BY e.user_id, p.brand
+)
+"""
+
+
+def _half_life_seconds():
+    return settings.PREFERENCE_HALF_LIFE_DAYS * 86400
+
+
+class UserAffinity(models.Model):
+    """Afinidad decaída de un usuario con una categoría o marca (ver UserAffinityManager)."""
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='affinities')
+    kind = models.CharField(max_length=10, choices=AffinityKind.choices)
+    value = models.CharField(max_length=100)
+    weight = models.FloatField()
+    updated_at = models.DateTimeField()
+
+    objects = UserAffinityManager()
+
+    class Meta:
+        db_table = 'user_affinities'
+        constraints = [
+            # También es el índice de la lectura del perfil por usuario
+            models.UniqueConstraint(fields=['user', 'kind', 'value'], name='user_affinities_user_kind_value_uniq'),
+        ]
+
+
+class ProductAssociationManager(models.Manager):
+    def replace(self, associations):
+        """
+        Reemplaza todas las asociaciones por [(product_id, associated_id, rank,
+        canastas, soporte, confianza, lift)]. Llamar dentro de una transacción:
+        las lecturas siguen viendo las anteriores hasta el commit.
+        """
+        computed_at = timezone.now()
+        self.all().delete()
+        self.bulk_create(
+            [
+                self.model(
+                    product_id=product_id, associated_product_id=associated_id, rank=rank,
+                    baskets=baskets, support=support, confidence=confidence, lift=lift,
+                    computed_at=computed_at
+                )
+                for product_id, associated_id, rank, baskets, support, confidence, lift in associations
+            ],
+            batch_size=5000
+        )
+        return len(associations)
+
+
+class ProductAssociation(models.Model):
+    """
+    Producto que se compra junto con otro, con sus métricas de co-compra.
+    Se recalcula por completo con `manage.py mine_associations`.
+    """
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='associations')
+    associated_product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    rank = models.PositiveSmallIntegerField()
+    baskets = models.IntegerField()
+    support = models.FloatField()
+    confidence = models.FloatField()
+    lift = models.FloatField()
+    computed_at = models.DateTimeField()
+
+    objects = ProductAssociationManager()
+
+    class Meta:
+        db_table = 'product_associations'
+        constraints = [
+            # También es el índice de la lectura por producto, ya en orden
+            models.UniqueConstraint(fields=['product', 'rank'], name='product_associations_product_rank_uniq'),
+        ]
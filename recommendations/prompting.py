@@ -0,0 +1,122 @@
+"""
+Preselección de candidatos para los prompts del LLM.
+
+En lugar de pegar el catálogo entero con json.dumps(indent=2), se puntúa cada
+producto localmente (popularidad, rating bayesiano y afinidad con las
+categorías del usuario), se queda una lista corta y se serializa en forma
+columnar compacta: {"id": [...], "name": [...], ...} sin espacios, de modo
+que los nombres de los campos aparecen una sola vez.
+
+La lista se recorta hasta que el prompt completo entra en
+LLM_PROMPT_TOKEN_BUDGET. Los tokens se estiman por caracteres (no hay
+tokenizador local del modelo), con un margen conservador.
+"""
+import json
+import math
+
+from django.conf import settings
+
+from analytics.trending import get_trending
+
+# Columnas que se envían al modelo; image_url no le aporta nada
+PROMPT_COLUMNS = ('id', 'name', 'brand', 'category', 'base_price', 'avg_rating', 'num_ratings', 'num_sales', 'trend')
+CHARS_PER_TOKEN = 3.5
+RATING_PRIOR = 5
+
+
+def estimate_tokens(text):
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def _as_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def add_trend(products):
+    """
+    Agrega a cada producto `trend`: unidades vendidas con decaimiento exponencial
+    (ver analytics/trending.py), que refleja lo que se vende ahora y no el total histórico.
+    """
+    scores = get_trending().product_scores([product['id'] for product in products])
+    for product in products:
+        product['trend'] = round(scores[product['id']], 2)
+    return products
+
+
+def candidate_scores(products, categories=()):
+    """
+    Puntaje barato por producto: popularidad (ventas históricas y, si hay,
+    tendencia reciente), rating bayesiano y afinidad de categoría.
+    """
+    rated = [(_as_float(p['avg_rating']), p['num_ratings'] or 0) for p in products if p['num_ratings']]
+    mean = sum(avg * count for avg, count in rated) / max(sum(count for _, count in rated), 1)
+    max_sales = max((p['num_sales'] or 0 for p in products), default=0)
+    max_trend = max((p.get('trend') or 0 for p in products), default=0)
+    categories = set(categories)
+    scores = []
+    for product in products:
+        count = product['num_ratings'] or 0
+        bayes = (_as_float(product['avg_rating']) * count + mean * RATING_PRIOR) / (count + RATING_PRIOR)
+        popularity = math.log1p(product['num_sales'] or 0) / math.log1p(max_sales) if max_sales else 0.0
+        if max_trend:
+            popularity = (popularity + (product.get('trend') or 0) / max_trend) / 2
+        affinity = 1.0 if product['category'] in categories else 0.0
+        scores.append(0.4 * bayes / 5 + 0.4 * popularity + 0.2 * affinity)
+    return scores
+
+
+def preselect_candidates(products, user_data, is_admin, limit=None):
+    """
+    Lista corta de candidatos ordenada por puntaje. Para administradores se
+    conservan los dos extremos, porque también deben clasificar lo que rinde mal.
+    """
+    limit = settings.LLM_MAX_CANDIDATES if limit is None else limit
+    categories = user_data.get('preferences', {}).get('categories', [])
+    scores = candidate_scores(products, categories)
+    ranked = [products[i] for i in sorted(range(len(products)), key=lambda i: (-scores[i], products[i]['id']))]
+    return _shortlist(ranked, limit, is_admin)
+
+
+def _shortlist(ranked, limit, is_admin):
+    if len(ranked) <= limit:
+        return ranked
+    if is_admin:
+        return ranked[:limit - limit // 2] + ranked[len(ranked) - limit // 2:]
+    return ranked[:limit]
+
+
+def compact_products(products):
+    columns = {column: [product.get(column) for product in products] for column in PROMPT_COLUMNS}
+    return json.dumps(columns, ensure_ascii=False, separators=(',', ':'), default=str)
+
+
+def products_for_prompt(products, user_data, is_admin, fixed_text='', budget=None):
+    """
+    Devuelve (json_columnar, candidatos) con tantos candidatos como entren en
+    el presupuesto de tokens junto al resto del prompt (`fixed_text`).
+    """
+    budget = budget or settings.LLM_PROMPT_TOKEN_BUDGET
+    available = budget - estimate_tokens(fixed_text)
+    ranked = preselect_candidates(products, user_data, is_admin)
+    candidates = ranked
+    serialized = compact_products(candidates)
+    while candidates and estimate_tokens(serialized) > available:
+        # Las filas ocupan parecido: se ajusta en proporción y se repite si aún no entra
+        keep = int(len(candidates) * available / estimate_tokens(serialized))
+        candidates = _shortlist(ranked, max(min(keep, len(candidates) - 1), 0), is_admin)
+        serialized = compact_products(candidates)
+    return serialized, candidates
+
+
+def build_prompt(template, products, user_data, is_admin, response_format=''):
+    """
+    Completa una plantilla con {products} y {user}. Devuelve (prompt, candidatos)
+    con la lista corta que entra en el presupuesto.
+    """
+    user = json.dumps(user_data, ensure_ascii=False, separators=(',', ':'), default=str)
+    fixed_text = template.format(products='', user=user) + response_format
+    serialized, candidates = products_for_prompt(products, user_data, is_admin, fixed_text)
+    return template.format(products=serialized, user=user) + response_format, candidates
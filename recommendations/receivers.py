@@ -0,0 +1,62 @@
+import math
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from products.models import Product, Rating
+from products.signals import rating_changed, sales_recorded
+
+from .llm_cache import record_catalog_changes
+from .models import ProductRecommendation, UserAffinity
+
+
+@receiver(sales_recorded)
+def invalidate_recommendations_on_sales(sender, sales, **kwargs):
+    user_ids = {sale.user_id for sale in sales if sale.user_id is not None}
+    if user_ids:
+        ProductRecommendation.objects.filter(user_id__in=user_ids).delete()
+
+
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def invalidate_recommendations_on_rating(sender, instance, **kwargs):
+    # La próxima consulta del usuario las recalcula con su nueva valoración
+    ProductRecommendation.objects.filter(user_id=instance.user_id).delete()
+
+
+@receiver(sales_recorded)
+def count_llm_changes_on_sales(sender, sales, **kwargs):
+    record_catalog_changes(len(sales))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=Rating)
+@receiver(post_delete, sender=Rating)
+def count_llm_changes(sender, **kwargs):
+    record_catalog_changes()
+
+
+def rating_affinity(score):
+    # 3 es neutro: 1 resta afinidad y 5 suma lo mismo que una compra
+    return (score - 3) / 2
+
+
+@receiver(sales_recorded)
+def update_affinities_on_sales(sender, sales, **kwargs):
+    UserAffinity.objects.record(
+        [(sale.user_id, sale.product_id, math.log1p(sale.quantity)) for sale in sales]
+    )
+
+
+@receiver(rating_changed)
+def update_affinities_on_rating(sender, rating, old_score, new_score, **kwargs):
+    weight = 0
+    if new_score is not None:
+        weight += rating_affinity(new_score)
+    if old_score is not None:
+        weight -= rating_affinity(old_score)
+    # Un rating borrado (p. ej. en cascada con el usuario) no debe recrear filas
+    UserAffinity.objects.record(
+        [(rating.user_id, rating.product_id, weight)], create=new_score is not None
+    )
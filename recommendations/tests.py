@@ -0,0 +1,352 @@
+import asyncio
+import threading
+from io import StringIO
+from types import SimpleNamespace
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from rest_framework_simplejwt.tokens import AccessToken
+
+from products.models import Product, Rating, Sale
+from users.models import User
+
+from .engine import ItemSimilarityModel, rank_for_admin
+from .llm_cache import LRUCache, acached_llm_response, record_catalog_changes, reset_memory_cache
+from .llm_client import CircuitBreaker, LLMTimeout, generate, reset_breaker
+from .models import ProductAssociation, ProductRecommendation, UserAffinity
+from .prompting import build_prompt, estimate_tokens
+from .views import PROMPT_TEMPLATES, RESPONSE_FORMAT, build_recommendations_response, get_stored_recommendations
+
+
+class ItemSimilarityModelTests(TestCase):
+    def setUp(self):
+        self.users = User.objects.bulk_create([
+            User(email=f'user{i}@example.com', name=f'User {i}') for i in range(5)
+        ])
+        self.products = Product.objects.bulk_create([
+            Product(name=f'Producto {i}', brand='Marca', description='Descripción',
+                    base_price=10, category='Hogar')
+            for i in range(6)
+        ])
+        a, b, c, d, e, f = self.products
+        # a y b se compran juntos; c y d también
+        for user in self.users[:4]:
+            Sale.objects.create(user=user, product=a, quantity=1)
+            Sale.objects.create(user=user, product=b, quantity=1)
+        for user in self.users[2:]:
+            Sale.objects.create(user=user, product=c, quantity=2)
+            Sale.objects.create(user=user, product=d, quantity=1)
+        Rating.objects.create(user=self.users[0], product=e, score=1)
+        Rating.objects.create(user=self.users[1], product=e, score=4)
+        Rating.objects.create(user=self.users[1], product=f, score=5)
+
+    def test_recommends_co_purchased_products(self):
+        model = ItemSimilarityModel.build()
+        newcomer = User.objects.create_user(email='new@example.com', name='New')
+        Sale.objects.create(user=newcomer, product=self.products[0], quantity=1)
+
+        buckets = model.recommend(newcomer.id, size=2)
+        self.assertEqual(buckets['highly_recommended'][0][0], self.products[1].id)
+        recommended = {product_id for product_id, _, _ in buckets['highly_recommended'] + buckets['recommended']}
+        self.assertNotIn(self.products[0].id, recommended)
+
+        # Lo que valoró mal y lo parecido a eso queda en no recomendados
+        buckets = model.recommend(self.users[0].id, size=3)
+        self.assertEqual(buckets['not_recommended'][0][0], self.products[4].id)
+        recommended = {product_id for product_id, _, _ in buckets['highly_recommended'] + buckets['recommended']}
+        self.assertNotIn(self.products[4].id, recommended)
+
+    def test_response_keeps_three_bucket_shape(self):
+        buckets = rank_for_admin(size=2)
+        data = build_recommendations_response({
+            bucket: [{'id': product_id, 'reason': reason} for product_id, _, reason in items]
+            for bucket, items in buckets.items()
+        })
+        self.assertEqual(set(data), {'highly_recommended', 'recommended', 'not_recommended'})
+        self.assertEqual(len(data['highly_recommended']), 2)
+        self.assertEqual(set(data['highly_recommended'][0]['product']), {
+            'id', 'name', 'brand', 'category', 'base_price', 'avg_rating',
+            'num_ratings', 'num_sales', 'image_url'
+        })
+
+    def test_stored_recommendations(self):
+        user = self.users[0]
+        model = ItemSimilarityModel.build()
+        buckets = model.recommend(user.id, size=2)
+        ProductRecommendation.objects.store({user.id: buckets})
+
+        with self.assertNumQueries(1):
+            stored = get_stored_recommendations(user.id)
+        for bucket, items in buckets.items():
+            self.assertEqual([rec['product']['id'] for rec in stored[bucket]], [item[0] for item in items])
+            self.assertEqual([rec['reason'] for rec in stored[bucket]], [item[2] for item in items])
+
+        # Volver a guardar reemplaza las filas; una compra las invalida
+        ProductRecommendation.objects.store({user.id: {'recommended': [(self.products[5].id, 0.5, 'Razón')]}})
+        self.assertEqual(ProductRecommendation.objects.filter(user=user).count(), 1)
+        Sale.objects.create(user=user, product=self.products[2], quantity=1)
+        self.assertIsNone(get_stored_recommendations(user.id))
+
+
+    def test_async_endpoint_matches_sync_endpoint(self):
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.users[1])}'}
+        sync_response = self.client.get('/api/recommendations/', headers=headers)
+        self.assertEqual(sync_response.status_code, 200)
+        async_response = async_to_sync(self.async_client.get)('/api/recommendations/async/', headers=headers)
+        self.assertEqual(async_response.status_code, 200)
+        self.assertEqual(async_response.json(), sync_response.json())
+        response = async_to_sync(self.async_client.get)('/api/recommendations/async/')
+        self.assertEqual(response.status_code, 401)
+
+    @override_settings(RECOMMENDATION_ENGINE='llm', RECOMMENDATION_DEADLINE=0.05, LLM_BREAKER_FAILURES=2)
+    def test_slow_llm_falls_back_to_local_ranking(self):
+        cache.clear()
+        reset_memory_cache()
+        reset_breaker()
+
+        async def generate_content_async(prompt):
+            await asyncio.sleep(1)
+
+        model = SimpleNamespace(generate_content_async=generate_content_async)
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(self.users[1])}'}
+        with mock.patch('recommendations.llm_client.get_generative_model', return_value=model) as get_model:
+            for _ in range(3):
+                response = self.client.get('/api/recommendations/', headers=headers)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.json()['source'], 'fallback')
+                self.assertTrue(response.json()['highly_recommended'])
+        # Tras dos plazos vencidos el circuito se abre y ya no se llama al modelo
+        self.assertEqual(get_model.call_count, 2)
+        reset_breaker()
+
+class UserAffinityTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='fan@example.com', name='Fan')
+        self.shoe, self.lamp, self.ball = Product.objects.bulk_create([
+            Product(name='Zapatilla', brand='Andes', description='d', base_price=10, category='Deportes'),
+            Product(name='Lámpara', brand='Lumen', description='d', base_price=10, category='Hogar'),
+            Product(name='Pelota', brand='Andes', description='d', base_price=10, category='Deportes'),
+        ])
+
+    def test_sales_and_ratings_update_the_profile(self):
+        Sale.objects.create(user=self.user, product=self.shoe, quantity=3)
+        rating = Rating.objects.create(user=self.user, product=self.lamp, score=5)
+        with self.assertNumQueries(1):
+            profile = UserAffinity.objects.profile(self.user.id)
+        self.assertEqual([value for value, _ in profile['categories']], ['Deportes', 'Hogar'])
+        self.assertEqual(profile['brands'][0][0], 'Andes')
+
+        # Cambiar el rating aplica solo la diferencia; uno bajo deja la afinidad negativa
+        rating.score = 1
+        rating.save()
+        profile = UserAffinity.objects.profile(self.user.id)
+        self.assertEqual([value for value, _ in profile['categories']], ['Deportes'])
+
+        # Recalcular desde cero da los mismos pesos, negativos incluidos
+        weights = dict(UserAffinity.objects.values_list('value', 'weight'))
+        UserAffinity.objects.rebuild()
+        rebuilt = dict(UserAffinity.objects.values_list('value', 'weight'))
+        self.assertEqual(rebuilt.keys(), weights.keys())
+        for value, weight in weights.items():
+            self.assertAlmostEqual(rebuilt[value], weight, places=4)
+
+        rating.delete()
+        self.assertAlmostEqual(UserAffinity.objects.get(kind='category', value='Hogar').weight, 0, places=6)
+
+    def test_weights_decay_and_rows_are_pruned(self):
+        Sale.objects.create(user=self.user, product=self.shoe, quantity=1)
+        weight = UserAffinity.objects.profile(self.user.id)['categories'][0][1]
+        later = timezone.now() + timedelta(days=30)
+        self.assertAlmostEqual(UserAffinity.objects.profile(self.user.id, now=later)['categories'][0][1], weight / 2, places=3)
+
+        with self.settings(PREFERENCE_TOP_K=1):
+            Sale.objects.create(user=self.user, product=self.lamp, quantity=5)
+        self.assertEqual(
+            list(UserAffinity.objects.filter(kind='category').values_list('value', flat=True)), ['Hogar']
+        )
+
+        Rating.objects.create(user=self.user, product=self.ball, score=5)
+        UserAffinity.objects.rebuild()
+        profile = UserAffinity.objects.profile(self.user.id)
+        self.assertEqual(dict(profile['categories']).keys(), {'Deportes', 'Hogar'})
+
+
+class ProductAssociationTests(TestCase):
+    def test_mines_sessions_and_serves_top_associations(self):
+        users = User.objects.bulk_create([User(email=f'buyer{i}@example.com', name=f'Buyer {i}') for i in range(6)])
+        tent, stove, lamp, mug = Product.objects.bulk_create([
+            Product(name=name, brand='Marca', description='d', base_price=10, category='Camping')
+            for name in ('Carpa', 'Anafe', 'Linterna', 'Taza')
+        ])
+        start = timezone.now() - timedelta(days=10)
+        sales = []
+        for i, user in enumerate(users):
+            # Carpa y anafe en la misma sesión; la taza días después, en otra canasta
+            sales += [Sale(user=user, product=tent, quantity=1, unit_price=10, total_price=10, created_at=start),
+                      Sale(user=user, product=stove, quantity=1, unit_price=10, total_price=10,
+                           created_at=start + timedelta(minutes=5)),
+                      Sale(user=user, product=mug, quantity=1, unit_price=10, total_price=10,
+                           created_at=start + timedelta(days=2))]
+            if i < 2:
+                sales.append(Sale(user=user, product=lamp, quantity=1, unit_price=10, total_price=10,
+                                  created_at=start + timedelta(days=2, minutes=1)))
+        Sale.objects.bulk_create(sales)
+
+        call_command('mine_associations', '--min-lift', '1.1', '--chunk-size', '4', stdout=StringIO())
+        self.assertEqual(
+            list(ProductAssociation.objects.order_by('product_id', 'rank').values_list(
+                'product_id', 'associated_product_id', 'baskets'
+            )),
+            # Taza y linterna en 2 de 12 canastas: lift 12 * 2 / (6 * 2) = 2
+            [(tent.id, stove.id, 6), (stove.id, tent.id, 6), (lamp.id, mug.id, 2), (mug.id, lamp.id, 2)]
+        )
+
+        headers = {'Authorization': f'Bearer {AccessToken.for_user(users[0])}'}
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/recommendations/bought-together/{tent.id}/', headers=headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['product']['id'] for item in response.data['data']], [stove.id])
+        self.assertEqual(response.data['data'][0]['confidence'], 1.0)
+
+
+@override_settings(LLM_CACHE_CHANGE_THRESHOLD=3)
+class LLMCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_memory_cache()
+
+    def test_identical_prompts_call_the_llm_once(self):
+        calls = []
+
+        async def ask():
+            calls.append(1)
+            return {'highly_recommended': [{'id': len(calls), 'reason': 'r'}]}
+
+        cached = async_to_sync(acached_llm_response)
+        first, hit = cached('plantilla', 'new', ask)
+        self.assertFalse(hit)
+        self.assertEqual(cached('plantilla', 'new', ask), (first, True))
+        reset_memory_cache()
+        self.assertEqual(cached('plantilla', 'new', ask), (first, True))
+        self.assertEqual(len(calls), 1)
+        cached('plantilla', 'admin', ask)
+        self.assertEqual(len(calls), 2)
+
+        # Pocos cambios no invalidan; superar el umbral sí
+        record_catalog_changes(2)
+        self.assertTrue(cached('plantilla', 'new', ask)[1])
+        record_catalog_changes()
+        self.assertFalse(cached('plantilla', 'new', ask)[1])
+        self.assertEqual(len(calls), 3)
+
+    def test_lru_evicts_least_recently_used(self):
+        lru = LRUCache(max_entries=2)
+        lru.set('a', 1, ttl=60)
+        lru.set('b', 2, ttl=60)
+        lru.get('a')
+        lru.set('c', 3, ttl=60)
+        self.assertEqual((lru.get('a'), lru.get('b'), lru.get('c')), (1, None, 3))
+        lru.set('d', 4, ttl=0)
+        self.assertIsNone(lru.get('d'))
+
+
+class PromptPreselectionTests(SimpleTestCase):
+    products = [
+        {'id': i, 'name': f'Producto {i}', 'brand': 'Marca', 'category': 'Hogar' if i % 2 else 'Deportes',
+         'base_price': '10.00', 'avg_rating': str(1 + i % 5), 'num_ratings': i % 7,
+         'num_sales': i, 'image_url': ''}
+        for i in range(1000)
+    ]
+    user_data = {'preferences': {'categories': ['Deportes'], 'recent_views': [], 'cart_items': []}}
+
+    def test_prompt_fits_the_token_budget(self):
+        with self.settings(LLM_PROMPT_TOKEN_BUDGET=2000, LLM_MAX_CANDIDATES=200):
+            prompt, candidates = build_prompt(
+                PROMPT_TEMPLATES['history'], self.products, self.user_data, False, RESPONSE_FORMAT
+            )
+        self.assertLessEqual(estimate_tokens(prompt), 2000)
+        self.assertTrue(0 < len(candidates) < 200)
+        # Los más vendidos de su categoría van primero
+        self.assertEqual(candidates[0]['category'], 'Deportes')
+        self.assertIn('"id":[', prompt)
+        self.assertNotIn('image_url', prompt)
+
+    def test_admin_shortlist_keeps_both_ends(self):
+        with self.settings(LLM_PROMPT_TOKEN_BUDGET=100000, LLM_MAX_CANDIDATES=10):
+            _, candidates = build_prompt(PROMPT_TEMPLATES['admin'], self.products, {}, True)
+        ids = [product['id'] for product in candidates]
+        self.assertEqual(len(ids), 10)
+        self.assertIn(999, ids[:5])
+        self.assertIn(0, ids[5:])
+
+
+class LLMClientTests(SimpleTestCase):
+    def fake_model(self, delay):
+        state = {'running': 0, 'peak': 0}
+        lock = threading.Lock()
+
+        async def generate_content_async(prompt):
+            with lock:
+                state['running'] += 1
+                state['peak'] = max(state['peak'], state['running'])
+            await asyncio.sleep(delay)
+            with lock:
+                state['running'] -= 1
+            return SimpleNamespace(text=prompt)
+
+        return SimpleNamespace(generate_content_async=generate_content_async), state
+
+    def test_concurrency_limit_and_deadline(self):
+        model, state = self.fake_model(delay=0.01)
+
+        async def many():
+            return await asyncio.gather(*(generate(str(i)) for i in range(10)))
+
+        with self.settings(LLM_MAX_CONCURRENCY=3, LLM_TIMEOUT=5), \
+                mock.patch('recommendations.llm_client.get_generative_model', return_value=model):
+            self.assertEqual(async_to_sync(many)(), [str(i) for i in range(10)])
+        self.assertEqual(state['peak'], 3)
+
+        # Requests síncronos: cada hilo corre async_to_sync con su propio event loop
+        model, state = self.fake_model(delay=0.05)
+        with self.settings(LLM_MAX_CONCURRENCY=3, LLM_TIMEOUT=5), \
+                mock.patch('recommendations.llm_client.get_generative_model', return_value=model):
+            threads = [threading.Thread(target=async_to_sync(generate), args=(str(i),)) for i in range(10)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(state['peak'], 3)
+
+        model, _ = self.fake_model(delay=1)
+        with self.settings(LLM_TIMEOUT=0.05), \
+                mock.patch('recommendations.llm_client.get_generative_model', return_value=model):
+            with self.assertRaises(LLMTimeout):
+                async_to_sync(generate)('prompt')
+
+
+class CircuitBreakerTests(SimpleTestCase):
+    def test_opens_after_failures_and_probes_to_recover(self):
+        breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual(breaker.state, 'open')
+        self.assertFalse(breaker.allow())
+
+        with mock.patch('recommendations.llm_client.time.monotonic', return_value=breaker.opened_at + 11):
+            self.assertTrue(breaker.allow())
+            self.assertEqual(breaker.state, 'half-open')
+            self.assertFalse(breaker.allow())
+            breaker.record_failure()
+            self.assertEqual(breaker.state, 'open')
+        with mock.patch('recommendations.llm_client.time.monotonic', return_value=breaker.opened_at + 11):
+            self.assertTrue(breaker.allow())
+            breaker.record_success()
+        self.assertEqual(breaker.state, 'closed')
+        self.assertTrue(breaker.allow())
@@ -3,4 +3,6 @@ from . import views
 
 urlpatterns = [
     path('recommendations/', views.get_recommendations, name='get_recommendations'),
+    path('recommendations/async/', views.get_recommendations_async, name='get_recommendations_async'),
+    path('recommendations/bought-together/<int:product_id>/', views.get_bought_together, name='get_bought_together'),
 ]
@@ -1,15 +1,30 @@
-from rest_framework.decorators import api_view
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
 from rest_framework.response import Response
-from rest_framework import status
-from django.db.models import Count, Avg
+import asyncio
+import logging
+import time
+from datetime import timedelta
 from products.models import Product
-from jwt import decode as jwt_decode
+from jwt import InvalidTokenError, decode as jwt_decode
 from django.conf import settings
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db.models import F
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
-import google.generativeai as genai
-import json
 from .serializers import ProductRecommendationSerializer
+from .engine import get_model, rank_for_admin
+from .llm_cache import acached_llm_response, user_segment
+from .llm_client import generate, parse_json_response
+from .models import LLMCallLog, ProductAssociation, ProductRecommendation, RecommendationType, UserAffinity
+from .prompting import add_trend, build_prompt
+
+logger = logging.getLogger(__name__)
+
+# Categorías y marcas preferidas que se envían en el prompt
+PROFILE_PROMPT_SIZE = 5
 
 # Definir esquemas de Swagger
 product_schema = openapi.Schema(
@@ -52,6 +67,11 @@ recommendations_response_schema = openapi.Schema(
             type=openapi.TYPE_ARRAY,
             items=recommendation_item_schema,
             description='Lista de productos no recomendados'
+        ),
+        'source': openapi.Schema(
+            type=openapi.TYPE_STRING,
+            enum=['local', 'llm', 'fallback'],
+            description='Origen: motor local, LLM o respaldo por ventas y ratings si el LLM no respondió a tiempo'
         )
     }
 )
@@ -64,57 +84,41 @@ error_schema = openapi.Schema(
     }
 )
 
-def get_ai_recommendations(products_data, user_data, is_admin):
-    """Obtiene recomendaciones usando Google AI"""
-    try:
-        if not hasattr(settings, 'GOOGLE_API_KEY') or not settings.GOOGLE_API_KEY:
-            raise ValueError("GOOGLE_API_KEY no está configurada en settings")
-        
-        genai.configure(api_key=settings.GOOGLE_API_KEY)
-        
-        # Crear el prompt según el tipo de usuario
-        if is_admin:
-            prompt = f"""
+# Plantillas de prompt por segmento de usuario; {products} y {user} se
+# completan con JSON. El hash de la plantilla forma parte de la clave de caché.
+PROMPT_TEMPLATES = {
+    'admin': """
             Actúa como un sistema de recomendación de productos. 
             Analiza los siguientes productos y sus métricas:
-            {json.dumps(products_data, indent=2)}
+            {products}
 
             Como administrador, necesito que clasifiques los productos en tres categorías 
-            basándote en ventas, ratings y número de reseñas:
+            basándote en ventas, ratings y número de reseñas. num_sales es el total histórico;
+            trend son las unidades vendidas recientemente (con decaimiento), lo que está en tendencia:
             1. Altamente Recomendado (productos más vendidos y mejor calificados)
             2. Recomendado (productos con rendimiento promedio)
             3. No Recomendado (productos con bajo rendimiento)
-            """
-        else:
-            # Verificar si el usuario tiene historial o preferencias
-            has_history = any([
-                user_data['preferences']['categories'],
-                user_data['preferences']['recent_views'],
-                user_data['preferences']['cart_items']
-            ])
-
-            if has_history:
-                prompt = f"""
+            """,
+    'history': """
                 Actúa como un sistema de recomendación de productos personalizado.
                 Datos del usuario:
-                {json.dumps(user_data, indent=2)}
+                {user}
 
                 Productos disponibles:
-                {json.dumps(products_data, indent=2)}
+                {products}
 
                 Basándote en el historial de compras del usuario, sus preferencias y comportamiento,
                 clasifica los productos en tres categorías:
                 1. Altamente Recomendado (productos que mejor se ajustan a sus preferencias)
                 2. Recomendado (productos que podrían interesarle)
                 3. No Recomendado (productos que probablemente no le interesen)
-                """
-            else:
-                prompt = f"""
+                """,
+    'new': """
                 Actúa como un sistema de recomendación de productos.
                 No hay historial de usuario disponible, así que basaremos las recomendaciones en las características de los productos.
 
                 Productos disponibles:
-                {json.dumps(products_data, indent=2)}
+                {products}
 
                 Clasifica los productos en tres categorías basándote en:
                 - Relación calidad-precio
@@ -127,9 +131,10 @@ def get_ai_recommendations(products_data, user_data, is_admin):
                 3. No Recomendado: Productos muy especializados o de nicho
 
                 IMPORTANTE: Asegúrate de incluir al menos 5 productos en cada categoría.
-                """
+                """,
+}
 
-        prompt += """
+RESPONSE_FORMAT = """
         IMPORTANTE: Debes responder SOLO con un objeto JSON con esta estructura exacta:
         {
             "highly_recommended": [{"id": product_id, "reason": "razón de la recomendación"}],
@@ -138,28 +143,265 @@ def get_ai_recommendations(products_data, user_data, is_admin):
         }
         """
 
-        # Obtener respuesta del modelo
-        model = genai.GenerativeModel('gemini-pro')
-        response = model.generate_content(prompt)
+def prompt_template_name(user_data, is_admin):
+    """Plantilla que corresponde al usuario"""
+    if is_admin:
+        return 'admin'
+    # Verificar si el usuario tiene historial o preferencias
+    has_history = any([
+        user_data['preferences']['categories'],
+        user_data['preferences']['recent_views'],
+        user_data['preferences']['cart_items']
+    ])
+    return 'history' if has_history else 'new'
 
-        # Extraer el JSON de la respuesta
-        response_text = response.text
-        try:
-            result = json.loads(response_text)
-            return result
-        except json.JSONDecodeError:
-            # Si falla el parsing, intentar extraer el JSON de la respuesta
-            start_idx = response_text.find('{')
-            end_idx = response_text.rfind('}') + 1
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response_text[start_idx:end_idx]
-                json_str = json_str.replace('\n', '').replace('\r', '').strip()
-                result = json.loads(json_str)
-                return result
-            raise ValueError("No se encontró JSON válido en la respuesta")
+async def get_ai_recommendations(products_data, user_data, is_admin):
+    """Obtiene recomendaciones usando Google AI, sin bloquear el event loop"""
+    # Crear el prompt según el tipo de usuario, con una lista corta de candidatos
+    template_name = prompt_template_name(user_data, is_admin)
+    prompt, candidates = build_prompt(
+        PROMPT_TEMPLATES[template_name], products_data, user_data, is_admin, RESPONSE_FORMAT
+    )
 
+    # Obtener respuesta del modelo, registrando tamaño del prompt y latencia
+    record_call = sync_to_async(LLMCallLog.objects.record)
+    started = time.perf_counter()
+    try:
+        response_text = await generate(prompt)
     except Exception as e:
+        await record_call(template_name, len(products_data), len(candidates), prompt, started, str(e))
         raise
+    await record_call(template_name, len(products_data), len(candidates), prompt, started)
+
+    # Extraer el JSON de la respuesta
+    return parse_json_response(response_text)
+
+def get_products_data(ids=None):
+    """Productos con sus métricas, serializables a JSON (todos o los indicados)"""
+    products = Product.objects.with_stats()
+    if ids is not None:
+        products = products.filter(id__in=ids)
+    products = products.values(
+        'id', 'name', 'category', 'brand', 'base_price',
+        'avg_rating', 'num_ratings', 'num_sales', 'image_url'
+    )
+    
+    # Convertir valores decimales a strings para serialización JSON
+    products_data = []
+    for product in products:
+        product_dict = dict(product)
+        # Convertir Decimal a string
+        if product_dict['base_price'] is not None:
+            product_dict['base_price'] = str(product_dict['base_price'])
+        if product_dict['avg_rating'] is not None:
+            product_dict['avg_rating'] = str(product_dict['avg_rating'])
+        # Asegurar que image_url no sea None
+        if product_dict['image_url'] is None:
+            product_dict['image_url'] = ''
+        products_data.append(product_dict)
+    return add_trend(products_data)
+
+def get_stored_recommendations(user_id):
+    """
+    Recomendaciones precalculadas y vigentes del usuario, ya con los datos de
+    cada producto, en una sola consulta. None si no hay o están vencidas.
+    """
+    fresh_since = timezone.now() - timedelta(seconds=settings.RECOMMENDATION_MAX_AGE)
+    rows = Product.objects.with_stats().filter(
+        productrecommendation__user_id=user_id,
+        productrecommendation__last_updated__gte=fresh_since,
+    ).annotate(
+        recommendation_type=F('productrecommendation__recommendation_type'),
+        recommendation_score=F('productrecommendation__score'),
+        recommendation_reason=F('productrecommendation__reason'),
+    ).order_by('-recommendation_score', 'id').values(
+        'id', 'name', 'category', 'brand', 'base_price', 'avg_rating', 'num_ratings',
+        'num_sales', 'image_url', 'recommendation_type', 'recommendation_reason'
+    )
+    buckets = {
+        RecommendationType.HIGHLY_RECOMMENDED: 'highly_recommended',
+        RecommendationType.RECOMMENDED: 'recommended',
+        RecommendationType.NOT_RECOMMENDED: 'not_recommended',
+    }
+    recommendations = {bucket: [] for bucket in buckets.values()}
+    products_data = []
+    for row in rows:
+        recommendations[buckets[row.pop('recommendation_type')]].append({
+            'id': row['id'], 'reason': row.pop('recommendation_reason')
+        })
+        row['base_price'] = str(row['base_price']) if row['base_price'] is not None else None
+        row['avg_rating'] = str(row['avg_rating']) if row['avg_rating'] is not None else None
+        row['image_url'] = row['image_url'] or ''
+        products_data.append(row)
+    if not products_data:
+        return None
+    # Los no recomendados van del más al menos parecido a lo que no le gustó
+    recommendations['not_recommended'].reverse()
+    return build_recommendations_response(recommendations, products_data)
+
+def build_recommendations_response(recommendations, products_data=None):
+    """Completa {categoría: [{'id', 'reason'}]} con los datos de cada producto"""
+    if products_data is None:
+        ids = [
+            rec['id'] for recs in recommendations.values() for rec in recs
+            if isinstance(rec, dict) and 'id' in rec
+        ]
+        products_data = get_products_data(ids)
+
+    # Preparar respuesta con datos completos de productos
+    products_dict = {
+        p['id']: {
+            'id': p['id'],
+            'name': p['name'],
+            'brand': p['brand'],
+            'category': p['category'],
+            'base_price': p['base_price'],
+            'avg_rating': p['avg_rating'],
+            'num_ratings': p['num_ratings'],
+            'num_sales': p['num_sales'],
+            'image_url': p['image_url']
+        } for p in products_data
+    }
+
+    response_data = {
+        'highly_recommended': [],
+        'recommended': [],
+        'not_recommended': []
+    }
+
+    for category in response_data.keys():
+        if category in recommendations:
+            for rec in recommendations[category]:
+                if isinstance(rec, dict) and 'id' in rec:
+                    product_id = rec['id']
+                    product = products_dict.get(product_id)
+                    if product:
+                        response_data[category].append({
+                            'product': product,
+                            'reason': rec.get('reason', '')
+                        })
+    return response_data
+
+class TokenError(Exception):
+    def __init__(self, error, detail):
+        super().__init__(detail)
+        self.data = {'error': error, 'detail': detail}
+
+def authenticate_request(request):
+    """Valida el token JWT del header Authorization y devuelve (user_id, is_admin)"""
+    auth_header = request.headers.get('Authorization', '')
+    if not auth_header:
+        raise TokenError('Token no proporcionado', 'No se encontró el header Authorization')
+
+    if not auth_header.startswith('Bearer '):
+        raise TokenError('Formato de token inválido', 'El header debe ser: Bearer <token>')
+
+    token = auth_header.split(' ')[1]
+    payload = jwt_decode(
+        token, 
+        settings.SECRET_KEY, 
+        algorithms=['HS256'],
+        options={
+            'verify_signature': True,
+            'verify_exp': True,
+            'verify_iat': True,
+        }
+    )
+    
+    # Validar tipo de token
+    token_type = payload.get('token_type')
+    if token_type != 'access':
+        raise TokenError('Token inválido', f'El token debe ser de tipo access, no {token_type}')
+
+    # Obtener datos del usuario
+    user_id = payload.get('user_id')
+    if not user_id:
+        raise TokenError('Token inválido', 'El token no contiene información del usuario')
+    # simplejwt guarda el id como texto
+    return int(user_id), payload.get('is_admin', False)
+
+def build_user_data(user_id, is_admin):
+    """Datos del usuario para el prompt, con su perfil de afinidades (una consulta por índice)"""
+    profile = UserAffinity.objects.profile(user_id) if not is_admin else {'categories': [], 'brands': []}
+    return {
+        'user_id': user_id,
+        'is_admin': is_admin,
+        'preferences': {
+            'categories': [value for value, _ in profile['categories'][:PROFILE_PROMPT_SIZE]],
+            'brands': [value for value, _ in profile['brands'][:PROFILE_PROMPT_SIZE]],
+            'recent_views': [],
+            'cart_items': []
+        }
+    }
+
+def recommend_locally(user_id, is_admin):
+    """Recomendaciones del motor local: guardadas si están vigentes, si no se calculan"""
+    if not is_admin:
+        stored = get_stored_recommendations(user_id)
+        if stored is not None:
+            return stored
+    if is_admin:
+        buckets = rank_for_admin()
+    else:
+        # Sin filas vigentes: se calcula en el momento y se guarda para las siguientes
+        buckets = get_model().recommend(user_id)
+        ProductRecommendation.objects.store({user_id: buckets})
+    return build_recommendations_response({
+        bucket: [{'id': product_id, 'reason': reason} for product_id, _, reason in items]
+        for bucket, items in buckets.items()
+    })
+
+def recommend_heuristic(user_id, is_admin):
+    """
+    Respaldo barato cuando el LLM no responde: las recomendaciones guardadas
+    del usuario si están vigentes y, si no, la clasificación por ventas y ratings.
+    """
+    if not is_admin:
+        stored = get_stored_recommendations(user_id)
+        if stored is not None:
+            return stored
+    return build_recommendations_response({
+        bucket: [{'id': product_id, 'reason': reason} for product_id, _, reason in items]
+        for bucket, items in rank_for_admin().items()
+    })
+
+async def recommend_with_fallback(user_id, is_admin):
+    """
+    Devuelve (respuesta, cabeceras) con la respuesta marcada por su origen:
+    'local' (motor local), 'llm' o 'fallback' si el LLM falló, tiene el
+    circuito abierto o no respondió dentro de RECOMMENDATION_DEADLINE segundos.
+    """
+    if settings.RECOMMENDATION_ENGINE != 'llm':
+        response_data = await sync_to_async(recommend_locally)(user_id, is_admin)
+        return {**response_data, 'source': 'local'}, {}
+    try:
+        response_data, hit = await asyncio.wait_for(
+            recommend_with_llm(await sync_to_async(build_user_data)(user_id, is_admin), is_admin),
+            settings.RECOMMENDATION_DEADLINE
+        )
+        return {**response_data, 'source': 'llm'}, {'X-Cache': 'HIT' if hit else 'MISS'}
+    except Exception as e:
+        logger.warning(f"Recomendaciones del LLM no disponibles, se usa el respaldo: {e!r}")
+    response_data = await sync_to_async(recommend_heuristic)(user_id, is_admin)
+    return {**response_data, 'source': 'fallback'}, {}
+
+async def recommend_with_llm(user_data, is_admin):
+    """Devuelve (respuesta, hit); prompts idénticos se sirven desde la caché"""
+    template_name = prompt_template_name(user_data, is_admin)
+
+    async def ask_llm():
+        products_data = await sync_to_async(get_products_data)()
+        recommendations = await get_ai_recommendations(products_data, user_data, is_admin)
+        if not isinstance(recommendations, dict):
+            raise ValueError("Las recomendaciones deben ser un diccionario")
+        return recommendations
+
+    recommendations, hit = await acached_llm_response(
+        PROMPT_TEMPLATES[template_name] + RESPONSE_FORMAT,
+        user_segment(template_name, user_data),
+        ask_llm
+    )
+    return await sync_to_async(build_recommendations_response)(recommendations), hit
 
 @swagger_auto_schema(
     method='get',
@@ -174,6 +416,13 @@ def get_ai_recommendations(products_data, user_data, is_admin):
     
     Para usuarios administradores, las recomendaciones se basan en métricas de ventas y calificaciones.
     Para usuarios regulares, se consideran sus preferencias y comportamiento de compra.
+
+    GET /api/recommendations/async/ devuelve lo mismo desde una vista asíncrona: con
+    RECOMMENDATION_ENGINE=llm no ocupa un hilo mientras espera al modelo. Cada llamada
+    al LLM tiene un plazo (LLM_TIMEOUT) y un límite de llamadas simultáneas por proceso.
+
+    Si el LLM no responde en RECOMMENDATION_DEADLINE segundos, falla o tiene el circuito
+    abierto tras varios fallos, se responde con una clasificación local (source='fallback').
     """,
     manual_parameters=[
         openapi.Parameter(
@@ -206,7 +455,8 @@ def get_ai_recommendations(products_data, user_data, is_admin):
                         'reason': 'Este producto coincide con tus preferencias de compra'
                     }],
                     'recommended': [],
-                    'not_recommended': []
+                    'not_recommended': [],
+                    'source': 'local'
                 }
             }
         ),
@@ -237,139 +487,17 @@ def get_ai_recommendations(products_data, user_data, is_admin):
 def get_recommendations(request):
     try:
         # Validar token
-        auth_header = request.headers.get('Authorization', '')
-        if not auth_header:
-            return Response({
-                'error': 'Token no proporcionado',
-                'detail': 'No se encontró el header Authorization'
-            }, status=401)
-            
-        if not auth_header.startswith('Bearer '):
-            return Response({
-                'error': 'Formato de token inválido',
-                'detail': 'El header debe ser: Bearer <token>'
-            }, status=401)
-        
-        token = auth_header.split(' ')[1]
-        
         try:
-            # Verificar la clave secreta
-            secret_key = settings.SECRET_KEY
-            
-            # Intentar decodificar sin verificar primero
-            unverified_payload = jwt_decode(token, options={"verify_signature": False})
-            
-            # Ahora intentar con verificación completa
-            payload = jwt_decode(
-                token, 
-                secret_key, 
-                algorithms=['HS256'],
-                options={
-                    'verify_signature': True,
-                    'verify_exp': True,
-                    'verify_iat': True,
-                }
-            )
-            
-            # Validar tipo de token
-            token_type = payload.get('token_type')
-            if token_type != 'access':
-                return Response({
-                    'error': 'Token inválido',
-                    'detail': f'El token debe ser de tipo access, no {token_type}'
-                }, status=401)
-            
-            # Obtener datos del usuario
-            user_id = payload.get('user_id')
-            is_admin = payload.get('is_admin', False)
-            
-            if not user_id:
-                return Response({
-                    'error': 'Token inválido',
-                    'detail': 'El token no contiene información del usuario'
-                }, status=401)
-                
-            user_data = {
-                'user_id': user_id,
-                'is_admin': is_admin,
-                'preferences': {
-                    'categories': [],
-                    'recent_views': [],
-                    'cart_items': []
-                }
-            }
-
-            # Obtener datos de productos
-            products = Product.objects.annotate(
-                avg_rating=Avg('ratings__score'),
-                num_ratings=Count('ratings'),
-                num_sales=Count('sale')
-            ).values(
-                'id', 'name', 'category', 'brand', 'base_price',
-                'avg_rating', 'num_ratings', 'num_sales', 'image_url'
-            )
-            
-            # Convertir valores decimales a strings para serialización JSON
-            products_data = []
-            for product in products:
-                product_dict = dict(product)
-                # Convertir Decimal a string
-                if product_dict['base_price'] is not None:
-                    product_dict['base_price'] = str(product_dict['base_price'])
-                if product_dict['avg_rating'] is not None:
-                    product_dict['avg_rating'] = str(product_dict['avg_rating'])
-                # Asegurar que image_url no sea None
-                if product_dict['image_url'] is None:
-                    product_dict['image_url'] = ''
-                products_data.append(product_dict)
-
-            # Obtener recomendaciones de IA
-            try:
-                recommendations = get_ai_recommendations(products_data, user_data, is_admin)
-                
-                if not isinstance(recommendations, dict):
-                    raise ValueError("Las recomendaciones deben ser un diccionario")
-                
-                # Preparar respuesta con datos completos de productos
-                products_dict = {
-                    p['id']: {
-                        'id': p['id'],
-                        'name': p['name'],
-                        'brand': p['brand'],
-                        'category': p['category'],
-                        'base_price': p['base_price'],
-                        'avg_rating': p['avg_rating'],
-                        'num_ratings': p['num_ratings'],
-                        'num_sales': p['num_sales'],
-                        'image_url': p['image_url']
-                    } for p in products_data
-                }
+            user_id, is_admin = authenticate_request(request)
+        except TokenError as e:
+            return Response(e.data, status=401)
 
-                response_data = {
-                    'highly_recommended': [],
-                    'recommended': [],
-                    'not_recommended': []
-                }
-
-                for category in response_data.keys():
-                    if category in recommendations:
-                        for rec in recommendations[category]:
-                            if isinstance(rec, dict) and 'id' in rec:
-                                product_id = rec['id']
-                                product = products_dict.get(product_id)
-                                if product:
-                                    response_data[category].append({
-                                        'product': product,
-                                        'reason': rec.get('reason', '')
-                                    })
-
-                return Response(response_data)
-
-            except Exception as e:
-                return Response(
-                    {'error': 'Error al obtener recomendaciones'}, 
-                    status=status.HTTP_500_INTERNAL_SERVER_ERROR
-                )
+        try:
+            # Motor local por defecto: no envía el catálogo a ningún servicio externo.
+            # Con el LLM este hilo espera hasta RECOMMENDATION_DEADLINE; con daphne
+            # conviene /api/recommendations/async/
+            response_data, headers = async_to_sync(recommend_with_fallback)(user_id, is_admin)
+            return Response(response_data, headers=headers)
         except Exception as e:
             return Response(
                 {'error': 'Error del servidor', 'details': str(e)},
@@ -380,3 +508,109 @@ def get_recommendations(request):
             {'error': 'Error del servidor', 'details': str(e)},
             status=500
         )
+
+@require_GET
+async def get_recommendations_async(request):
+    """
+    Mismas recomendaciones que get_recommendations, como vista asíncrona de
+    Django: mientras espera al LLM no ocupa ningún hilo del servidor.
+    """
+    try:
+        try:
+            user_id, is_admin = authenticate_request(request)
+        except TokenError as e:
+            return JsonResponse(e.data, status=401)
+
+        response_data, headers = await recommend_with_fallback(user_id, is_admin)
+        return JsonResponse(response_data, headers=headers)
+    except Exception as e:
+        return JsonResponse({'error': 'Error del servidor', 'details': str(e)}, status=500)
+
+bought_together_schema = openapi.Schema(
+    type=openapi.TYPE_OBJECT,
+    properties={
+        'product_id': openapi.Schema(type=openapi.TYPE_INTEGER),
+        'data': openapi.Schema(
+            type=openapi.TYPE_ARRAY,
+            items=openapi.Schema(
+                type=openapi.TYPE_OBJECT,
+                properties={
+                    'product': product_schema,
+                    'baskets': openapi.Schema(type=openapi.TYPE_INTEGER, description='Canastas con ambos productos'),
+                    'support': openapi.Schema(type=openapi.TYPE_NUMBER, description='Fracción de canastas con ambos'),
+                    'confidence': openapi.Schema(
+                        type=openapi.TYPE_NUMBER,
+                        description='Fracción de las canastas con el producto que también lo incluyen'
+                    ),
+                    'lift': openapi.Schema(
+                        type=openapi.TYPE_NUMBER,
+                        description='Cuántas veces más se compran juntos que si fueran independientes'
+                    ),
+                }
+            )
+        ),
+        'computed_at': openapi.Schema(type=openapi.TYPE_STRING, format='date-time'),
+    }
+)
+
+@swagger_auto_schema(
+    method='get',
+    operation_id='get_bought_together',
+    operation_description="""
+    Productos que se suelen comprar junto con el indicado, de mayor a menor confianza.
+
+    Se calculan por lotes con `manage.py mine_associations` a partir de las sesiones de
+    compra de cada usuario; la respuesta es una sola lectura por índice. Un producto sin
+    asociaciones (o inexistente) devuelve una lista vacía.
+    """,
+    manual_parameters=[
+        openapi.Parameter(
+            'Authorization',
+            openapi.IN_HEADER,
+            description="Token JWT de autenticación. Debe incluir el prefijo 'Bearer'",
+            type=openapi.TYPE_STRING,
+            required=True
+        ),
+    ],
+    responses={
+        200: openapi.Response(description="Productos comprados juntos", schema=bought_together_schema),
+        401: openapi.Response(description="No autorizado - Token inválido o expirado", schema=error_schema),
+    },
+    tags=['recommendations']
+)
+@api_view(['GET'])
+# El token se valida sin leer el usuario de la base: la respuesta es una sola consulta
+@authentication_classes([])
+@permission_classes([])
+def get_bought_together(request, product_id):
+    try:
+        authenticate_request(request)
+    except TokenError as e:
+        return Response(e.data, status=401)
+    except InvalidTokenError as e:
+        return Response({'error': 'Token inválido', 'detail': str(e)}, status=401)
+
+    associations = ProductAssociation.objects.filter(product_id=product_id).select_related(
+        'associated_product'
+    ).order_by('rank')
+    data = []
+    computed_at = None
+    for association in associations:
+        product = association.associated_product
+        computed_at = association.computed_at
+        data.append({
+            'product': {
+                'id': product.id,
+                'name': product.name,
+                'brand': product.brand,
+                'category': product.category,
+                'base_price': str(product.base_price),
+                'current_price': str(product.current_price),
+                'image_url': product.image_url or '',
+            },
+            'baskets': association.baskets,
+            'support': round(association.support, 6),
+            'confidence': round(association.confidence, 4),
+            'lift': round(association.lift, 2),
+        })
+    return Response({'product_id': product_id, 'data': data, 'computed_at': computed_at})